@@ -0,0 +1,789 @@
+"""
+CompactingSqliteSaver：持久化、可压缩的 LangGraph Checkpointer。
+
+模块职责：
+- 将会话检查点（checkpoint）、任务写入（writes）与通道值（blobs）持久化到本地 SQLite，
+  进程重启后会话记忆不丢失
+- 写入先落在内存中，按批量 / 时间间隔合并提交到 SQLite，避免每一步都触发一次磁盘事务
+- 每个会话（thread）只保留最近 N 个检查点，更早的检查点及其写入、无人引用的通道值一并删除
+- 空闲会话从内存中淘汰，再次访问时按需从 SQLite 加载，长时间运行、会话数很多时内存保持平稳
+
+设计说明：
+- 内存中的存储结构与 LangGraph 自带的 InMemorySaver 一致（通道值按版本单独存放），
+  读取逻辑与其保持相同语义，仅在其外层增加持久化、压缩与淘汰
+- DeepAgents 的 messages 通道为 DeltaChannel：非快照步的检查点不保存完整消息列表，
+  需要沿父链回放写入重建。压缩时保留每个检查点回溯到最近一次快照所需的全部祖先，
+  保证保留下来的检查点都能完整还原
+- 所有 SQL 变更按发生顺序进入待提交队列，由后台线程定期提交；淘汰会话前先提交，
+  保证重新加载时读到的数据完整
+- 同一实例可被多个会话并发使用（内部加锁）；异步读取未驻留内存的会话时在线程池中加载，
+  不阻塞事件循环
+"""
+
+# ===== 标准库 =====
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterator, List, Sequence, Tuple
+import asyncio
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+
+# ===== 第三方库 =====
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+
+# ===== 本地模块 =====
+from utils.load_prompt import find_project_root
+
+
+logger = logging.getLogger(__name__)
+
+# 检查点数据库默认位置（相对项目根目录）
+DEFAULT_CHECKPOINT_PATH = Path(".devmate") / "checkpoints.sqlite"
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS checkpoints ("
+    " thread_id TEXT NOT NULL,"
+    " checkpoint_ns TEXT NOT NULL,"
+    " checkpoint_id TEXT NOT NULL,"
+    " parent_checkpoint_id TEXT,"
+    " type TEXT NOT NULL,"
+    " checkpoint BLOB NOT NULL,"
+    " metadata_type TEXT NOT NULL,"
+    " metadata BLOB NOT NULL,"
+    " PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id))",
+    "CREATE TABLE IF NOT EXISTS writes ("
+    " thread_id TEXT NOT NULL,"
+    " checkpoint_ns TEXT NOT NULL,"
+    " checkpoint_id TEXT NOT NULL,"
+    " task_id TEXT NOT NULL,"
+    " idx INTEGER NOT NULL,"
+    " channel TEXT NOT NULL,"
+    " type TEXT NOT NULL,"
+    " value BLOB NOT NULL,"
+    " task_path TEXT NOT NULL,"
+    " PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx))",
+    # version 不声明类型，保留写入时的原始类型（str / int / float）
+    "CREATE TABLE IF NOT EXISTS blobs ("
+    " thread_id TEXT NOT NULL,"
+    " checkpoint_ns TEXT NOT NULL,"
+    " channel TEXT NOT NULL,"
+    " version NOT NULL,"
+    " type TEXT NOT NULL,"
+    " value BLOB NOT NULL,"
+    " PRIMARY KEY (thread_id, checkpoint_ns, channel, version))",
+)
+
+_INSERT_CHECKPOINT = (
+    "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id,"
+    " parent_checkpoint_id, type, checkpoint, metadata_type, metadata)"
+    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+_INSERT_WRITE = (
+    "INSERT OR REPLACE INTO writes (thread_id, checkpoint_ns, checkpoint_id,"
+    " task_id, idx, channel, type, value, task_path)"
+    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+_INSERT_BLOB = (
+    "INSERT OR REPLACE INTO blobs (thread_id, checkpoint_ns, channel, version, type, value)"
+    " VALUES (?, ?, ?, ?, ?, ?)"
+)
+_DELETE_CHECKPOINT = (
+    "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?"
+)
+_DELETE_CHECKPOINT_WRITES = (
+    "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?"
+)
+_DELETE_BLOB = (
+    "DELETE FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?"
+)
+
+
+class _ThreadState:
+    """
+    单个会话在内存中的全部数据（结构与 InMemorySaver 相同，键中省略 thread_id）。
+    """
+
+    __slots__ = ("storage", "writes", "blobs", "refs", "last_used")
+
+    def __init__(self):
+        # checkpoint_ns -> checkpoint_id -> (checkpoint, metadata, parent_checkpoint_id)
+        self.storage: Dict[str, Dict[str, Tuple]] = {}
+        # (checkpoint_ns, checkpoint_id) -> (task_id, idx) -> (task_id, channel, value, task_path)
+        self.writes: Dict[Tuple[str, str], Dict[Tuple[str, int], Tuple]] = {}
+        # (checkpoint_ns, channel, version) -> 序列化后的通道值
+        self.blobs: Dict[Tuple[str, str, Any], Tuple[str, bytes]] = {}
+        # (checkpoint_ns, checkpoint_id) -> (channel_versions, 尚未快照的 DeltaChannel 集合)，压缩时使用
+        self.refs: Dict[Tuple[str, str], Tuple[Dict, frozenset]] = {}
+        self.last_used = time.monotonic()
+
+
+class CompactingSqliteSaver(BaseCheckpointSaver[str]):
+    """
+    基于 SQLite 的持久化 Checkpointer，支持批量写入、检查点保留上限与空闲会话淘汰。
+    """
+
+    def __init__(
+        self,
+        path: Path = DEFAULT_CHECKPOINT_PATH,
+        keep_last: int = 20,
+        flush_interval: float = 1.0,
+        flush_batch: int = 256,
+        idle_seconds: float = 600,
+        max_resident_threads: int = 256,
+    ):
+        """
+        打开（或创建）检查点数据库。
+
+        Args:
+            path: SQLite 文件路径
+            keep_last: 每个会话（及子图命名空间）保留的最近检查点数，<= 0 表示全部保留
+            flush_interval: 后台线程提交待写入数据的间隔（秒），<= 0 表示每次写入立即提交
+            flush_batch: 待提交的 SQL 变更达到该数量时立即提交
+            idle_seconds: 会话空闲超过该时间后从内存中淘汰，<= 0 表示不按空闲时间淘汰
+            max_resident_threads: 内存中最多驻留的会话数，超出时淘汰最久未使用的会话
+        """
+        super().__init__()
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.keep_last = keep_last
+        self.flush_interval = flush_interval
+        self.flush_batch = max(1, flush_batch)
+        self.idle_seconds = idle_seconds
+        self.max_resident_threads = max(1, max_resident_threads)
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            self._conn.execute(statement)
+        self._conn.commit()
+
+        self._threads: "OrderedDict[str, _ThreadState]" = OrderedDict()
+        self._pending: List[Tuple[str, Tuple]] = []
+        self._closed = False
+
+        self.loads = 0
+        self.evictions = 0
+        self.flushes = 0
+        self.pruned = 0
+
+        self._stop = threading.Event()
+        self._flusher = None
+        if self.flush_interval > 0:
+            self._flusher = threading.Thread(
+                target=self._flush_loop, name="checkpoint-flusher", daemon=True
+            )
+            self._flusher.start()
+
+    # ===== 生命周期 =====
+
+    def __enter__(self) -> "CompactingSqliteSaver":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    async def __aenter__(self) -> "CompactingSqliteSaver":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await asyncio.to_thread(self.close)
+
+    def close(self) -> None:
+        """提交全部待写入数据并关闭数据库（可重复调用）。"""
+        if self._closed:
+            return
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        with self._lock:
+            self.flush()
+            self._closed = True
+            self._conn.close()
+
+    def _flush_loop(self) -> None:
+        """后台线程：按固定间隔提交待写入数据，并淘汰空闲会话。"""
+        while not self._stop.wait(self.flush_interval):
+            try:
+                with self._lock:
+                    self.flush()
+                    self._evict()
+            except Exception:
+                logger.exception("检查点后台提交失败")
+
+    def flush(self) -> None:
+        """将待提交的 SQL 变更按顺序在一个事务中写入 SQLite。"""
+        with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, []
+
+            # 连续的同类语句合并为一次 executemany
+            with self._conn:
+                start = 0
+                while start < len(pending):
+                    sql = pending[start][0]
+                    end = start
+                    while end < len(pending) and pending[end][0] == sql:
+                        end += 1
+                    self._conn.executemany(sql, [params for _, params in pending[start:end]])
+                    start = end
+            self.flushes += 1
+
+    def _queue(self, sql: str, params: Tuple) -> None:
+        """登记一条待提交的 SQL 变更。"""
+        self._pending.append((sql, params))
+
+    def _after_write(self) -> None:
+        """写入后按批量阈值提交，并执行内存淘汰。"""
+        if self.flush_interval <= 0 or len(self._pending) >= self.flush_batch:
+            self.flush()
+        self._evict()
+
+    # ===== 会话加载与淘汰 =====
+
+    def _load(self, thread_id: str) -> _ThreadState:
+        """从 SQLite 加载一个会话的全部数据（调用方需持有锁且已提交待写入数据）。"""
+        state = _ThreadState()
+        for ns, checkpoint_id, parent_id, type_, checkpoint, meta_type, metadata in self._conn.execute(
+            "SELECT checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint,"
+            " metadata_type, metadata FROM checkpoints WHERE thread_id = ?",
+            (thread_id,),
+        ):
+            state.storage.setdefault(ns, {})[checkpoint_id] = (
+                (type_, checkpoint),
+                (meta_type, metadata),
+                parent_id,
+            )
+        for ns, checkpoint_id, task_id, idx, channel, type_, value, task_path in self._conn.execute(
+            "SELECT checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value, task_path"
+            " FROM writes WHERE thread_id = ?",
+            (thread_id,),
+        ):
+            state.writes.setdefault((ns, checkpoint_id), {})[(task_id, idx)] = (
+                task_id,
+                channel,
+                (type_, value),
+                task_path,
+            )
+        for ns, channel, version, type_, value in self._conn.execute(
+            "SELECT checkpoint_ns, channel, version, type, value FROM blobs WHERE thread_id = ?",
+            (thread_id,),
+        ):
+            state.blobs[(ns, channel, version)] = (type_, value)
+        return state
+
+    def _thread(self, thread_id: str) -> _ThreadState:
+        """获取会话数据：已驻留时直接返回，否则从 SQLite 加载并驻留。"""
+        with self._lock:
+            state = self._threads.get(thread_id)
+            if state is None:
+                self.flush()
+                state = self._load(thread_id)
+                self._threads[thread_id] = state
+                self.loads += 1
+            else:
+                self._threads.move_to_end(thread_id)
+            state.last_used = time.monotonic()
+            return state
+
+    def _peek(self, thread_id: str) -> _ThreadState:
+        """读取会话数据但不改变驻留状态（遍历全部会话时使用）。"""
+        with self._lock:
+            state = self._threads.get(thread_id)
+            if state is not None:
+                return state
+            self.flush()
+            return self._load(thread_id)
+
+    def _is_resident(self, thread_id: str) -> bool:
+        return thread_id in self._threads
+
+    def _evict(self) -> None:
+        """淘汰空闲或超出驻留上限的会话（淘汰前先提交，保证可完整重新加载）。"""
+        with self._lock:
+            now = time.monotonic()
+            victims = []
+            overflow = len(self._threads) - self.max_resident_threads
+            for thread_id, state in self._threads.items():
+                idle = self.idle_seconds > 0 and now - state.last_used > self.idle_seconds
+                if len(victims) < overflow or idle:
+                    victims.append(thread_id)
+                else:
+                    # 按最近使用顺序排列，之后的会话都不空闲
+                    break
+            if not victims:
+                return
+
+            self.flush()
+            for thread_id in victims:
+                del self._threads[thread_id]
+            self.evictions += len(victims)
+            logger.debug("已从内存中淘汰 %d 个会话", len(victims))
+
+    # ===== 读取 =====
+
+    def _load_blobs(
+        self, state: _ThreadState, checkpoint_ns: str, versions: ChannelVersions
+    ) -> Dict[str, Any]:
+        result: Dict[str, Any] = {}
+        for channel, version in versions.items():
+            blob = state.blobs.get((checkpoint_ns, channel, version))
+            if blob is None or blob[0] == "empty":
+                continue
+            result[channel] = self.serde.loads_typed(blob)
+        return result
+
+    @staticmethod
+    def _ordered_writes(state: _ThreadState, checkpoint_ns: str, checkpoint_id: str) -> List:
+        stored = state.writes.get((checkpoint_ns, checkpoint_id), {})
+        return [
+            stored[key]
+            for key in sorted(stored, key=lambda key: writes_sort_key(stored[key][3], *key))
+        ]
+
+    def _tuple(
+        self,
+        state: _ThreadState,
+        thread_id: str,
+        checkpoint_ns: str,
+        checkpoint_id: str,
+        metadata: CheckpointMetadata | None = None,
+    ) -> CheckpointTuple:
+        """组装一个检查点元组（与 InMemorySaver 的返回结构一致）。"""
+        checkpoint, metadata_b, parent_checkpoint_id = state.storage[checkpoint_ns][checkpoint_id]
+        checkpoint_: Checkpoint = self.serde.loads_typed(checkpoint)
+        writes = self._ordered_writes(state, checkpoint_ns, checkpoint_id)
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint={
+                **checkpoint_,
+                "channel_values": self._load_blobs(
+                    state, checkpoint_ns, checkpoint_["channel_versions"]
+                ),
+            },
+            metadata=metadata if metadata is not None else self.serde.loads_typed(metadata_b),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed(value))
+                for task_id, channel, value, _ in writes
+            ],
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_checkpoint_id,
+                    }
+                }
+                if parent_checkpoint_id
+                else None
+            ),
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        """
+        获取检查点：配置中带 checkpoint_id 时返回对应检查点，否则返回该会话最新的检查点。
+        """
+        thread_id: str = config["configurable"]["thread_id"]
+        checkpoint_ns: str = config["configurable"].get("checkpoint_ns", "")
+        with self._lock:
+            state = self._thread(thread_id)
+            checkpoints = state.storage.get(checkpoint_ns)
+            if not checkpoints:
+                return None
+            checkpoint_id = get_checkpoint_id(config)
+            if checkpoint_id:
+                if checkpoint_id not in checkpoints:
+                    return None
+                found = self._tuple(state, thread_id, checkpoint_ns, checkpoint_id)
+                # 按 ID 读取时沿用调用方传入的配置
+                return found._replace(config=config)
+            return self._tuple(state, thread_id, checkpoint_ns, max(checkpoints))
+
+    def _thread_ids(self) -> List[str]:
+        """全部会话 ID（含未驻留内存的会话）。"""
+        with self._lock:
+            self.flush()
+            stored = [row[0] for row in self._conn.execute("SELECT DISTINCT thread_id FROM checkpoints")]
+            return list(dict.fromkeys([*self._threads, *stored]))
+
+    def list(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: Dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> Iterator[CheckpointTuple]:
+        """
+        按条件列出检查点（按 checkpoint_id 倒序）。
+        """
+        if config:
+            thread_ids = [config["configurable"]["thread_id"]]
+        else:
+            thread_ids = self._thread_ids()
+        config_checkpoint_ns = config["configurable"].get("checkpoint_ns") if config else None
+        config_checkpoint_id = get_checkpoint_id(config) if config else None
+        before_checkpoint_id = get_checkpoint_id(before) if before else None
+
+        for thread_id in thread_ids:
+            with self._lock:
+                state = self._thread(thread_id) if config else self._peek(thread_id)
+                tuples = []
+                for checkpoint_ns, checkpoints in state.storage.items():
+                    if config_checkpoint_ns is not None and checkpoint_ns != config_checkpoint_ns:
+                        continue
+                    for checkpoint_id in sorted(checkpoints, reverse=True):
+                        if config_checkpoint_id and checkpoint_id != config_checkpoint_id:
+                            continue
+                        if before_checkpoint_id and checkpoint_id >= before_checkpoint_id:
+                            continue
+                        metadata = self.serde.loads_typed(checkpoints[checkpoint_id][1])
+                        if filter and not all(
+                            value == metadata.get(key) for key, value in filter.items()
+                        ):
+                            continue
+                        if limit is not None and len(tuples) >= limit:
+                            break
+                        tuples.append(
+                            self._tuple(state, thread_id, checkpoint_ns, checkpoint_id, metadata)
+                        )
+
+            for item in tuples:
+                yield item
+            if limit is not None:
+                limit -= len(tuples)
+                if limit <= 0:
+                    return
+
+    # ===== 写入 =====
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """
+        保存检查点，并按保留上限压缩该会话的历史检查点。
+        """
+        c = checkpoint.copy()
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        parent_checkpoint_id = config["configurable"].get("checkpoint_id")
+        values: Dict[str, Any] = c.pop("channel_values")  # type: ignore[misc]
+
+        with self._lock:
+            state = self._thread(thread_id)
+            for channel, version in new_versions.items():
+                blob = (
+                    self.serde.dumps_typed(values[channel]) if channel in values else ("empty", b"")
+                )
+                state.blobs[(checkpoint_ns, channel, version)] = blob
+                self._queue(_INSERT_BLOB, (thread_id, checkpoint_ns, channel, version, *blob))
+
+            checkpoint_b = self.serde.dumps_typed(c)
+            metadata_b = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+            state.storage.setdefault(checkpoint_ns, {})[checkpoint["id"]] = (
+                checkpoint_b,
+                metadata_b,
+                parent_checkpoint_id,
+            )
+            self._queue(
+                _INSERT_CHECKPOINT,
+                (
+                    thread_id,
+                    checkpoint_ns,
+                    checkpoint["id"],
+                    parent_checkpoint_id,
+                    *checkpoint_b,
+                    *metadata_b,
+                ),
+            )
+
+            if self.keep_last > 0:
+                self._compact(thread_id, state, checkpoint_ns, self.keep_last)
+            self._after_write()
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """
+        保存任务写入（与检查点关联）。
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+
+        with self._lock:
+            state = self._thread(thread_id)
+            stored = state.writes.setdefault((checkpoint_ns, checkpoint_id), {})
+            for idx, (channel, value) in enumerate(writes):
+                key = (task_id, WRITES_IDX_MAP.get(channel, idx))
+                if key[1] >= 0 and key in stored:
+                    continue
+                value_b = self.serde.dumps_typed(value)
+                stored[key] = (task_id, channel, value_b, task_path)
+                self._queue(
+                    _INSERT_WRITE,
+                    (thread_id, checkpoint_ns, checkpoint_id, *key, channel, *value_b, task_path),
+                )
+            self._after_write()
+
+    def delete_thread(self, thread_id: str) -> None:
+        """删除会话的全部检查点、写入与通道值。"""
+        with self._lock:
+            self._threads.pop(thread_id, None)
+            for table in ("checkpoints", "writes", "blobs"):
+                self._queue(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+            self._after_write()
+
+    def prune(self, thread_ids: Sequence[str], *, strategy: str = "keep_latest") -> None:
+        """
+        清理指定会话的检查点。
+
+        Args:
+            thread_ids: 会话 ID 列表
+            strategy: keep_latest 仅保留最新检查点（及还原它所需的祖先）；delete 删除全部
+        """
+        if strategy not in ("keep_latest", "delete"):
+            raise ValueError(f"❌ 不支持的清理策略: {strategy}")
+        with self._lock:
+            for thread_id in thread_ids:
+                if strategy == "delete":
+                    self.delete_thread(thread_id)
+                    continue
+                state = self._thread(thread_id)
+                for checkpoint_ns in list(state.storage):
+                    self._compact(thread_id, state, checkpoint_ns, 1)
+            self._after_write()
+
+    # ===== 压缩 =====
+
+    def _refs(self, state: _ThreadState, checkpoint_ns: str, checkpoint_id: str) -> Tuple[Dict, frozenset]:
+        """检查点引用的通道版本，以及自上次快照以来有更新的 DeltaChannel。"""
+        key = (checkpoint_ns, checkpoint_id)
+        refs = state.refs.get(key)
+        if refs is None:
+            checkpoint, metadata, _ = state.storage[checkpoint_ns][checkpoint_id]
+            counters = self.serde.loads_typed(metadata).get("counters_since_delta_snapshot") or {}
+            refs = (
+                dict(self.serde.loads_typed(checkpoint)["channel_versions"]),
+                frozenset(counters),
+            )
+            state.refs[key] = refs
+        return refs
+
+    @staticmethod
+    def _unresolved(
+        state: _ThreadState, checkpoint_ns: str, versions: Dict, channels
+    ) -> set:
+        """
+        在给定通道版本下仍无法直接取到值、需要继续回溯祖先的通道。
+
+        从未写入过的通道（不在 channel_versions 中）不需要回溯：更早的祖先中也不存在它的写入。
+        """
+        return {
+            channel
+            for channel in channels
+            if channel in versions
+            and state.blobs.get((checkpoint_ns, channel, versions[channel]), ("empty",))[0]
+            == "empty"
+        }
+
+    def _compact(self, thread_id: str, state: _ThreadState, checkpoint_ns: str, keep: int) -> None:
+        """
+        只保留命名空间内最近 keep 个检查点，以及还原它们所需的祖先检查点。
+
+        DeltaChannel 的值需要从最近一次快照开始回放写入，
+        因此沿父链回溯，直到每个未快照的通道都找到带有完整值的祖先为止。
+        """
+        checkpoints = state.storage.get(checkpoint_ns, {})
+        if len(checkpoints) <= keep:
+            return
+
+        newest = sorted(checkpoints, reverse=True)[:keep]
+        retained = set(newest)
+        for checkpoint_id in newest:
+            versions, delta_channels = self._refs(state, checkpoint_ns, checkpoint_id)
+            needed = self._unresolved(state, checkpoint_ns, versions, delta_channels)
+            cursor = checkpoint_id
+            while needed:
+                cursor = checkpoints[cursor][2]
+                if cursor is None or cursor not in checkpoints:
+                    break
+                retained.add(cursor)
+                versions = self._refs(state, checkpoint_ns, cursor)[0]
+                needed = self._unresolved(state, checkpoint_ns, versions, needed)
+
+        dropped = [checkpoint_id for checkpoint_id in checkpoints if checkpoint_id not in retained]
+        if not dropped:
+            return
+
+        for checkpoint_id in dropped:
+            del checkpoints[checkpoint_id]
+            state.writes.pop((checkpoint_ns, checkpoint_id), None)
+            state.refs.pop((checkpoint_ns, checkpoint_id), None)
+            self._queue(_DELETE_CHECKPOINT, (thread_id, checkpoint_ns, checkpoint_id))
+            self._queue(_DELETE_CHECKPOINT_WRITES, (thread_id, checkpoint_ns, checkpoint_id))
+
+        # 删除不再被任何保留检查点引用的通道值
+        referenced = set()
+        for checkpoint_id in retained:
+            for channel, version in self._refs(state, checkpoint_ns, checkpoint_id)[0].items():
+                referenced.add((checkpoint_ns, channel, version))
+        for key in [key for key in state.blobs if key[0] == checkpoint_ns and key not in referenced]:
+            del state.blobs[key]
+            self._queue(_DELETE_BLOB, (thread_id, *key))
+
+        self.pruned += len(dropped)
+
+    # ===== 异步接口 =====
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        if self._is_resident(config["configurable"]["thread_id"]):
+            return self.get_tuple(config)
+        # 需要从 SQLite 加载，放到线程池中执行
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: Dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        if self._is_resident(config["configurable"]["thread_id"]):
+            return self.put(config, checkpoint, metadata, new_versions)
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        if self._is_resident(config["configurable"]["thread_id"]):
+            return self.put_writes(config, writes, task_id, task_path)
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        return self.delete_thread(thread_id)
+
+    async def aprune(self, thread_ids: Sequence[str], *, strategy: str = "keep_latest") -> None:
+        await asyncio.to_thread(self.prune, thread_ids, strategy=strategy)
+
+    def get_next_version(self, current: str | None, channel: None) -> str:
+        # 与 InMemorySaver 相同：整数版本号 + 随机后缀，保证单调递增且字符串可比较
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        next_v = current_v + 1
+        next_h = random.random()
+        return f"{next_v:032}.{next_h:016}"
+
+    def stats(self) -> Dict[str, int]:
+        """
+        返回运行统计。
+
+        Returns:
+            包含 resident_threads / pending / loads / evictions / flushes / pruned 的字典
+        """
+        return {
+            "resident_threads": len(self._threads),
+            "pending": len(self._pending),
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "flushes": self.flushes,
+            "pruned": self.pruned,
+        }
+
+
+def build_checkpointer() -> BaseCheckpointSaver:
+    """
+    根据环境变量构建 Agent 的记忆存储（Checkpointer）。
+
+    支持的环境变量：
+    - AGENT_CHECKPOINT_BACKEND：sqlite（默认，持久化）/ memory（进程内，重启后丢失）
+    - AGENT_CHECKPOINT_PATH：SQLite 文件路径，默认为项目根目录下的 .devmate/checkpoints.sqlite
+    - AGENT_CHECKPOINT_KEEP：每个会话保留的最近检查点数，默认 20（0 表示全部保留）
+    - AGENT_CHECKPOINT_FLUSH_INTERVAL：批量提交间隔（秒），默认 1（0 表示每次写入立即提交）
+    - AGENT_CHECKPOINT_FLUSH_BATCH：待提交变更达到该数量时立即提交，默认 256
+    - AGENT_CHECKPOINT_IDLE_SECONDS：会话空闲多久后从内存中淘汰，默认 600（0 表示不按空闲淘汰）
+    - AGENT_CHECKPOINT_MAX_THREADS：内存中最多驻留的会话数，默认 256
+
+    Returns:
+        Checkpointer 实例
+    """
+    backend = (os.getenv("AGENT_CHECKPOINT_BACKEND") or "sqlite").lower()
+    if backend == "memory":
+        return InMemorySaver()
+    if backend != "sqlite":
+        raise RuntimeError(f"❌ 不支持的 AGENT_CHECKPOINT_BACKEND: {backend}（可选 sqlite / memory）")
+
+    path = Path(os.getenv("AGENT_CHECKPOINT_PATH") or DEFAULT_CHECKPOINT_PATH)
+    if not path.is_absolute():
+        path = Path(find_project_root()) / path
+
+    return CompactingSqliteSaver(
+        path=path,
+        keep_last=int(os.getenv("AGENT_CHECKPOINT_KEEP") or 20),
+        flush_interval=float(os.getenv("AGENT_CHECKPOINT_FLUSH_INTERVAL") or 1),
+        flush_batch=int(os.getenv("AGENT_CHECKPOINT_FLUSH_BATCH") or 256),
+        idle_seconds=float(os.getenv("AGENT_CHECKPOINT_IDLE_SECONDS") or 600),
+        max_resident_threads=int(os.getenv("AGENT_CHECKPOINT_MAX_THREADS") or 256),
+    )
@@ -0,0 +1,398 @@
+"""
+ContextBudgetMiddleware：按 token 预算压缩每次模型调用的对话历史。
+
+模块职责：
+- 在每次模型调用前逐条估算消息的 token 数，超出预算时压缩发送给模型的历史
+- 系统 Prompt（program_prompt.txt）与最近若干轮对话原样保留
+- 较早轮次中的超长工具输出先截断为预览；仍超出预算时，将较早轮次整体替换为摘要
+- 统计每次调用压缩前后的 token 数与累计节省量，供日志与 /health 查看
+
+设计说明：
+- 以 LangChain AgentMiddleware 的 wrap_model_call 实现，只改写本次请求的消息列表，
+  不修改会话状态：检查点中仍保存完整历史，回放与排查问题不受影响
+- 以“用户消息”为轮次边界切分历史，保证工具调用与对应的工具结果始终成对保留或成对摘要
+- 摘要按“历史前缀”缓存：新的一轮变为较早轮次时，只需将上一次的摘要与新增轮次合并摘要，
+  不会每次调用都重新摘要全部历史
+- 摘要调用带有 nostream 标签，不会混入 Agent 的 token 增量事件流
+- token 数沿用检索结果打包的估算方法（见 knowledge_db/rag/packing.py），与具体模型分词器无关
+- DeepAgents 默认自带一层摘要中间件（接近模型上下文上限时才触发，阈值与本模块无关）。
+  本中间件以同名（SummarizationMiddleware）接替该层，执行图中只保留一套摘要策略与预算；
+  禁用本中间件时仍由 DeepAgents 的默认摘要兜底
+"""
+
+# ===== 标准库 =====
+from typing import Any, Awaitable, Callable, Dict, List, Sequence, Tuple
+import hashlib
+import json
+import logging
+import os
+import threading
+
+# ===== 第三方库 =====
+from langchain.agents.middleware import AgentMiddleware, ModelRequest, ModelResponse
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import (
+    AIMessage,
+    AnyMessage,
+    HumanMessage,
+    SystemMessage,
+    ToolMessage,
+)
+from langgraph.constants import TAG_NOSTREAM
+
+# ===== 本地模块 =====
+from knowledge_db.rag.cache import LRUCache
+from knowledge_db.rag.packing import estimate_tokens
+from utils.load_prompt import load_prompt
+
+
+logger = logging.getLogger(__name__)
+
+# 每条消息的固定开销（角色、分隔符等）
+_MESSAGE_OVERHEAD_TOKENS = 4
+
+# 摘要消息的前缀，模型据此区分摘要与真实的用户输入
+SUMMARY_PREFIX = "【此前对话摘要】"
+
+# 摘要调用的配置：不进入 messages 流，便于在追踪中识别
+_SUMMARY_CONFIG = {"tags": [TAG_NOSTREAM], "metadata": {"lc_source": "context_budget"}}
+
+# DeepAgents 内置摘要中间件的名称：create_deep_agent 按名称将同名中间件原位替换
+SUMMARIZATION_MIDDLEWARE_NAME = "SummarizationMiddleware"
+
+
+def count_message_tokens(message: AnyMessage) -> int:
+    """
+    估算单条消息的 token 数（正文 + 工具调用参数 + 固定开销）。
+
+    Args:
+        message: 任意 LangChain 消息
+
+    Returns:
+        估算的 token 数
+    """
+    tokens = _MESSAGE_OVERHEAD_TOKENS + estimate_tokens(message.text)
+    if isinstance(message, AIMessage) and message.tool_calls:
+        tokens += estimate_tokens(
+            json.dumps([call["args"] for call in message.tool_calls], ensure_ascii=False)
+        )
+    return tokens
+
+
+def _split_turns(messages: Sequence[AnyMessage]) -> List[List[AnyMessage]]:
+    """按用户消息切分轮次；首条用户消息之前的消息归入第一轮。"""
+    turns: List[List[AnyMessage]] = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([message])
+        else:
+            turns[-1].append(message)
+    return turns
+
+
+def _turn_digest(previous: str, turn: Sequence[AnyMessage]) -> str:
+    """历史前缀的摘要缓存键：上一前缀的键 + 本轮消息的 ID（无 ID 时使用正文）。"""
+    digest = hashlib.sha1(previous.encode("utf-8"))
+    for message in turn:
+        digest.update(f"\x00{message.type}:{message.id or message.text}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ContextBudgetMiddleware(AgentMiddleware):
+    """
+    对话历史的 token 预算控制中间件。
+
+    传给 create_deep_agent 时替换 DeepAgents 内置的摘要中间件（主 Agent 与通用子 Agent 均是），
+    而不是在其之外再叠加一层。
+    """
+
+    @property
+    def name(self) -> str:
+        """占用 DeepAgents 内置摘要中间件的位置。"""
+        return SUMMARIZATION_MIDDLEWARE_NAME
+
+    def __init__(
+        self,
+        summary_model: BaseChatModel,
+        token_budget: int = 24000,
+        keep_turns: int = 3,
+        tool_output_tokens: int = 2000,
+        summary_cache_size: int = 256,
+    ):
+        """
+        Args:
+            summary_model: 生成历史摘要使用的模型
+            token_budget: 单次模型调用（系统 Prompt + 历史消息）的 token 预算
+            keep_turns: 原样保留的最近轮次数（含当前轮）
+            tool_output_tokens: 较早轮次中单条工具输出超过该 token 数时截断为预览
+            summary_cache_size: 缓存的历史摘要条数
+        """
+        super().__init__()
+        self.summary_model = summary_model
+        self.token_budget = token_budget
+        self.keep_turns = max(1, keep_turns)
+        self.tool_output_tokens = tool_output_tokens
+        self.summaries = LRUCache(max_size=summary_cache_size)
+        self.summary_prompt = load_prompt("history_summary_prompt.txt")
+
+        self._lock = threading.Lock()
+        self.model_calls = 0
+        self.compacted_calls = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+        self.tool_outputs_clipped = 0
+        self.summaries_generated = 0
+
+    # ===== 压缩步骤 =====
+
+    def _clip_tool_outputs(self, messages: Sequence[AnyMessage]) -> Tuple[List[AnyMessage], int]:
+        """
+        将超长的工具输出截断为开头部分的预览（保留 tool_call_id，调用关系不变）。
+
+        Returns:
+            (处理后的消息列表, 被截断的工具输出条数)
+        """
+        result: List[AnyMessage] = []
+        clipped = 0
+        for message in messages:
+            if isinstance(message, ToolMessage):
+                tokens = estimate_tokens(message.text)
+                if tokens > self.tool_output_tokens:
+                    # 按字符比例截取，再逐步收缩到预算以内
+                    preview = message.text[: len(message.text) * self.tool_output_tokens // tokens]
+                    while preview and estimate_tokens(preview) > self.tool_output_tokens:
+                        preview = preview[: len(preview) * 9 // 10]
+                    omitted = tokens - estimate_tokens(preview)
+                    message = message.model_copy(
+                        update={"content": f"{preview}\n……（工具输出过长，已省略约 {omitted} 个 token）"}
+                    )
+                    clipped += 1
+            result.append(message)
+        return result, clipped
+
+    def _render_turns(self, turns: Sequence[Sequence[AnyMessage]]) -> str:
+        """将待摘要的轮次渲染为纯文本（工具输出已截断）。"""
+        lines: List[str] = []
+        for turn in turns:
+            for message in self._clip_tool_outputs(turn)[0]:
+                if isinstance(message, HumanMessage):
+                    lines.append(f"用户：{message.text}")
+                elif isinstance(message, AIMessage):
+                    if message.text:
+                        lines.append(f"助手：{message.text}")
+                    for call in message.tool_calls:
+                        args = json.dumps(call["args"], ensure_ascii=False)
+                        lines.append(f"助手调用工具 {call['name']}：{args}")
+                elif isinstance(message, ToolMessage):
+                    lines.append(f"工具 {message.name or ''} 返回：{message.text}")
+        return "\n".join(lines)
+
+    def _plan_summary(
+        self, turns: Sequence[Sequence[AnyMessage]]
+    ) -> Tuple[str, str | None, List[Sequence[AnyMessage]]]:
+        """
+        为较早轮次查找可复用的摘要。
+
+        Returns:
+            (完整前缀的缓存键, 最长已缓存前缀的摘要, 该前缀之后尚未摘要的轮次)
+            完整前缀已缓存时，未摘要轮次为空
+        """
+        keys: List[str] = []
+        key = ""
+        for turn in turns:
+            key = _turn_digest(key, turn)
+            keys.append(key)
+
+        for end in range(len(turns), 0, -1):
+            summary = self.summaries.get(keys[end - 1])
+            if summary is not None:
+                return keys[-1], summary, list(turns[end:])
+        return keys[-1], None, list(turns)
+
+    def _summary_input(self, previous: str | None, turns: Sequence[Sequence[AnyMessage]]) -> List:
+        """摘要模型的输入消息。"""
+        history = self._render_turns(turns)
+        if previous:
+            history = f"{SUMMARY_PREFIX}\n{previous}\n\n{history}"
+        return [SystemMessage(self.summary_prompt), HumanMessage(history)]
+
+    def _prepare(self, request: ModelRequest) -> Dict[str, Any] | None:
+        """
+        计算本次调用的压缩方案；无需压缩时返回 None。
+
+        Returns:
+            包含原始 token 数、较早轮次、保留轮次与摘要计划的字典
+        """
+        system_tokens = (
+            count_message_tokens(request.system_message) if request.system_message else 0
+        )
+        before = system_tokens + sum(count_message_tokens(m) for m in request.messages)
+        with self._lock:
+            self.model_calls += 1
+            self.tokens_before += before
+        if self.token_budget <= 0 or before <= self.token_budget:
+            with self._lock:
+                self.tokens_after += before
+            return None
+
+        turns = _split_turns(request.messages)
+        older, recent = turns[: -self.keep_turns], turns[-self.keep_turns :]
+        plan = {
+            "before": before,
+            "system_tokens": system_tokens,
+            "older": older,
+            "recent": [m for turn in recent for m in turn],
+            "summary": None,
+        }
+
+        # 先截断较早轮次中的超长工具输出，已满足预算时无需摘要
+        plan["older_messages"], plan["clipped"] = self._clip_tool_outputs(
+            [m for turn in older for m in turn]
+        )
+        clipped_tokens = sum(count_message_tokens(m) for m in plan["older_messages"])
+        recent_tokens = sum(count_message_tokens(m) for m in plan["recent"])
+        if not older or system_tokens + clipped_tokens + recent_tokens <= self.token_budget:
+            return plan
+
+        plan["summary"] = self._plan_summary(older)
+        return plan
+
+    def _finish(self, request: ModelRequest, plan: Dict[str, Any], summary: str | None) -> ModelRequest:
+        """按压缩方案组装新的请求，并记录统计。"""
+        clipped = 0
+        if plan["summary"] is not None and summary:
+            head = [HumanMessage(f"{SUMMARY_PREFIX}\n{summary}")]
+        else:
+            # 未触发摘要或摘要失败时，较早轮次仅截断工具输出
+            head, clipped = plan["older_messages"], plan["clipped"]
+
+        messages = head + plan["recent"]
+        after = plan["system_tokens"] + sum(count_message_tokens(m) for m in messages)
+        if after > self.token_budget and len(_split_turns(plan["recent"])) > 1:
+            # 最近几轮本身过长：除当前轮外，其余轮次的工具输出也截断
+            current = _split_turns(plan["recent"])[-1]
+            earlier, extra = self._clip_tool_outputs(messages[: -len(current)])
+            messages = earlier + current
+            clipped += extra
+            after = plan["system_tokens"] + sum(count_message_tokens(m) for m in messages)
+
+        with self._lock:
+            self.compacted_calls += 1
+            self.tokens_after += after
+            self.tool_outputs_clipped += clipped
+        logger.info(
+            "上下文压缩：%d → %d tokens（节省 %d，摘要 %s）",
+            plan["before"],
+            after,
+            plan["before"] - after,
+            "是" if plan["summary"] is not None and summary else "否",
+        )
+        return request.override(messages=messages)
+
+    def _remember(self, key: str, summary: str) -> str | None:
+        """缓存并返回新生成的摘要；模型返回空摘要时不缓存，返回 None 以便后续调用重试。"""
+        if not summary.strip():
+            logger.warning("对话历史摘要为空，改为仅截断工具输出")
+            return None
+        self.summaries.put(key, summary)
+        with self._lock:
+            self.summaries_generated += 1
+        return summary
+
+    # ===== 中间件入口 =====
+
+    def wrap_model_call(
+        self,
+        request: ModelRequest,
+        handler: Callable[[ModelRequest], ModelResponse],
+    ) -> ModelResponse:
+        plan = self._prepare(request)
+        if plan is None:
+            return handler(request)
+
+        summary = None
+        if plan["summary"] is not None:
+            key, summary, pending = plan["summary"]
+            if pending:
+                try:
+                    response = self.summary_model.invoke(
+                        self._summary_input(summary, pending), config=_SUMMARY_CONFIG
+                    )
+                    summary = self._remember(key, response.text.strip())
+                except Exception as exc:
+                    logger.warning("对话历史摘要失败，改为仅截断工具输出: %s", exc)
+                    summary = None
+        return handler(self._finish(request, plan, summary))
+
+    async def awrap_model_call(
+        self,
+        request: ModelRequest,
+        handler: Callable[[ModelRequest], Awaitable[ModelResponse]],
+    ) -> ModelResponse:
+        plan = self._prepare(request)
+        if plan is None:
+            return await handler(request)
+
+        summary = None
+        if plan["summary"] is not None:
+            key, summary, pending = plan["summary"]
+            if pending:
+                try:
+                    response = await self.summary_model.ainvoke(
+                        self._summary_input(summary, pending), config=_SUMMARY_CONFIG
+                    )
+                    summary = self._remember(key, response.text.strip())
+                except Exception as exc:
+                    logger.warning("对话历史摘要失败，改为仅截断工具输出: %s", exc)
+                    summary = None
+        return await handler(self._finish(request, plan, summary))
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        返回压缩统计。
+
+        Returns:
+            包含 model_calls / compacted_calls / tokens_before / tokens_after / tokens_saved /
+            tool_outputs_clipped / summaries_generated / summary_cache 的字典
+        """
+        with self._lock:
+            return {
+                "model_calls": self.model_calls,
+                "compacted_calls": self.compacted_calls,
+                "tokens_before": self.tokens_before,
+                "tokens_after": self.tokens_after,
+                "tokens_saved": self.tokens_before - self.tokens_after,
+                "tool_outputs_clipped": self.tool_outputs_clipped,
+                "summaries_generated": self.summaries_generated,
+                "summary_cache": self.summaries.stats(),
+            }
+
+
+def build_context_budget(model: BaseChatModel) -> ContextBudgetMiddleware | None:
+    """
+    根据环境变量构建对话历史的 token 预算控制中间件。
+
+    支持的环境变量：
+    - AGENT_CONTEXT_MANAGEMENT：是否启用，默认 1（0 表示改用 DeepAgents 默认摘要，
+      接近模型上下文上限前发送完整历史）
+    - AGENT_CONTEXT_TOKEN_BUDGET：单次模型调用的 token 预算，默认 24000
+    - AGENT_CONTEXT_KEEP_TURNS：原样保留的最近轮次数，默认 3
+    - AGENT_TOOL_OUTPUT_TOKEN_LIMIT：较早轮次中单条工具输出的 token 上限，默认 2000
+    - AGENT_SUMMARY_CACHE_SIZE：缓存的历史摘要条数，默认 256
+
+    Args:
+        model: 生成摘要使用的模型（通常与 Agent 使用同一模型）
+
+    Returns:
+        ContextBudgetMiddleware；未启用时返回 None
+    """
+    if (os.getenv("AGENT_CONTEXT_MANAGEMENT") or "1") == "0":
+        return None
+
+    return ContextBudgetMiddleware(
+        summary_model=model,
+        token_budget=int(os.getenv("AGENT_CONTEXT_TOKEN_BUDGET") or 24000),
+        keep_turns=int(os.getenv("AGENT_CONTEXT_KEEP_TURNS") or 3),
+        tool_output_tokens=int(os.getenv("AGENT_TOOL_OUTPUT_TOKEN_LIMIT") or 2000),
+        summary_cache_size=int(os.getenv("AGENT_SUMMARY_CACHE_SIZE") or 256),
+    )
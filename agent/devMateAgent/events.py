@@ -0,0 +1,112 @@
+"""
+Agent 流式事件定义与终端输出消费者。
+
+模块职责：
+- 定义 SimpleAgent.astream_events 产出的类型化事件：
+  token 增量、工具调用开始、工具调用结束、最终回复
+- 提供将事件打印到终端的消费者（命令行交互模式使用）
+
+设计说明：
+- 事件均为不可变数据类，type 字段即 SSE 事件名，to_dict() 即事件数据，
+  HTTP 服务、终端打印、测试等调用方各自消费同一事件流
+- 工具调用结果可能很长（如文件内容、检索结果），事件中只保留截断后的预览
+"""
+
+# ===== 标准库 =====
+from dataclasses import asdict, dataclass, field
+from typing import AsyncIterator, ClassVar, Dict
+
+
+# 工具调用结果在事件中保留的最大字符数
+TOOL_OUTPUT_PREVIEW_CHARS = 500
+
+
+@dataclass(frozen=True)
+class AgentEvent:
+    """Agent 流式事件基类。"""
+
+    type: ClassVar[str] = "event"
+
+    def to_dict(self) -> Dict:
+        """事件数据（不含 type）。"""
+        return asdict(self)
+
+
+@dataclass(frozen=True)
+class TokenDelta(AgentEvent):
+    """模型输出的文本增量。"""
+
+    type: ClassVar[str] = "token"
+
+    text: str
+
+
+@dataclass(frozen=True)
+class ToolCallStart(AgentEvent):
+    """模型发起了一次工具调用（参数已完整生成）。"""
+
+    type: ClassVar[str] = "tool_start"
+
+    call_id: str
+    name: str
+    args: Dict = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class ToolCallEnd(AgentEvent):
+    """工具调用结束。"""
+
+    type: ClassVar[str] = "tool_end"
+
+    call_id: str
+    name: str
+    output: str
+    is_error: bool = False
+
+
+@dataclass(frozen=True)
+class FinalMessage(AgentEvent):
+    """本轮对话的最终回复（不再调用工具的最后一条模型消息）。"""
+
+    type: ClassVar[str] = "final"
+
+    content: str
+
+
+async def print_events(events: AsyncIterator[AgentEvent]) -> None:
+    """
+    将事件流打印到终端：token 增量直接续写，工具调用单独成行。
+
+    Args:
+        events: SimpleAgent.astream_events 返回的事件流
+    """
+    in_text = False  # 正在续写一段模型输出
+    ends_with_newline = True
+    streamed = False  # 自上次工具调用以来是否收到过 token 增量
+    async for event in events:
+        if isinstance(event, TokenDelta):
+            if not in_text:
+                print("🤖 ", end="")
+                in_text = True
+            print(event.text, end="", flush=True)
+            ends_with_newline = event.text.endswith("\n")
+            streamed = True
+            continue
+
+        if in_text:
+            if not ends_with_newline:
+                print()
+            in_text = False
+
+        if isinstance(event, ToolCallStart):
+            print(f"🔧 调用工具 {event.name}({event.args})")
+            streamed = False
+        elif isinstance(event, ToolCallEnd):
+            status = "❌" if event.is_error else "✅"
+            print(f"{status} 工具 {event.name} 返回：{event.output}")
+        elif isinstance(event, FinalMessage) and not streamed:
+            # 模型服务未以流式返回内容时，直接输出完整回复
+            print(f"🤖 {event.content}")
+
+    if in_text and not ends_with_newline:
+        print()
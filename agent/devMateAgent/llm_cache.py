@@ -0,0 +1,266 @@
+"""
+SQLiteResponseCache：模型响应的持久化缓存（可选启用）。
+
+模块职责：
+- 以 (规范化的消息列表, 模型配置与调用参数) 为键，将模型响应持久化到本地 SQLite
+- 相同输入再次调用时直接返回缓存的响应，回放、重试与回归测试无需再次请求模型服务
+- 按条目数上限淘汰最久未使用的响应，缓存文件大小可控
+- 提供确定性模式：强制 temperature=0，使缓存的响应可以稳定复用（适合 CI）
+
+设计说明：
+- 实现 LangChain 的 BaseCache 接口，通过 ChatOpenAI(cache=...) 挂载到模型上：
+  缓存查询发生在流式 / 非流式分支之前，两种调用方式共用同一份缓存；
+  命中时 Agent 事件流中不再有逐 token 增量，而是一次性给出完整回复
+- 模型配置中已包含模型名称、temperature 等采样参数，调用参数中包含绑定的工具定义（tools），
+  因此更换模型、采样参数或工具集合都会自然地使缓存失效
+- 消息列表在计算键之前去除消息 ID、response_metadata、usage_metadata 等每次调用都会变化的字段；
+  模型配置中去除 streaming 开关
+- 响应使用 LangGraph 的 JsonPlusSerializer 序列化（与会话检查点相同），只反序列化消息对象
+"""
+
+# ===== 标准库 =====
+from pathlib import Path
+from typing import Any, Dict
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+# ===== 第三方库 =====
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.outputs import ChatGeneration
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+# ===== 本地模块 =====
+from utils.load_prompt import find_project_root
+
+
+logger = logging.getLogger(__name__)
+
+# 响应缓存默认位置（相对项目根目录）
+DEFAULT_LLM_CACHE_PATH = Path(".devmate") / "llm_cache.sqlite"
+
+# 计算缓存键时从消息中去除的字段（每次调用都会变化，与模型输入语义无关）
+_VOLATILE_MESSAGE_FIELDS = ("id", "response_metadata", "usage_metadata")
+
+# 计算缓存键时从模型配置中去除的字段（不影响生成结果）
+_VOLATILE_MODEL_FIELDS = ("streaming",)
+
+
+def _normalize_prompt(prompt: str) -> str:
+    """去除序列化消息列表中的易变字段。"""
+    try:
+        messages = json.loads(prompt)
+    except ValueError:
+        return prompt
+    if not isinstance(messages, list):
+        return prompt
+
+    for message in messages:
+        kwargs = message.get("kwargs") if isinstance(message, dict) else None
+        if isinstance(kwargs, dict):
+            for field in _VOLATILE_MESSAGE_FIELDS:
+                kwargs.pop(field, None)
+    return json.dumps(messages, ensure_ascii=False, sort_keys=True)
+
+
+def _normalize_llm_string(llm_string: str) -> str:
+    """去除模型配置中的 streaming 等开关（形如 “序列化模型配置---调用参数”）。"""
+    serialized, separator, params = llm_string.partition("---")
+    try:
+        model = json.loads(serialized)
+    except ValueError:
+        return llm_string
+
+    kwargs = model.get("kwargs") if isinstance(model, dict) else None
+    if isinstance(kwargs, dict):
+        for field in _VOLATILE_MODEL_FIELDS:
+            kwargs.pop(field, None)
+    return json.dumps(model, sort_keys=True) + separator + params
+
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    """
+    计算缓存键。
+
+    Args:
+        prompt: LangChain 序列化后的消息列表（已去除消息 ID）
+        llm_string: LangChain 生成的模型配置与调用参数字符串
+
+    Returns:
+        SHA-256 十六进制字符串
+    """
+    digest = hashlib.sha256(_normalize_prompt(prompt).encode("utf-8"))
+    digest.update(b"\x00")
+    digest.update(_normalize_llm_string(llm_string).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class SQLiteResponseCache(BaseCache):
+    """
+    基于 SQLite 的模型响应缓存，按最近使用时间淘汰。
+    同一实例可在多个线程间共享。
+    """
+
+    def __init__(self, path: Path = DEFAULT_LLM_CACHE_PATH, max_entries: int = 5000):
+        """
+        打开（或创建）缓存数据库。
+
+        Args:
+            path: SQLite 文件路径
+            max_entries: 最大缓存条目数，超出时淘汰最久未使用的条目（<= 0 表示不限制）
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.serde = JsonPlusSerializer()
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " type TEXT NOT NULL,"
+            " value BLOB NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)"
+        )
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, prompt: str, llm_string: str) -> RETURN_VAL_TYPE | None:
+        """
+        查询缓存，命中时更新最近使用时间。
+
+        Returns:
+            缓存的生成结果列表；未命中时返回 None
+        """
+        key = cache_key(prompt, llm_string)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT type, value FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key)
+            )
+            self._conn.commit()
+            self.hits += 1
+
+        messages = self.serde.loads_typed(row)
+        return [ChatGeneration(message=message) for message in messages]
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        """
+        写入缓存；超出条目数上限时淘汰最久未使用的条目。
+
+        Args:
+            prompt: LangChain 序列化后的消息列表
+            llm_string: 模型配置与调用参数字符串
+            return_val: 生成结果列表
+        """
+        messages = [
+            generation.message
+            for generation in return_val
+            if isinstance(generation, ChatGeneration)
+        ]
+        if not messages or len(messages) != len(return_val):
+            # 仅缓存聊天模型的生成结果
+            return
+
+        type_, value = self.serde.dumps_typed(messages)
+        key = cache_key(prompt, llm_string)
+        with self._lock:
+            exists = self._conn.execute(
+                "SELECT 1 FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, type, value, last_used)"
+                " VALUES (?, ?, ?, ?)",
+                (key, type_, value, time.time()),
+            )
+            if not exists:
+                self._size += 1
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """淘汰最久未使用的条目，降到上限的 90%，避免每次写入都触发淘汰（调用方需持有锁）。"""
+        if self.max_entries <= 0 or self._size <= self.max_entries:
+            return
+        excess = self._size - int(self.max_entries * 0.9)
+        self._conn.execute(
+            "DELETE FROM responses WHERE key IN"
+            " (SELECT key FROM responses ORDER BY last_used LIMIT ?)",
+            (excess,),
+        )
+        self._size -= excess
+        self.evictions += excess
+        logger.debug("模型响应缓存已淘汰 %d 条", excess)
+
+    def clear(self, **kwargs: Any) -> None:
+        """清空缓存（统计计数保留）。"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._size = 0
+
+    def close(self) -> None:
+        """关闭数据库连接。"""
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        返回缓存统计信息。
+
+        Returns:
+            包含 size / max_entries / hits / misses / evictions / hit_rate 的字典
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": self._size,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def build_response_cache() -> SQLiteResponseCache | None:
+    """
+    根据环境变量构建模型响应缓存。
+
+    支持的环境变量：
+    - AGENT_LLM_CACHE：是否启用，默认 0（1 表示启用）
+    - AGENT_LLM_CACHE_PATH：SQLite 文件路径，默认为项目根目录下的 .devmate/llm_cache.sqlite
+    - AGENT_LLM_CACHE_MAX_ENTRIES：最大缓存条目数，默认 5000（0 表示不限制）
+
+    Returns:
+        SQLiteResponseCache；未启用时返回 None
+    """
+    if (os.getenv("AGENT_LLM_CACHE") or "0") != "1":
+        return None
+
+    path = Path(os.getenv("AGENT_LLM_CACHE_PATH") or DEFAULT_LLM_CACHE_PATH)
+    if not path.is_absolute():
+        path = Path(find_project_root()) / path
+
+    return SQLiteResponseCache(
+        path=path,
+        max_entries=int(os.getenv("AGENT_LLM_CACHE_MAX_ENTRIES") or 5000),
+    )
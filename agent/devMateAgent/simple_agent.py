@@ -4,27 +4,48 @@ SimpleAgent：基于 LangGraph 与 DeepAgents 的轻量级对话智能体封装
 模块职责：
 - 初始化并配置后端大语言模型（支持流式输出）
 - 加载系统级 Prompt，用于约束智能体整体行为
-- 创建具备“跨轮次记忆能力”的 Agent（基于 LangGraph Checkpointer）
-- 对外提供统一、简洁的流式交互接口
+- 创建具备“跨轮次记忆能力”的 Agent（基于 LangGraph Checkpointer，默认持久化到本地 SQLite）
+- 控制每次模型调用的上下文大小：超出 token 预算时摘要较早轮次、截断超长工具输出
+- 可选的模型响应缓存与确定性模式（temperature=0），用于回放与回归测试
+- 对外提供统一、简洁的流式交互接口：类型化事件流（token 增量 / 工具调用 / 最终回复），
+  终端打印与 HTTP 推送都只是该事件流的消费者
 
 设计说明：
-- 使用 thread_id 对对话进行隔离，支持多用户 / 多会话场景
+- 使用 thread_id 对对话进行隔离，支持多用户 / 多会话场景：
+  同一个 Agent 实例（编译后的执行图、工具集）可被多个会话并发使用，每次调用传入各自的 thread_id
 - Agent 的内部实现细节对调用方完全透明，便于后续演进
 - 当前实现偏向工程可读性与可维护性，而非最小 Demo
 """
 
 # ===== 标准库 =====
+from typing import AsyncIterator
 import os
 
 # ===== 第三方库 =====
+from langchain_core.messages import AIMessage, ToolMessage
 from langchain_openai import ChatOpenAI
-from langgraph.checkpoint.memory import InMemorySaver
 from deepagents import create_deep_agent
 
 # ===== 本地模块 =====
+from agent.devMateAgent.checkpointer import build_checkpointer
+from agent.devMateAgent.context_budget import build_context_budget
+from agent.devMateAgent.llm_cache import build_response_cache
+from agent.devMateAgent.events import (
+    TOOL_OUTPUT_PREVIEW_CHARS,
+    AgentEvent,
+    FinalMessage,
+    TokenDelta,
+    ToolCallEnd,
+    ToolCallStart,
+    print_events,
+)
 from utils.load_prompt import load_prompt
 
 
+# 命令行交互模式下的默认会话 ID（单用户）
+DEFAULT_THREAD_ID = "user_123"
+
+
 class SimpleAgent:
     """
     SimpleAgent 是一个面向工程实践的智能体封装类。
@@ -54,20 +75,31 @@ class SimpleAgent:
         self.llm_base_url = os.getenv("AI_BASE_URL", "")
         self.llm_model_name = os.getenv("MODEL_NAME", "")
 
+        # ===== 模型响应缓存（可选） =====
+        # 相同输入直接返回缓存的响应；确定性模式下固定 temperature=0，使缓存结果可稳定复用
+        self.response_cache = build_response_cache()
+        deterministic = (os.getenv("AGENT_LLM_DETERMINISTIC") or "0") == "1"
+
         # ===== 初始化大语言模型 =====
         # 启用 streaming 以支持实时输出
         self.model = ChatOpenAI(
             model=self.llm_model_name,
             api_key=self.llm_api_key,
             base_url=self.llm_base_url,
-            temperature=0.8,
+            temperature=0 if deterministic else 0.8,
             streaming=True,
+            cache=self.response_cache,
         )
 
         # ===== 初始化记忆存储（Checkpoint） =====
         # 在 LangGraph 中，记忆通过 checkpointer 实现
-        # InMemorySaver 适合本地调试或 Demo 场景
-        self.memory = InMemorySaver()
+        # 默认持久化到 SQLite（批量写入、仅保留最近的检查点、空闲会话移出内存），详见 checkpointer.py
+        self.memory = build_checkpointer()
+
+        # ===== 上下文预算控制 =====
+        # 长会话中每轮都会回放全部历史，超出预算时只向模型发送“摘要 + 最近几轮”，详见 context_budget.py
+        # 该中间件与 DeepAgents 内置摘要中间件同名，create_deep_agent 会用它原位替换内置的一层
+        self.context_budget = build_context_budget(self.model)
 
         # ===== 创建智能体实例 =====
         # DeepAgent 会自动将模型、工具和记忆整合到执行图中
@@ -76,25 +108,30 @@ class SimpleAgent:
             tools=tools,
             system_prompt=self.system_prompt,
             checkpointer=self.memory,
+            middleware=[self.context_budget] if self.context_budget else [],
         )
 
-        # ===== Agent 执行配置 =====
-        # thread_id 用于区分不同对话线程，是“记忆隔离”的关键
-        self.config = {"configurable": {"thread_id": "user_123"}}
+    def close(self) -> None:
+        """关闭记忆存储（将尚未提交的会话记录写入磁盘）与响应缓存（程序退出前调用）。"""
+        close = getattr(self.memory, "close", None)
+        if close is not None:
+            close()
+        if self.response_cache is not None:
+            self.response_cache.close()
 
-    async def stream(self, user_input: str):
+    @staticmethod
+    def _config(thread_id: str) -> dict:
         """
-        以流式方式与智能体进行交互。
+        构造 Agent 执行配置。
 
-        Args:
-            user_input: 用户输入的自然语言文本
-
-        Yields:
-            智能体在推理与生成过程中的实时输出结果
+        thread_id 用于区分不同对话线程，是“记忆隔离”的关键。
         """
+        return {"configurable": {"thread_id": thread_id}}
 
-        # 构造符合 LangGraph 规范的输入结构
-        input_payload = {
+    @staticmethod
+    def _input_payload(user_input: str) -> dict:
+        """构造符合 LangGraph 规范的输入结构。"""
+        return {
             "messages": [
                 {
                     "role": "user",
@@ -103,12 +140,71 @@ class SimpleAgent:
             ]
         }
 
-        # 以流式方式执行 Agent
-        async for chunk in self.agent.astream(
-            input_payload,
-            self.config,
-            stream_mode="values",
+    async def astream_events(
+        self, user_input: str, thread_id: str = DEFAULT_THREAD_ID
+    ) -> AsyncIterator[AgentEvent]:
+        """
+        以类型化事件流的方式执行一轮对话。
+
+        基于 LangGraph 的 messages 流模式获取 token 增量，
+        并借助 updates 流模式获取完整的工具调用与工具结果，不再在每一步序列化整个状态。
+
+        Args:
+            user_input: 用户输入的自然语言文本
+            thread_id: 会话 ID，不同会话的记忆互相隔离
+
+        Yields:
+            TokenDelta / ToolCallStart / ToolCallEnd / FinalMessage 事件
+        """
+        final_content = None
+
+        async for mode, chunk in self.agent.astream(
+            self._input_payload(user_input),
+            self._config(thread_id),
+            stream_mode=["messages", "updates"],
         ):
-            # pretty_print 主要用于开发与调试阶段，
-            # 生产环境中可替换为日志或前端事件推送
-            chunk["messages"][-1].pretty_print()
+            if mode == "messages":
+                message, _ = chunk
+                if isinstance(message, AIMessage) and message.text:
+                    yield TokenDelta(message.text)
+                continue
+
+            # updates：各节点本步写入的状态增量，从中提取完整的 AI 消息与工具结果
+            for update in chunk.values():
+                messages = update.get("messages") if isinstance(update, dict) else None
+                if not isinstance(messages, list):
+                    continue
+
+                for message in messages:
+                    if isinstance(message, AIMessage):
+                        for tool_call in message.tool_calls:
+                            yield ToolCallStart(
+                                call_id=tool_call["id"] or "",
+                                name=tool_call["name"],
+                                args=tool_call["args"],
+                            )
+                        if not message.tool_calls:
+                            final_content = message.text
+                    elif isinstance(message, ToolMessage):
+                        output = message.text
+                        if len(output) > TOOL_OUTPUT_PREVIEW_CHARS:
+                            output = output[:TOOL_OUTPUT_PREVIEW_CHARS] + "…"
+                        yield ToolCallEnd(
+                            call_id=message.tool_call_id,
+                            name=message.name or "",
+                            output=output,
+                            is_error=message.status == "error",
+                        )
+
+        if final_content is not None:
+            yield FinalMessage(final_content)
+
+    async def stream(self, user_input: str, thread_id: str = DEFAULT_THREAD_ID) -> None:
+        """
+        以流式方式与智能体进行交互，并将输出实时打印到终端（命令行交互模式使用）。
+
+        Args:
+            user_input: 用户输入的自然语言文本
+            thread_id: 会话 ID，默认使用命令行单用户会话
+        """
+        await print_events(self.astream_events(user_input, thread_id))
@@ -0,0 +1,393 @@
+"""
+RAG 检索基准测试：合成语料上的构建吞吐、查询延迟、内存峰值与召回率。
+
+模块职责：
+- 按指定规模（默认 1k / 10k chunk）生成确定性的中英文混合 Markdown 合成语料
+- 使用离线的 hashing Embedding 后端执行全量构建与无变化的增量构建，统计吞吐
+- 在纯向量与混合检索两种模式下执行查询负载，统计 p50 / p95 / p99 延迟与 recall@k
+- 将结果写入 JSON 文件，便于在不同提交之间对比性能回归
+
+设计说明：
+- 每个规模在独立子进程中运行，峰值 RSS（ru_maxrss）互不干扰；
+  构建阶段工作进程的峰值单独统计（children）
+- 查询取自语料中某个 chunk 的一段连续文本，命中条件为结果中包含该 chunk，
+  即“已知条目召回率”，不依赖人工标注
+- 查询向量缓存与结果缓存在基准中被禁用，测量的是冷查询的真实成本
+- 100k 规模的语料生成与构建需要数分钟，默认不运行；发布扩展性结果时使用 --large 追加 100k 规模
+
+使用方式（在项目根目录执行）：
+    python -m benchmarks.rag_benchmark
+    python -m benchmarks.rag_benchmark --large --index-type hnsw
+    python -m benchmarks.rag_benchmark --compare benchmarks/results/<旧结果>.json
+"""
+
+# ===== 标准库 =====
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import Dict, List
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# ===== 第三方库 =====
+import numpy as np
+
+
+# ===== 路径配置 =====
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = PROJECT_ROOT / "benchmarks" / "results"
+
+# 每个合成文件包含的章节数（每个章节切分为一个 chunk）
+SECTIONS_PER_FILE = 10
+
+# --large 追加的语料规模（chunk 数），用于回答检索成本随规模增长的问题
+LARGE_SIZE = 100000
+
+# 常用汉字，用于生成中文“词”
+_CJK_CHARS = (
+    "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动"
+    "同工也能下过子说产种面而方后多定行学法所民得经十三之进着等部度家电力里如水化高自"
+    "二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日"
+    "那社义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变"
+)
+
+
+def _build_vocabulary(rng: random.Random, size: int = 5000) -> List[str]:
+    """生成中英文混合词表（英文为随机字母组合，中文为两个汉字）。"""
+    words = []
+    for index in range(size):
+        if index % 2:
+            words.append(rng.choice(_CJK_CHARS) + rng.choice(_CJK_CHARS))
+        else:
+            length = rng.randint(3, 9)
+            words.append("".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(length)))
+    return words
+
+
+def generate_corpus(docs_dir: Path, n_chunks: int, seed: int = 42) -> List[Dict]:
+    """
+    生成合成 Markdown 语料。
+
+    词频服从 Zipf 分布，接近真实文档中“少量高频词 + 大量低频词”的特征。
+
+    Args:
+        docs_dir: 语料输出目录
+        n_chunks: 目标 chunk 数（按每节一个 chunk 生成）
+        seed: 随机种子
+
+    Returns:
+        章节记录列表，每项包含 source 与 body，用于生成查询
+    """
+    rng = random.Random(seed)
+    vocabulary = _build_vocabulary(rng)
+    weights = 1 / np.arange(1, len(vocabulary) + 1)
+    weights /= weights.sum()
+    np_rng = np.random.default_rng(seed)
+
+    sections: List[Dict] = []
+    n_files = (n_chunks + SECTIONS_PER_FILE - 1) // SECTIONS_PER_FILE
+
+    for file_index in range(n_files):
+        source = docs_dir / f"group_{file_index // 1000:03d}" / f"doc_{file_index:06d}.md"
+        source.parent.mkdir(parents=True, exist_ok=True)
+
+        parts = [f"# 合成文档 {file_index}\n"]
+        for section_index in range(SECTIONS_PER_FILE):
+            if len(sections) >= n_chunks:
+                break
+            words = np_rng.choice(vocabulary, size=rng.randint(40, 90), p=weights)
+            body = " ".join(words)
+            parts.append(f"### 章节 {file_index}-{section_index}\n{body}\n")
+            sections.append({"source": source.relative_to(docs_dir.parent.parent).as_posix(), "body": body})
+
+        source.write_text("\n".join(parts), encoding="utf-8")
+
+    return sections
+
+
+def _percentiles(samples_ms: List[float]) -> Dict[str, float]:
+    """计算延迟分位数（毫秒）。"""
+    values = np.asarray(samples_ms)
+    return {
+        "mean": round(float(values.mean()), 4),
+        "p50": round(float(np.percentile(values, 50)), 4),
+        "p95": round(float(np.percentile(values, 95)), 4),
+        "p99": round(float(np.percentile(values, 99)), 4),
+    }
+
+
+def _peak_rss_mb(who: int) -> float:
+    """读取进程峰值 RSS（MB，Linux 下 ru_maxrss 单位为 KB）。"""
+    peak = resource.getrusage(who).ru_maxrss
+    return round(peak / 1024 if sys.platform != "darwin" else peak / 1024 / 1024, 1)
+
+
+def run_single(n_chunks: int, args: argparse.Namespace) -> Dict:
+    """
+    在当前进程中完成单个规模的基准测试（由子进程调用）。
+
+    语料、索引与 chunk 存储写入临时目录（100k 规模可达数 GB），
+    测试结束后删除，指定 --keep 时保留以便排查。
+
+    Args:
+        n_chunks: 语料规模（chunk 数）
+        args: 命令行参数
+
+    Returns:
+        该规模的测试结果
+    """
+
+    workdir = Path(tempfile.mkdtemp(prefix=f"rag-bench-{n_chunks}-"))
+    try:
+        return _run_in_workdir(workdir, n_chunks, args)
+    finally:
+        os.chdir(PROJECT_ROOT)
+        if args.keep:
+            print(f"📁 测试产物保留在 {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _run_in_workdir(workdir: Path, n_chunks: int, args: argparse.Namespace) -> Dict:
+    """在指定工作目录中生成语料、构建索引并执行查询负载。"""
+
+    # 索引路径均为相对路径，在临时目录中构建，不影响项目自身的知识库
+    from knowledge_db.rag.ingest import ingest_documents
+    from knowledge_db.rag.retriever import LocalRAGRetriever
+
+    os.chdir(workdir)
+
+    # 离线后端 + 关闭进程内缓存，测量冷查询成本
+    os.environ.update(
+        EMBEDDING_BACKEND="hashing",
+        EMBEDDING_CACHE_PATH="",
+        RAG_QUERY_CACHE_SIZE="0",
+        RAG_RESULT_CACHE_SIZE="0",
+        RAG_RELOAD_INTERVAL="0",
+    )
+
+    started = time.perf_counter()
+    sections = generate_corpus(workdir / "knowledge_db" / "docs", n_chunks, seed=args.seed)
+    generate_seconds = time.perf_counter() - started
+
+    # ===== 构建：全量 + 无变化增量 =====
+    ingest_log = io.StringIO()
+    with redirect_stdout(ingest_log):
+        started = time.perf_counter()
+        ingest_documents("", "", full=True, workers=args.workers, index_type=args.index_type)
+        full_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        ingest_documents("", "", workers=args.workers, index_type=args.index_type)
+        noop_seconds = time.perf_counter() - started
+
+    meta = json.loads(
+        (workdir / "knowledge_db" / ".vector_db" / "index_meta.json").read_text(encoding="utf-8")
+    )
+    ingest_rss_mb = _peak_rss_mb(resource.RUSAGE_SELF)
+
+    # ===== 查询负载：从随机 chunk 中截取一段连续文本作为查询 =====
+    rng = random.Random(args.seed + 1)
+    queries = []
+    for section in rng.sample(sections, min(args.queries, len(sections))):
+        words = section["body"].split()
+        start = rng.randint(0, max(0, len(words) - args.query_words))
+        queries.append(
+            {"source": section["source"], "text": " ".join(words[start : start + args.query_words])}
+        )
+
+    modes = {}
+    for mode, hybrid in (("vector", "0"), ("hybrid", "1")):
+        os.environ["RAG_HYBRID"] = hybrid
+        retriever = LocalRAGRetriever("", "")
+
+        latencies_ms = []
+        hits = 0
+        for query in queries:
+            started = time.perf_counter()
+            results = retriever.search_knowledge_recall(
+                query["text"], k=args.k, score_threshold=float("inf")
+            )
+            latencies_ms.append((time.perf_counter() - started) * 1000)
+            hits += any(
+                item["来源"] == query["source"] and query["text"] in item["内容"]
+                for item in results
+            )
+
+        started = time.perf_counter()
+        retriever.search_knowledge_recall_batch(
+            [query["text"] for query in queries], k=args.k, score_threshold=float("inf")
+        )
+        batch_seconds = time.perf_counter() - started
+
+        modes[mode] = {
+            "latency_ms": _percentiles(latencies_ms),
+            f"recall@{args.k}": round(hits / len(queries), 4),
+            "batch_qps": round(len(queries) / batch_seconds, 1),
+            "lexical_fast_path_hits": retriever.lexical_fast_path_hits,
+        }
+
+    return {
+        "n_chunks": meta["ntotal"],
+        "n_files": (n_chunks + SECTIONS_PER_FILE - 1) // SECTIONS_PER_FILE,
+        "index_type": meta["index_type"],
+        "corpus_generate_seconds": round(generate_seconds, 3),
+        "ingest": {
+            "full_seconds": round(full_seconds, 3),
+            "chunks_per_second": round(meta["ntotal"] / full_seconds, 1),
+            "noop_incremental_seconds": round(noop_seconds, 3),
+            "ann_recall": meta.get("recall"),
+        },
+        "queries": len(queries),
+        "modes": modes,
+        "peak_rss_mb": {
+            "after_ingest": ingest_rss_mb,
+            "total": _peak_rss_mb(resource.RUSAGE_SELF),
+            "ingest_workers": _peak_rss_mb(resource.RUSAGE_CHILDREN),
+        },
+    }
+
+
+def _git_commit() -> str | None:
+    """读取当前提交哈希（非 git 环境下返回 None）。"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=PROJECT_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline: Dict, current: Dict) -> None:
+    """打印当前结果相对基线的变化（按规模对齐）。"""
+
+    def delta(old, new) -> str:
+        if not old:
+            return "n/a"
+        return f"{(new - old) / old * 100:+.1f}%"
+
+    baseline_runs = {run["n_chunks"]: run for run in baseline["results"]}
+    print(f"\n📈 对比基线 {baseline.get('commit')} → {current.get('commit')}")
+    for run in current["results"]:
+        old = baseline_runs.get(run["n_chunks"])
+        if old is None:
+            continue
+        print(
+            f"  {run['n_chunks']} chunks: 构建吞吐 "
+            f"{delta(old['ingest']['chunks_per_second'], run['ingest']['chunks_per_second'])}，"
+            f"峰值 RSS {delta(old['peak_rss_mb']['total'], run['peak_rss_mb']['total'])}"
+        )
+        for mode, stats in run["modes"].items():
+            old_stats = old["modes"].get(mode)
+            if old_stats:
+                print(
+                    f"    {mode}: p50 {delta(old_stats['latency_ms']['p50'], stats['latency_ms']['p50'])}，"
+                    f"p99 {delta(old_stats['latency_ms']['p99'], stats['latency_ms']['p99'])}"
+                )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="RAG 检索基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000], help="语料规模（chunk 数）")
+    parser.add_argument(
+        "--large", action="store_true", help=f"追加 {LARGE_SIZE} chunk 规模（耗时数分钟）"
+    )
+    parser.add_argument("--queries", type=int, default=200, help="每个规模的查询数")
+    parser.add_argument("--query-words", type=int, default=8, help="每条查询截取的词数")
+    parser.add_argument("--k", type=int, default=4, help="每条查询返回的结果数")
+    parser.add_argument(
+        "--index-type",
+        choices=["flat", "ivf_flat", "hnsw", "ivf_pq"],
+        default="flat",
+        help="ANN 索引类型",
+    )
+    parser.add_argument("--workers", type=int, default=None, help="构建时的工作进程数")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--output", type=Path, default=None, help="结果 JSON 路径")
+    parser.add_argument("--compare", type=Path, default=None, help="用于对比的基线结果 JSON")
+    parser.add_argument(
+        "--keep", action="store_true", help="保留临时目录中的语料与索引（默认测试结束后删除）"
+    )
+    parser.add_argument("--single", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # 子进程模式：运行单个规模并将结果输出到 stdout 最后一行
+    if args.single is not None:
+        print(json.dumps(run_single(args.single, args), ensure_ascii=False))
+        return
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {
+            "queries": args.queries,
+            "query_words": args.query_words,
+            "k": args.k,
+            "index_type": args.index_type,
+            "workers": args.workers,
+            "seed": args.seed,
+            "embedding_backend": "hashing",
+        },
+        "results": [],
+    }
+
+    sizes = list(args.sizes)
+    if args.large and LARGE_SIZE not in sizes:
+        sizes.append(LARGE_SIZE)
+
+    for size in sizes:
+        print(f"⏳ 正在测试 {size} chunks ...")
+        command = [sys.executable, "-m", "benchmarks.rag_benchmark", "--single", str(size)]
+        for name in ("queries", "query_words", "k", "index_type", "workers", "seed"):
+            value = getattr(args, name)
+            if value is not None:
+                command += [f"--{name.replace('_', '-')}", str(value)]
+        if args.keep:
+            command.append("--keep")
+
+        completed = subprocess.run(
+            command, cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+        )
+        if args.keep:
+            sys.stderr.write(completed.stderr)
+        run = json.loads(completed.stdout.strip().splitlines()[-1])
+        report["results"].append(run)
+
+        print(
+            f"✅ {run['n_chunks']} chunks：构建 {run['ingest']['chunks_per_second']} chunks/s，"
+            f"峰值 RSS {run['peak_rss_mb']['total']}MB"
+        )
+        for mode, stats in run["modes"].items():
+            latency = stats["latency_ms"]
+            print(
+                f"   {mode}: p50 {latency['p50']}ms / p95 {latency['p95']}ms / p99 {latency['p99']}ms，"
+                f"recall@{args.k} {stats[f'recall@{args.k}']}"
+            )
+
+    output = args.output or RESULTS_DIR / f"rag-{report['commit'] or 'nogit'}-{int(time.time())}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"💾 结果已写入 {output}")
+
+    if args.compare:
+        compare(json.loads(args.compare.read_text(encoding="utf-8")), report)
+
+
+if __name__ == "__main__":
+    main()
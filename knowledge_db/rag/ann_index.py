@@ -0,0 +1,406 @@
+"""
+FAISS 索引读写与 ANN 近似最近邻索引构建（RAG 公共组件）。
+
+模块职责：
+- 以原子替换方式写入索引文件，以内存映射（只读）方式加载索引文件
+- 基于精确（Flat）索引中的向量训练并构建 IVF-Flat / HNSW / IVF-PQ 索引
+- 将索引类型、构建参数与默认检索参数记录到索引元数据中
+- 在检索侧按元数据应用对应的检索参数（nprobe / efSearch）
+- 以留出查询样本评估 ANN 索引相对精确索引的 recall@k 与查询延迟
+
+设计说明：
+- Flat 索引始终保留为增量构建的“真值”，ANN 索引是每次构建后派生的只读产物，
+  二者使用相同的向量 ID，因此可以共用同一份 chunk 存储
+- 内存映射加载时索引数据留在操作系统页缓存中，多个工作进程共享同一份物理内存
+- 语料规模不足以训练所选索引时自动退回 Flat，并在元数据中如实记录
+- 所有参数均可通过环境变量配置
+"""
+
+# ===== 标准库 =====
+from pathlib import Path
+from typing import Dict
+import json
+import math
+import os
+import time
+
+# ===== 第三方库 =====
+import faiss
+import numpy as np
+
+
+# ANN 索引与元数据文件名（位于向量数据库目录下）
+ANN_INDEX_FILE_NAME = "index.ann.faiss"
+INDEX_META_FILE_NAME = "index_meta.json"
+
+# 支持的索引类型
+INDEX_TYPES = {"flat", "ivf_flat", "hnsw", "ivf_pq"}
+
+# 精确索引文件名（IndexIDMap + IndexFlatL2，增量构建的工作索引）
+FLAT_INDEX_FILE_NAME = "index.faiss"
+
+# faiss 建议每个聚类中心至少有约 39 个训练样本
+_MIN_POINTS_PER_CENTROID = 39
+
+# 只读内存映射加载标志：IO_FLAG_MMAP 作用于 IVF 倒排表，
+# IO_FLAG_MMAP_IFC 作用于 Flat / HNSW 等“扁平编码”存储（较旧的 faiss 版本不提供）
+_MMAP_FLAGS = (
+    faiss.IO_FLAG_MMAP
+    | getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+    | faiss.IO_FLAG_READ_ONLY
+)
+
+
+def new_flat_index(dimension: int):
+    """
+    创建增量构建使用的精确索引（支持按自定义 ID 写入与删除）。
+
+    Args:
+        dimension: 向量维度
+
+    Returns:
+        faiss.IndexIDMap 实例
+    """
+    return faiss.IndexIDMap(faiss.IndexFlatL2(dimension))
+
+
+def write_index_atomic(index, path: Path) -> None:
+    """
+    原子写入索引文件：先写临时文件再替换，已映射旧文件的进程不受影响。
+
+    Args:
+        index: faiss 索引
+        path: 目标文件路径
+    """
+    path = Path(path)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    faiss.write_index(index, str(tmp_path))
+    os.replace(tmp_path, path)
+
+
+def read_index_mmap(path: Path):
+    """
+    以只读内存映射方式加载索引，不支持映射的索引类型退回常规加载。
+
+    Args:
+        path: 索引文件路径
+
+    Returns:
+        faiss 索引
+    """
+    try:
+        return faiss.read_index(str(path), _MMAP_FLAGS)
+    except RuntimeError:
+        return faiss.read_index(str(path))
+
+
+def _unwrap(index):
+    """去掉 IndexIDMap 包装，返回底层索引。"""
+    if isinstance(index, faiss.IndexIDMap):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+def load_index_config(index_type: str | None = None) -> Dict:
+    """
+    从环境变量读取 ANN 索引配置。
+
+    支持的环境变量：
+    - RAG_INDEX_TYPE：flat / ivf_flat / hnsw / ivf_pq，默认 flat
+    - RAG_IVF_NLIST：IVF 聚类中心数，默认按 4 * sqrt(N) 估算
+    - RAG_PQ_M：PQ 子向量个数，默认 16（需整除向量维度）
+    - RAG_PQ_NBITS：PQ 每个子向量的编码位数，默认 8
+    - RAG_HNSW_M：HNSW 每个节点的邻居数，默认 32
+    - RAG_HNSW_EF_CONSTRUCTION：HNSW 构建时的候选队列长度，默认 200
+    - RAG_NPROBE：IVF 检索时探查的聚类数，默认 16
+    - RAG_EF_SEARCH：HNSW 检索时的候选队列长度，默认 64
+    - RAG_RECALL_SAMPLE / RAG_RECALL_K：recall 评估的查询样本数与 k，默认 200 / 4
+
+    Args:
+        index_type: 显式指定的索引类型，优先于环境变量
+
+    Returns:
+        配置字典
+    """
+
+    index_type = (index_type or os.getenv("RAG_INDEX_TYPE") or "flat").lower()
+    if index_type not in INDEX_TYPES:
+        raise ValueError(
+            f"不支持的索引类型: {index_type}，可选值: {sorted(INDEX_TYPES)}"
+        )
+
+    nlist = os.getenv("RAG_IVF_NLIST")
+    return {
+        "index_type": index_type,
+        "nlist": int(nlist) if nlist else None,
+        "pq_m": int(os.getenv("RAG_PQ_M") or 16),
+        "pq_nbits": int(os.getenv("RAG_PQ_NBITS") or 8),
+        "hnsw_m": int(os.getenv("RAG_HNSW_M") or 32),
+        "ef_construction": int(os.getenv("RAG_HNSW_EF_CONSTRUCTION") or 200),
+        "nprobe": int(os.getenv("RAG_NPROBE") or 16),
+        "ef_search": int(os.getenv("RAG_EF_SEARCH") or 64),
+        "recall_sample": int(os.getenv("RAG_RECALL_SAMPLE") or 200),
+        "recall_k": int(os.getenv("RAG_RECALL_K") or 4),
+    }
+
+
+def load_index_meta(vector_db_dir: Path) -> Dict | None:
+    """
+    读取索引元数据。
+
+    Args:
+        vector_db_dir: 向量数据库目录
+
+    Returns:
+        元数据字典；不存在时返回 None
+    """
+    meta_path = Path(vector_db_dir) / INDEX_META_FILE_NAME
+    if not meta_path.exists():
+        return None
+
+    with open(meta_path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save_index_meta(vector_db_dir: Path, meta: Dict) -> None:
+    """
+    原子写入索引元数据。
+
+    Args:
+        vector_db_dir: 向量数据库目录
+        meta: 元数据字典
+    """
+    meta_path = Path(vector_db_dir) / INDEX_META_FILE_NAME
+    tmp_path = meta_path.with_suffix(".json.tmp")
+
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(meta, file, ensure_ascii=False, indent=2)
+
+    os.replace(tmp_path, meta_path)
+
+
+def _resolve_build_params(config: Dict, n_train: int, dimension: int) -> Dict:
+    """
+    根据训练样本规模修正构建参数，无法满足训练要求时退回 Flat。
+
+    Returns:
+        实际使用的构建参数（包含最终的 index_type）
+    """
+
+    index_type = config["index_type"]
+    params: Dict = {"index_type": index_type}
+
+    if index_type in {"ivf_flat", "ivf_pq"}:
+        nlist = config["nlist"] or int(4 * math.sqrt(max(n_train, 1)))
+        # 训练样本不足时收缩聚类数，仍不足 1 个聚类则退回 Flat
+        nlist = min(nlist, n_train // _MIN_POINTS_PER_CENTROID)
+        if nlist < 1:
+            return {"index_type": "flat", "fallback_reason": "训练样本不足"}
+        params["nlist"] = nlist
+
+    if index_type == "ivf_pq":
+        pq_m = config["pq_m"]
+        if dimension % pq_m != 0:
+            raise ValueError(f"RAG_PQ_M={pq_m} 无法整除向量维度 {dimension}")
+        # PQ 码本训练至少需要 2^nbits 个样本
+        pq_nbits = min(config["pq_nbits"], int(math.log2(max(n_train, 2))))
+        params.update({"pq_m": pq_m, "pq_nbits": pq_nbits})
+
+    if index_type == "hnsw":
+        params.update(
+            {"hnsw_m": config["hnsw_m"], "ef_construction": config["ef_construction"]}
+        )
+
+    return params
+
+
+def _factory_string(params: Dict) -> str:
+    """将构建参数转换为 faiss.index_factory 描述串。"""
+    index_type = params["index_type"]
+    if index_type == "ivf_flat":
+        return f"IVF{params['nlist']},Flat"
+    if index_type == "ivf_pq":
+        return f"IVF{params['nlist']},PQ{params['pq_m']}x{params['pq_nbits']}"
+    if index_type == "hnsw":
+        # HNSW 不支持自定义 ID，需要 IDMap 包装
+        return f"IDMap,HNSW{params['hnsw_m']},Flat"
+    return "Flat"
+
+
+def apply_search_params(index, meta: Dict) -> None:
+    """
+    按索引元数据为 ANN 索引设置检索参数。
+
+    环境变量 RAG_NPROBE / RAG_EF_SEARCH 可在检索侧覆盖构建时记录的默认值。
+
+    Args:
+        index: faiss 索引
+        meta: 索引元数据
+    """
+
+    search_params = meta.get("search_params", {})
+    index_type = meta.get("index_type", "flat")
+
+    if index_type in {"ivf_flat", "ivf_pq"}:
+        nprobe = int(os.getenv("RAG_NPROBE") or search_params.get("nprobe", 16))
+        faiss.extract_index_ivf(index).nprobe = nprobe
+    elif index_type == "hnsw":
+        ef_search = int(os.getenv("RAG_EF_SEARCH") or search_params.get("ef_search", 64))
+        _unwrap(index).hnsw.efSearch = ef_search
+
+
+def evaluate_recall(exact_index, ann_index, queries: np.ndarray, k: int) -> Dict:
+    """
+    以精确索引的结果为真值，评估 ANN 索引的 recall@k 与平均查询延迟。
+
+    Args:
+        exact_index: 精确（Flat）索引
+        ann_index: ANN 索引
+        queries: 查询向量矩阵
+        k: 评估的 top-k
+
+    Returns:
+        包含 recall、平均延迟（毫秒）与样本数的字典
+    """
+
+    def timed_search(index):
+        started = time.perf_counter()
+        _, ids = index.search(queries, k)
+        return ids, (time.perf_counter() - started) * 1000 / len(queries)
+
+    exact_ids, exact_ms = timed_search(exact_index)
+    ann_ids, ann_ms = timed_search(ann_index)
+
+    hits = sum(
+        len(set(truth[truth >= 0]) & set(found[found >= 0]))
+        for truth, found in zip(exact_ids, ann_ids)
+    )
+    total = int((exact_ids >= 0).sum())
+
+    return {
+        "k": k,
+        "queries": len(queries),
+        "recall": hits / total if total else 1.0,
+        "exact_latency_ms": exact_ms,
+        "ann_latency_ms": ann_ms,
+    }
+
+
+def build_ann_index(
+    flat_index, vector_db_dir: Path, config: Dict, embedding: Dict | None = None
+) -> Dict:
+    """
+    基于 Flat 索引构建并保存 ANN 索引，同时写入索引元数据。
+
+    训练时留出一部分向量作为查询样本，用于评估 recall@k：评估时 ANN 索引与作为真值的精确索引
+    都只包含其余向量，避免查询命中自身而虚高 recall；评估完成后留出的向量再加入 ANN 索引，
+    保证 ANN 索引与 Flat 索引内容一致。
+
+    Args:
+        flat_index: 精确索引（IndexIDMap + IndexFlatL2）
+        vector_db_dir: 向量数据库目录
+        config: load_index_config 返回的配置
+        embedding: 构建向量所用的 Embedding 后端标识（检索时据此校验兼容性）
+
+    Returns:
+        写入磁盘的索引元数据
+    """
+
+    vector_db_dir = Path(vector_db_dir)
+    ntotal, dimension = flat_index.ntotal, flat_index.d
+
+    # 约 10% 的向量（不超过 RAG_RECALL_SAMPLE）留出作为 recall 评估的查询样本
+    sample_size = min(config["recall_sample"], max(ntotal // 10, 1)) if ntotal else 0
+    params = _resolve_build_params(config, ntotal - sample_size, dimension)
+
+    meta: Dict = {
+        "index_type": params["index_type"],
+        "requested_index_type": config["index_type"],
+        "build_params": params,
+        "search_params": {"nprobe": config["nprobe"], "ef_search": config["ef_search"]},
+        "ntotal": ntotal,
+        "dimension": dimension,
+        "embedding": embedding,
+    }
+
+    ann_path = vector_db_dir / ANN_INDEX_FILE_NAME
+    if params["index_type"] == "flat":
+        # Flat 直接使用原索引，清理之前遗留的 ANN 产物
+        ann_path.unlink(missing_ok=True)
+        save_index_meta(vector_db_dir, meta)
+        return meta
+
+    vectors = _unwrap(flat_index).reconstruct_n(0, ntotal)
+    ids = faiss.vector_to_array(flat_index.id_map)
+
+    # ===== 划分留出查询样本 =====
+    rng = np.random.default_rng(0)
+    held_out = rng.choice(ntotal, size=sample_size, replace=False)
+    train_mask = np.ones(ntotal, dtype=bool)
+    train_mask[held_out] = False
+
+    # ===== 训练并构建 ANN 索引 =====
+    started = time.perf_counter()
+    ann_index = faiss.index_factory(dimension, _factory_string(params), faiss.METRIC_L2)
+    if params["index_type"] == "hnsw":
+        _unwrap(ann_index).hnsw.efConstruction = params["ef_construction"]
+    if params["index_type"] == "ivf_pq":
+        # 多义码（polysemous）训练仅用于汉明距离过滤，检索中未使用，且训练耗时极高
+        ann_index.do_polysemous_training = False
+    if not ann_index.is_trained:
+        ann_index.train(vectors[train_mask])
+    ann_index.add_with_ids(vectors[train_mask], ids[train_mask])
+    build_seconds = time.perf_counter() - started
+
+    # ===== 评估 recall：留出的查询此时不在任何一个索引中 =====
+    apply_search_params(ann_index, meta)
+    if sample_size:
+        exact_index = new_flat_index(dimension)
+        exact_index.add_with_ids(vectors[train_mask], ids[train_mask])
+        meta["recall"] = evaluate_recall(
+            exact_index,
+            ann_index,
+            vectors[held_out],
+            min(config["recall_k"], ntotal - sample_size),
+        )
+        del exact_index
+
+    started = time.perf_counter()
+    ann_index.add_with_ids(vectors[held_out], ids[held_out])
+    meta["build_seconds"] = build_seconds + time.perf_counter() - started
+
+    # 先写索引再写元数据，元数据存在即代表对应的索引完整可用
+    write_index_atomic(ann_index, ann_path)
+    save_index_meta(vector_db_dir, meta)
+
+    return meta
+
+
+def load_serving_index(vector_db_dir: Path):
+    """
+    以内存映射方式加载检索使用的索引，并应用检索参数。
+
+    元数据声明了 ANN 类型且产物完整时加载 ANN 索引，否则加载精确索引。
+
+    Args:
+        vector_db_dir: 向量数据库目录
+
+    Returns:
+        (faiss 索引, 索引元数据或 None)
+    """
+
+    vector_db_dir = Path(vector_db_dir)
+    meta = load_index_meta(vector_db_dir)
+    flat_index = read_index_mmap(vector_db_dir / FLAT_INDEX_FILE_NAME)
+
+    ann_path = vector_db_dir / ANN_INDEX_FILE_NAME
+    if not meta or meta.get("index_type", "flat") == "flat" or not ann_path.exists():
+        return flat_index, meta
+
+    ann_index = read_index_mmap(ann_path)
+    if ann_index.ntotal != flat_index.ntotal:
+        # ANN 产物落后于精确索引（如构建中断），退回精确索引保证结果正确
+        return flat_index, meta
+
+    apply_search_params(ann_index, meta)
+    return ann_index, meta
@@ -0,0 +1,149 @@
+"""
+LRUCache：检索阶段的进程内缓存（RAG 公共组件）。
+
+模块职责：
+- 提供容量受限、可选 TTL 的线程安全 LRU 缓存
+- 统计命中 / 未命中 / 淘汰次数，便于根据实际负载调整缓存容量
+- 根据环境变量构建检索阶段使用的查询向量缓存与检索结果缓存
+
+设计说明：
+- 查询向量缓存位于持久化 Embedding 缓存（EmbeddingCache）之前：
+  进程内命中时既不访问 SQLite，也不请求服务商；未命中时再逐层回退
+- 检索结果缓存的键包含索引代际，新代际发布后旧结果自然失效，无需主动清理
+- 过期条目在读取时惰性删除；容量超限时淘汰最久未使用的条目
+"""
+
+# ===== 标准库 =====
+from collections import OrderedDict
+from typing import Any, Dict, Hashable
+import os
+import threading
+import time
+
+
+# 未命中时的哨兵值（缓存值本身可能为 None 或空列表）
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    线程安全的 LRU 缓存，支持可选的条目过期时间（TTL）。
+    """
+
+    def __init__(self, max_size: int, ttl: float | None = None):
+        """
+        Args:
+            max_size: 最大条目数，<= 0 表示禁用缓存
+            ttl: 条目存活时间（秒），为 None 或 <= 0 时永不过期
+        """
+        self.max_size = max_size
+        self.ttl = ttl if ttl and ttl > 0 else None
+
+        self._items: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        读取缓存条目，命中时将其标记为最近使用。
+
+        Args:
+            key: 缓存键
+            default: 未命中时的返回值
+
+        Returns:
+            缓存值或 default
+        """
+        with self._lock:
+            value, expires_at = self._items.get(key, (_MISSING, None))
+
+            if value is not _MISSING and expires_at is not None:
+                if time.monotonic() >= expires_at:
+                    del self._items[key]
+                    value = _MISSING
+
+            if value is _MISSING:
+                self.misses += 1
+                return default
+
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        写入缓存条目，超出容量时淘汰最久未使用的条目。
+
+        Args:
+            key: 缓存键
+            value: 缓存值
+        """
+        if self.max_size <= 0:
+            return
+
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._items[key] = (value, expires_at)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """清空缓存（统计计数保留）。"""
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        返回缓存统计信息。
+
+        Returns:
+            包含 size / max_size / hits / misses / evictions / hit_rate 的字典
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._items),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def build_query_cache() -> LRUCache:
+    """
+    根据环境变量构建查询向量缓存。
+
+    支持的环境变量：
+    - RAG_QUERY_CACHE_SIZE：最大缓存查询数，默认 1024（0 表示禁用）
+
+    Returns:
+        LRUCache 实例
+    """
+    return LRUCache(max_size=int(os.getenv("RAG_QUERY_CACHE_SIZE") or 1024))
+
+
+def build_result_cache() -> LRUCache:
+    """
+    根据环境变量构建检索结果缓存。
+
+    支持的环境变量：
+    - RAG_RESULT_CACHE_SIZE：最大缓存结果数，默认 256（0 表示禁用）
+    - RAG_RESULT_CACHE_TTL：结果存活时间（秒），默认 300
+
+    Returns:
+        LRUCache 实例
+    """
+    return LRUCache(
+        max_size=int(os.getenv("RAG_RESULT_CACHE_SIZE") or 256),
+        ttl=float(os.getenv("RAG_RESULT_CACHE_TTL") or 300),
+    )
@@ -0,0 +1,394 @@
+"""
+ChunkStore：基于 SQLite 的 chunk 文本与元数据存储（RAG 公共组件）。
+
+模块职责：
+- 以 FAISS 向量 ID 为主键保存 chunk 的文本、来源与元数据
+- 检索阶段仅按 top-k 命中的 ID 懒加载对应 chunk
+- 构建阶段支持批量写入、删除与存在性查询
+- 同步维护 chunk 文本的倒排表（BM25 词法检索使用，见 lexical.py）
+
+设计说明：
+- 取代 LangChain FAISS 的 pickle docstore：进程无需在启动时反序列化整个知识库，
+  加载成本与常驻内存不随语料规模增长
+- 写入在同一个事务中累积，直到调用 commit()，便于与索引文件的检查点保持一致
+- 只读模式通过 SQLite URI 打开，并启用 mmap，使多个进程共享操作系统页缓存
+- 倒排表记录分词器版本；版本缺失或变化时（如旧版本构建的存储），写入模式打开时自动重建
+"""
+
+# ===== 标准库 =====
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
+import json
+import sqlite3
+import threading
+
+# ===== 本地模块 =====
+from knowledge_db.rag.lexical import TOKENIZER_VERSION, term_frequencies
+
+
+# chunk 存储文件名（位于向量数据库目录下）
+CHUNK_STORE_FILE_NAME = "chunks.sqlite"
+
+# SQLite 单条语句可绑定的参数数量有限，批量操作时按此大小分段
+_SQLITE_PARAM_CHUNK = 500
+
+# 只读模式下的 mmap 大小（字节），超出部分仍走常规读取
+_MMAP_SIZE = 1 << 30
+
+
+class ChunkStore:
+    """
+    chunk 文本与元数据存储。
+
+    每行对应 FAISS 索引中的一个向量：
+        faiss_id（主键） | chunk_id | source | content | metadata(JSON)
+    """
+
+    def __init__(self, path: Path, read_only: bool = False):
+        """
+        打开（或创建）chunk 存储。
+
+        Args:
+            path: SQLite 文件路径
+            read_only: 是否以只读模式打开（检索阶段使用）
+        """
+        self.path = Path(path)
+        self.read_only = read_only
+        self._lock = threading.Lock()
+
+        if read_only:
+            self._conn = sqlite3.connect(
+                f"file:{self.path.as_posix()}?mode=ro",
+                uri=True,
+                check_same_thread=False,
+            )
+            self._conn.execute(f"PRAGMA mmap_size={_MMAP_SIZE}")
+            self.lexical_rebuilt = False
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                " faiss_id INTEGER PRIMARY KEY,"
+                " chunk_id TEXT NOT NULL,"
+                " source TEXT NOT NULL,"
+                " content TEXT NOT NULL,"
+                " metadata TEXT NOT NULL)"
+            )
+            # 倒排表：term -> (faiss_id, 词频)；文档长度单独存放
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS postings ("
+                " term TEXT NOT NULL,"
+                " faiss_id INTEGER NOT NULL,"
+                " tf INTEGER NOT NULL,"
+                " PRIMARY KEY (term, faiss_id)) WITHOUT ROWID"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS postings_faiss_id ON postings (faiss_id)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS lexical_docs ("
+                " faiss_id INTEGER PRIMARY KEY,"
+                " length INTEGER NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS store_meta ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL)"
+            )
+            self._conn.commit()
+
+            # 旧版本构建的存储没有倒排表（或分词规则已变化），就地重建
+            self.lexical_rebuilt = self._get_meta("tokenizer_version") != TOKENIZER_VERSION
+            if self.lexical_rebuilt:
+                self._rebuild_lexical_index()
+
+    def _chunked(self, ids: Sequence[int]) -> Iterator[List[int]]:
+        """按 SQLite 参数上限对 ID 列表分段。"""
+        ids = list(ids)
+        for start in range(0, len(ids), _SQLITE_PARAM_CHUNK):
+            yield ids[start : start + _SQLITE_PARAM_CHUNK]
+
+    def _get_meta(self, key: str) -> str | None:
+        """读取存储级元数据。"""
+        row = self._conn.execute(
+            "SELECT value FROM store_meta WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _index_terms(self, rows: Sequence[Tuple[int, str]]) -> None:
+        """为 (faiss_id, content) 写入倒排记录（调用方持有锁，且已清除旧记录）。"""
+        postings = []
+        lengths = []
+        for faiss_id, content in rows:
+            frequencies = term_frequencies(content)
+            postings.extend((term, faiss_id, tf) for term, tf in frequencies.items())
+            lengths.append((faiss_id, sum(frequencies.values())))
+
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO postings (term, faiss_id, tf) VALUES (?, ?, ?)",
+            postings,
+        )
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO lexical_docs (faiss_id, length) VALUES (?, ?)",
+            lengths,
+        )
+
+    def _unindex_terms(self, faiss_ids: Sequence[int]) -> None:
+        """删除给定 ID 的倒排记录（调用方持有锁）。"""
+        for part in self._chunked(faiss_ids):
+            placeholders = ",".join("?" * len(part))
+            self._conn.execute(
+                f"DELETE FROM postings WHERE faiss_id IN ({placeholders})", part
+            )
+            self._conn.execute(
+                f"DELETE FROM lexical_docs WHERE faiss_id IN ({placeholders})", part
+            )
+
+    def _rebuild_lexical_index(self) -> None:
+        """基于现有 chunk 重建整个倒排表。"""
+        with self._lock:
+            self._conn.execute("DELETE FROM postings")
+            self._conn.execute("DELETE FROM lexical_docs")
+
+            cursor = self._conn.execute("SELECT faiss_id, content FROM chunks")
+            while rows := cursor.fetchmany(_SQLITE_PARAM_CHUNK):
+                self._index_terms(rows)
+
+            self._conn.execute(
+                "INSERT OR REPLACE INTO store_meta (key, value) VALUES (?, ?)",
+                ("tokenizer_version", TOKENIZER_VERSION),
+            )
+            self._conn.commit()
+
+    def add_many(self, rows: Iterable[Tuple[int, str, str, str, dict]]) -> None:
+        """
+        批量写入 chunk 及其倒排记录（在 commit() 之前不会持久化）。
+
+        Args:
+            rows: (faiss_id, chunk_id, source, content, metadata) 序列
+        """
+        rows = list(rows)
+        with self._lock:
+            self._unindex_terms([row[0] for row in rows])
+            self._index_terms([(row[0], row[3]) for row in rows])
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks"
+                " (faiss_id, chunk_id, source, content, metadata)"
+                " VALUES (?, ?, ?, ?, ?)",
+                [
+                    (
+                        faiss_id,
+                        chunk_id,
+                        source,
+                        content,
+                        json.dumps(metadata, ensure_ascii=False),
+                    )
+                    for faiss_id, chunk_id, source, content, metadata in rows
+                ],
+            )
+
+    def delete_many(self, faiss_ids: Sequence[int]) -> int:
+        """
+        批量删除 chunk 及其倒排记录（在 commit() 之前不会持久化）。
+
+        Args:
+            faiss_ids: 待删除的向量 ID
+
+        Returns:
+            实际删除的行数
+        """
+        deleted = 0
+        with self._lock:
+            for part in self._chunked(faiss_ids):
+                placeholders = ",".join("?" * len(part))
+                cursor = self._conn.execute(
+                    f"DELETE FROM chunks WHERE faiss_id IN ({placeholders})", part
+                )
+                deleted += cursor.rowcount
+            self._unindex_terms(faiss_ids)
+        return deleted
+
+    def existing_ids(self, faiss_ids: Sequence[int]) -> set:
+        """
+        查询给定 ID 中已存在于存储中的部分。
+
+        Args:
+            faiss_ids: 向量 ID 列表
+
+        Returns:
+            已存在的向量 ID 集合
+        """
+        found = set()
+        with self._lock:
+            for part in self._chunked(faiss_ids):
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT faiss_id FROM chunks WHERE faiss_id IN ({placeholders})",
+                    part,
+                ).fetchall()
+                found.update(row[0] for row in rows)
+        return found
+
+    def all_ids(self) -> set:
+        """返回存储中的全部向量 ID。"""
+        with self._lock:
+            rows = self._conn.execute("SELECT faiss_id FROM chunks").fetchall()
+        return {row[0] for row in rows}
+
+    def get_many(self, faiss_ids: Sequence[int]) -> Dict[int, dict]:
+        """
+        按向量 ID 批量读取 chunk。
+
+        Args:
+            faiss_ids: 向量 ID 列表（通常为检索命中的 top-k）
+
+        Returns:
+            {faiss_id: {"chunk_id", "source", "content", "metadata"}} 字典
+        """
+        found: Dict[int, dict] = {}
+        with self._lock:
+            for part in self._chunked(faiss_ids):
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    "SELECT faiss_id, chunk_id, source, content, metadata FROM chunks"
+                    f" WHERE faiss_id IN ({placeholders})",
+                    part,
+                ).fetchall()
+                for faiss_id, chunk_id, source, content, metadata in rows:
+                    found[faiss_id] = {
+                        "chunk_id": chunk_id,
+                        "source": source,
+                        "content": content,
+                        "metadata": json.loads(metadata),
+                    }
+        return found
+
+    def ids_by_source(self) -> Dict[str, List[int]]:
+        """返回 {来源文件: [向量 ID, ...]}（从全量索引补建分片时使用）。"""
+        found: Dict[str, List[int]] = {}
+        with self._lock:
+            for faiss_id, source in self._conn.execute("SELECT faiss_id, source FROM chunks"):
+                found.setdefault(source, []).append(faiss_id)
+        return found
+
+    def routing_metadata(self, faiss_ids: Sequence[int]) -> Tuple[set, set]:
+        """
+        读取给定 chunk 的来源文件与三级标题（生成分片路由信息使用）。
+
+        Args:
+            faiss_ids: 向量 ID 列表（通常为一个分片的全部 ID）
+
+        Returns:
+            (来源文件集合, 三级标题集合)
+        """
+        sources, headers = set(), set()
+        with self._lock:
+            for part in self._chunked(faiss_ids):
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    "SELECT DISTINCT source, json_extract(metadata, '$.\"Header 3\"')"
+                    f" FROM chunks WHERE faiss_id IN ({placeholders})",
+                    part,
+                ).fetchall()
+                for source, header in rows:
+                    sources.add(source)
+                    if header:
+                        headers.add(header)
+        return sources, headers
+
+    def has_lexical_index(self) -> bool:
+        """判断存储中是否包含与当前分词规则一致的倒排表。"""
+        with self._lock:
+            exists = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'store_meta'"
+            ).fetchone()
+            return bool(exists) and self._get_meta("tokenizer_version") == TOKENIZER_VERSION
+
+    def lexical_stats(self) -> Tuple[int, float]:
+        """
+        返回 BM25 所需的全局统计量。
+
+        Returns:
+            (文档数, 平均文档长度)
+        """
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(length), 0) FROM lexical_docs"
+            ).fetchone()
+        return count, (total / count if count else 0.0)
+
+    def doc_lengths(self) -> List[Tuple[int, int]]:
+        """
+        读取全部文档长度（检索侧一次性加载到内存，避免每个倒排项都回表查询）。
+
+        Returns:
+            按 faiss_id 升序排列的 [(faiss_id, 文档长度), ...]
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT faiss_id, length FROM lexical_docs ORDER BY faiss_id"
+            ).fetchall()
+
+    def document_frequencies(self, terms: Iterable[str]) -> Dict[str, int]:
+        """
+        统计检索词的文档频率（一条查询完成，只扫描倒排表的主键索引）。
+
+        Args:
+            terms: 检索词集合
+
+        Returns:
+            {term: 包含该词的 chunk 数}，不含未出现在任何 chunk 中的检索词
+        """
+        terms = list(terms)
+        found: Dict[str, int] = {}
+        with self._lock:
+            for part in self._chunked(terms):
+                placeholders = ",".join("?" * len(part))
+                found.update(
+                    self._conn.execute(
+                        "SELECT term, COUNT(*) FROM postings"
+                        f" WHERE term IN ({placeholders}) GROUP BY term",
+                        part,
+                    ).fetchall()
+                )
+        return found
+
+    def postings(self, terms: Iterable[str]) -> List[Tuple[str, int, int]]:
+        """
+        读取检索词的倒排列表（一条查询读取全部检索词）。
+
+        Args:
+            terms: 检索词集合
+
+        Returns:
+            [(term, faiss_id, 词频), ...]
+        """
+        terms = list(terms)
+        rows: List[Tuple[str, int, int]] = []
+        with self._lock:
+            for part in self._chunked(terms):
+                placeholders = ",".join("?" * len(part))
+                rows.extend(
+                    self._conn.execute(
+                        "SELECT term, faiss_id, tf FROM postings"
+                        f" WHERE term IN ({placeholders})",
+                        part,
+                    ).fetchall()
+                )
+        return rows
+
+    def count(self) -> int:
+        """返回存储中的 chunk 数量。"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def commit(self) -> None:
+        """提交当前事务中累积的写入。"""
+        with self._lock:
+            self._conn.commit()
+
+    def close(self) -> None:
+        """关闭数据库连接（未提交的写入将被回滚）。"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,719 @@
+"""
+CachedBatchEmbeddings：带持久化缓存的批量并发 Embedding 层（RAG 公共组件）。
+
+模块职责：
+- 按服务商单次请求上限对文本进行分批
+- 在可配置的速率限制下并发提交多个批次，并对失败批次进行退避重试
+- 以 (模型名称, 规范化文本哈希) 为键，将向量持久化到本地 SQLite 缓存
+
+设计说明：
+- 以 LangChain Embeddings 接口对外暴露，Ingestion 与 Retrieval 阶段可直接替换使用
+- 相同文本（跨文件、跨构建）只会向服务商请求一次 Embedding
+- 文档向量与查询向量分开缓存（DashScope 对两者使用不同的 text_type）
+- 多条查询可通过 embed_queries 合并为一次请求（批量检索使用）
+- 查询向量提供原生异步路径（aembed_queries）：直接以 httpx.AsyncClient 调用
+  DashScope HTTP 接口，不占用事件循环线程，也不依赖默认线程池
+- 所有参数均可通过环境变量配置，未配置时使用保守的默认值
+- Embedding 后端可插拔（EMBEDDING_BACKEND）：DashScope（默认）、本地特征哈希（离线、确定性）
+  或本地 sentence-transformers 模型；后端标识写入索引元数据，加载不一致的索引时直接报错
+"""
+
+# ===== 标准库 =====
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Sequence
+import asyncio
+import hashlib
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import unicodedata
+import weakref
+
+# ===== 第三方库 =====
+import dashscope
+import httpx
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_community.embeddings import DashScopeEmbeddings
+from langchain_community.embeddings.dashscope import BATCH_SIZE, embed_with_retry
+
+# ===== 本地模块 =====
+from knowledge_db.rag.local_embedding import HashingEmbeddings
+from utils.rate_limit import RateLimiter
+
+
+logger = logging.getLogger(__name__)
+
+# ===== 路径配置 =====
+# Embedding 缓存默认位置（与向量数据库分离，全量重建索引时可继续复用）
+EMBEDDING_CACHE_PATH = Path("knowledge_db/.embedding_cache.sqlite")
+
+# SQLite 单条语句可绑定的参数数量有限，批量查询时按此大小分段
+_SQLITE_LOOKUP_CHUNK = 500
+
+# 支持的 Embedding 后端（EMBEDDING_BACKEND）
+EMBEDDING_BACKENDS = ("dashscope", "hashing", "sentence_transformers")
+
+# DashScope 文本向量 HTTP 接口路径（相对于 dashscope.base_http_api_url）
+DASHSCOPE_EMBEDDING_PATH = "/services/embeddings/text-embedding/text-embedding"
+
+
+def normalize_text(text: str) -> str:
+    """
+    规范化文本，用于计算缓存键。
+
+    统一 Unicode 形式并折叠空白字符，使仅有格式差异的文本命中同一缓存。
+
+    Args:
+        text: 原始文本
+
+    Returns:
+        规范化后的文本
+    """
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def text_cache_key(text: str) -> str:
+    """
+    计算文本的缓存键（规范化文本的 SHA-256 哈希）。
+
+    Args:
+        text: 原始文本
+
+    Returns:
+        十六进制哈希字符串
+    """
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    基于 SQLite 的 Embedding 持久化缓存。
+
+    向量以 float32 二进制形式存储，键为 (模型名称, 文本哈希)。
+    同一实例可在多个线程间共享。
+    """
+
+    def __init__(self, path: Path = EMBEDDING_CACHE_PATH):
+        """
+        打开（或创建）缓存数据库。
+
+        Args:
+            path: SQLite 文件路径
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL,"
+            " text_hash TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " PRIMARY KEY (model, text_hash))"
+        )
+        self._conn.commit()
+
+    def get_many(self, model: str, keys: Sequence[str]) -> Dict[str, List[float]]:
+        """
+        批量查询缓存。
+
+        Args:
+            model: 模型名称（含向量用途后缀）
+            keys: 文本哈希列表
+
+        Returns:
+            命中的 {文本哈希: 向量} 字典
+        """
+        found: Dict[str, List[float]] = {}
+        keys = list(keys)
+
+        with self._lock:
+            for start in range(0, len(keys), _SQLITE_LOOKUP_CHUNK):
+                part = keys[start : start + _SQLITE_LOOKUP_CHUNK]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    "SELECT text_hash, vector FROM embeddings"
+                    f" WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *part],
+                ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = np.frombuffer(blob, dtype=np.float32).tolist()
+
+        return found
+
+    def put_many(self, model: str, items: Dict[str, List[float]]) -> None:
+        """
+        批量写入缓存。
+
+        Args:
+            model: 模型名称（含向量用途后缀）
+            items: {文本哈希: 向量} 字典
+        """
+        if not items:
+            return
+
+        rows = [
+            (model, text_hash, np.asarray(vector, dtype=np.float32).tobytes())
+            for text_hash, vector in items.items()
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector)"
+                " VALUES (?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+
+class AsyncDashScopeEmbeddingClient:
+    """
+    DashScope 文本向量 HTTP 接口的异步客户端。
+
+    dashscope SDK 只提供同步调用，这里直接请求 HTTP 接口。
+    httpx.AsyncClient 与创建它的事件循环绑定，因此每个事件循环各自懒加载一个连接池
+    （以弱引用字典按事件循环保存，切换事件循环时不会替换、泄漏其他循环的连接池）。
+    """
+
+    def __init__(
+        self,
+        model: str,
+        api_key: str,
+        base_url: str | None = None,
+        timeout: float = 30.0,
+        max_connections: int = 10,
+    ):
+        """
+        Args:
+            model: Embedding 模型名称
+            api_key: DashScope API Key
+            base_url: 接口根地址，默认使用 dashscope SDK 的配置
+            timeout: 单次请求超时时间（秒）
+            max_connections: 连接池最大连接数
+        """
+        self.model = model
+        self.api_key = api_key
+        self.base_url = (base_url or dashscope.base_http_api_url).rstrip("/")
+        self.timeout = timeout
+        self.max_connections = max_connections
+
+        self._clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """获取当前事件循环对应的连接池。"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._clients.get(loop)
+            if client is None:
+                client = httpx.AsyncClient(
+                    base_url=self.base_url,
+                    timeout=self.timeout,
+                    headers={"Authorization": f"Bearer {self.api_key}"},
+                    limits=httpx.Limits(max_connections=self.max_connections),
+                )
+                self._clients[loop] = client
+        return client
+
+    async def embed(self, texts: List[str], text_type: str = "query") -> List[List[float]]:
+        """
+        单次请求为一批文本生成向量。
+
+        Args:
+            texts: 文本列表（不超过服务商单次请求上限）
+            text_type: 向量用途，query 或 document
+
+        Returns:
+            与输入一一对应的向量列表
+        """
+        response = await self._get_client().post(
+            DASHSCOPE_EMBEDDING_PATH,
+            json={
+                "model": self.model,
+                "input": {"texts": texts},
+                "parameters": {"text_type": text_type},
+            },
+        )
+
+        # 与 langchain DashScopeEmbeddings 保持一致：请求非法时抛出 ValueError（不重试）
+        if response.status_code in (400, 401):
+            raise ValueError(
+                f"status_code: {response.status_code} \n message: {response.text}"
+            )
+        response.raise_for_status()
+
+        items = sorted(
+            response.json()["output"]["embeddings"], key=lambda item: item["text_index"]
+        )
+        return [item["embedding"] for item in items]
+
+    async def aclose(self) -> None:
+        """关闭当前事件循环对应的连接池（在使用该客户端的事件循环中、退出前调用）。"""
+        with self._lock:
+            client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+
+class CachedBatchEmbeddings(Embeddings):
+    """
+    带持久化缓存、分批并发与退避重试的 Embedding 包装器。
+
+    只有缓存未命中的文本才会被发送给底层 Embedding 模型，
+    同一次调用中重复出现的文本也只会请求一次。
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model_name: str,
+        cache: EmbeddingCache | None = None,
+        batch_size: int = 10,
+        max_concurrency: int = 4,
+        requests_per_second: float = 5.0,
+        max_retries: int = 5,
+        async_client: AsyncDashScopeEmbeddingClient | None = None,
+        signature: Dict | None = None,
+    ):
+        """
+        Args:
+            embeddings: 底层 Embedding 模型（如 DashScopeEmbeddings）
+            model_name: 模型名称，作为缓存键的一部分
+            cache: 持久化缓存，为 None 时不使用缓存
+            batch_size: 单次请求的最大文本数量
+            max_concurrency: 同时进行中的请求批次数
+            requests_per_second: 每秒最大请求数，<= 0 表示不限速
+            max_retries: 单个批次失败后的最大重试次数
+            async_client: 查询向量的异步客户端，为 None 时异步调用退回线程池
+            signature: Embedding 后端标识（写入索引元数据），默认由 model_name 推导
+        """
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache = cache
+        self.batch_size = max(1, batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max(0, max_retries)
+        self.rate_limiter = RateLimiter(requests_per_second, burst=self.max_concurrency)
+        self.async_client = async_client
+        self.signature = signature or {"backend": "dashscope", "model": model_name}
+
+    def _retry_delay(self, attempt: int, exc: Exception) -> float:
+        """计算第 attempt 次重试前的退避时间，超过重试次数时重新抛出异常。"""
+        if attempt >= self.max_retries:
+            raise exc
+        delay = min(30.0, 2**attempt) + random.uniform(0, 0.5)
+        logger.warning(
+            "Embedding 请求失败（第 %d 次重试，%.1fs 后进行）: %s",
+            attempt + 1,
+            delay,
+            exc,
+        )
+        return delay
+
+    def _call_with_retry(self, func, *args):
+        """
+        在速率限制下调用底层模型，失败时按指数退避重试。
+
+        ValueError 表示请求本身非法（如鉴权失败），重试无意义，直接抛出。
+        """
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            try:
+                return func(*args)
+            except ValueError:
+                raise
+            except Exception as exc:
+                time.sleep(self._retry_delay(attempt, exc))
+                attempt += 1
+
+    async def _acall_with_retry(self, func, *args):
+        """_call_with_retry 的异步版本，func 为协程函数。"""
+        attempt = 0
+        while True:
+            await self.rate_limiter.aacquire()
+            try:
+                return await func(*args)
+            except ValueError:
+                raise
+            except Exception as exc:
+                await asyncio.sleep(self._retry_delay(attempt, exc))
+                attempt += 1
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        为文档文本生成向量（优先读取缓存）。
+
+        Args:
+            texts: 文档文本列表
+
+        Returns:
+            与输入一一对应的向量列表
+        """
+        if not texts:
+            return []
+
+        cache_model = f"{self.model_name}:document"
+        keys = [text_cache_key(text) for text in texts]
+
+        vectors: Dict[str, List[float]] = {}
+        if self.cache is not None:
+            vectors = self.cache.get_many(cache_model, set(keys))
+
+        # 未命中的文本按哈希去重，保持首次出现的顺序
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors and key not in missing:
+                missing[key] = text
+
+        if missing:
+            missing_keys = list(missing)
+            batches = [
+                missing_keys[start : start + self.batch_size]
+                for start in range(0, len(missing_keys), self.batch_size)
+            ]
+
+            def embed_batch(batch_keys: List[str]) -> List[List[float]]:
+                return self._call_with_retry(
+                    self.embeddings.embed_documents,
+                    [missing[key] for key in batch_keys],
+                )
+
+            with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+                for batch_keys, batch_vectors in zip(
+                    batches, executor.map(embed_batch, batches)
+                ):
+                    fresh = dict(zip(batch_keys, batch_vectors))
+                    if self.cache is not None:
+                        self.cache.put_many(cache_model, fresh)
+                    vectors.update(fresh)
+
+            logger.info(
+                "Embedding 完成：共 %d 条文本，缓存命中 %d 条，新请求 %d 条（%d 批）",
+                len(texts),
+                len(texts) - sum(1 for key in keys if key in missing),
+                len(missing),
+                len(batches),
+            )
+
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        为查询文本生成向量（优先读取缓存）。
+
+        Args:
+            text: 查询文本
+
+        Returns:
+            查询向量
+        """
+        cache_model = f"{self.model_name}:query"
+        key = text_cache_key(text)
+
+        if self.cache is not None:
+            cached = self.cache.get_many(cache_model, [key])
+            if key in cached:
+                return cached[key]
+
+        vector = self._call_with_retry(self.embeddings.embed_query, text)
+
+        if self.cache is not None:
+            self.cache.put_many(cache_model, {key: vector})
+
+        return vector
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        为多条查询文本生成向量（优先读取缓存），未命中的查询按批合并请求。
+
+        Args:
+            texts: 查询文本列表
+
+        Returns:
+            与输入一一对应的查询向量列表
+        """
+        if not texts:
+            return []
+
+        cache_model = f"{self.model_name}:query"
+        keys = [text_cache_key(text) for text in texts]
+
+        vectors: Dict[str, List[float]] = {}
+        if self.cache is not None:
+            vectors = self.cache.get_many(cache_model, set(keys))
+
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors and key not in missing:
+                missing[key] = text
+
+        missing_keys = list(missing)
+        for start in range(0, len(missing_keys), self.batch_size):
+            batch_keys = missing_keys[start : start + self.batch_size]
+            batch_vectors = self._call_with_retry(
+                self._embed_query_batch, [missing[key] for key in batch_keys]
+            )
+            fresh = dict(zip(batch_keys, batch_vectors))
+            if self.cache is not None:
+                self.cache.put_many(cache_model, fresh)
+            vectors.update(fresh)
+
+        return [vectors[key] for key in keys]
+
+    def _embed_query_batch(self, texts: List[str]) -> List[List[float]]:
+        """
+        单次请求为一批查询生成向量。
+
+        DashScope 的 query 类型向量支持批量输入；
+        其他底层模型没有批量查询接口，退回逐条调用 embed_query。
+        """
+        if isinstance(self.embeddings, DashScopeEmbeddings):
+            result = embed_with_retry(
+                self.embeddings,
+                input=texts,
+                text_type="query",
+                model=self.embeddings.model,
+            )
+            return [item["embedding"] for item in result]
+
+        return [self.embeddings.embed_query(text) for text in texts]
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        embed_queries 的异步版本。
+
+        配置了异步客户端时，未命中缓存的查询直接通过 httpx 异步请求；
+        否则退回在线程池中执行同步实现。
+
+        Args:
+            texts: 查询文本列表
+
+        Returns:
+            与输入一一对应的查询向量列表
+        """
+        if self.async_client is None:
+            return await asyncio.to_thread(self.embed_queries, texts)
+        if not texts:
+            return []
+
+        cache_model = f"{self.model_name}:query"
+        keys = [text_cache_key(text) for text in texts]
+
+        # 本地 SQLite 查询耗时为微秒级，直接在事件循环中执行
+        vectors: Dict[str, List[float]] = {}
+        if self.cache is not None:
+            vectors = self.cache.get_many(cache_model, set(keys))
+
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors and key not in missing:
+                missing[key] = text
+
+        missing_keys = list(missing)
+        batches = [
+            missing_keys[start : start + self.batch_size]
+            for start in range(0, len(missing_keys), self.batch_size)
+        ]
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def embed_batch(batch_keys: List[str]) -> List[List[float]]:
+            async with semaphore:
+                return await self._acall_with_retry(
+                    self.async_client.embed, [missing[key] for key in batch_keys]
+                )
+
+        for batch_keys, batch_vectors in zip(
+            batches, await asyncio.gather(*(embed_batch(batch) for batch in batches))
+        ):
+            fresh = dict(zip(batch_keys, batch_vectors))
+            if self.cache is not None:
+                self.cache.put_many(cache_model, fresh)
+            vectors.update(fresh)
+
+        return [vectors[key] for key in keys]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """
+        为查询文本异步生成向量（优先读取缓存）。
+
+        Args:
+            text: 查询文本
+
+        Returns:
+            查询向量
+        """
+        return (await self.aembed_queries([text]))[0]
+
+    async def aclose(self) -> None:
+        """关闭当前事件循环中的异步连接池（程序退出前调用）。"""
+        if self.async_client is not None:
+            await self.async_client.aclose()
+
+
+def embedding_signature(embeddings: Embeddings) -> Dict:
+    """
+    获取 Embedding 层的后端标识（写入索引元数据）。
+
+    Args:
+        embeddings: build_embeddings 返回的 Embedding 层
+
+    Returns:
+        后端标识字典，如 {"backend": "dashscope", "model": "text-embedding-v1"}
+    """
+    return getattr(embeddings, "signature", None) or {
+        "backend": type(embeddings).__name__
+    }
+
+
+def check_embedding_signature(recorded: Dict | None, embeddings: Embeddings) -> None:
+    """
+    校验索引构建时使用的 Embedding 后端与当前配置一致。
+
+    不同后端（或同一后端的不同模型 / 维度）产生的向量不在同一空间中，
+    混用只会得到无意义的检索结果，因此不一致时直接报错。
+
+    Args:
+        recorded: 索引元数据中记录的后端标识；旧版本构建的索引未记录时为 None
+        embeddings: 当前的 Embedding 层
+
+    Raises:
+        RuntimeError: 后端标识不一致
+    """
+    current = embedding_signature(embeddings)
+    if recorded is not None and recorded != current:
+        raise RuntimeError(
+            f"❌ 索引由 Embedding 后端 {recorded} 构建，与当前配置 {current} 不一致。"
+            "请检查 EMBEDDING_BACKEND / EMBEDDING_MODEL_NAME，"
+            "或执行 python -m knowledge_db.rag.ingest --full 重建索引。"
+        )
+
+
+def build_embeddings(model_name: str, api_key: str) -> Embeddings:
+    """
+    根据环境变量构建 Ingestion / Retrieval 共用的 Embedding 层。
+
+    支持的环境变量：
+    - EMBEDDING_BACKEND：dashscope（默认）/ hashing / sentence_transformers
+    - EMBEDDING_HASHING_DIM、EMBEDDING_HASHING_SEED：hashing 后端的维度（默认 512）与种子（默认 0）
+    - EMBEDDING_LOCAL_MODEL：sentence_transformers 后端的模型名称或本地路径
+    - 其余参数见 build_dashscope_embeddings
+
+    Args:
+        model_name: Embedding 模型名称（dashscope 后端使用）
+        api_key: DashScope API Key（dashscope 后端使用）
+
+    Returns:
+        Embedding 层实例
+    """
+
+    backend = (os.getenv("EMBEDDING_BACKEND") or "dashscope").lower()
+
+    if backend == "dashscope":
+        return build_dashscope_embeddings(model_name, api_key)
+
+    if backend == "hashing":
+        return HashingEmbeddings(
+            dimension=int(os.getenv("EMBEDDING_HASHING_DIM") or 512),
+            seed=int(os.getenv("EMBEDDING_HASHING_SEED") or 0),
+        )
+
+    if backend == "sentence_transformers":
+        return build_local_model_embeddings(os.getenv("EMBEDDING_LOCAL_MODEL", ""))
+
+    raise RuntimeError(
+        f"❌ 不支持的 Embedding 后端：{backend}，可选值：{', '.join(EMBEDDING_BACKENDS)}"
+    )
+
+
+def build_local_model_embeddings(local_model: str) -> CachedBatchEmbeddings:
+    """
+    构建基于本地 sentence-transformers 模型的 Embedding 层（可选依赖）。
+
+    Args:
+        local_model: 模型名称或本地路径
+
+    Returns:
+        CachedBatchEmbeddings 实例（本地推理不限速，仍复用持久化缓存）
+    """
+
+    if not local_model:
+        raise RuntimeError("❌ 使用 sentence_transformers 后端时必须设置 EMBEDDING_LOCAL_MODEL。")
+
+    # 延迟导入：仅使用本地模型时需要（优先使用独立的 langchain-huggingface 包）
+    try:
+        from langchain_huggingface import HuggingFaceEmbeddings
+    except ImportError:
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    try:
+        base_embeddings = HuggingFaceEmbeddings(
+            model_name=local_model,
+            encode_kwargs={"normalize_embeddings": True},
+        )
+    except ImportError as exc:
+        raise RuntimeError(
+            "❌ sentence_transformers 后端需要安装 sentence-transformers：pip install sentence-transformers"
+        ) from exc
+
+    cache_path = os.getenv("EMBEDDING_CACHE_PATH", str(EMBEDDING_CACHE_PATH))
+    return CachedBatchEmbeddings(
+        embeddings=base_embeddings,
+        model_name=f"sentence_transformers:{local_model}",
+        cache=EmbeddingCache(Path(cache_path)) if cache_path else None,
+        batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE") or 64),
+        max_concurrency=1,
+        requests_per_second=0,
+        max_retries=0,
+        signature={"backend": "sentence_transformers", "model": local_model},
+    )
+
+
+def build_dashscope_embeddings(model_name: str, api_key: str) -> CachedBatchEmbeddings:
+    """
+    根据环境变量构建基于 DashScope 的 Embedding 层。
+
+    支持的环境变量：
+    - EMBEDDING_BATCH_SIZE：单次请求文本数，默认取服务商上限
+    - EMBEDDING_MAX_CONCURRENCY：并发批次数，默认 4
+    - EMBEDDING_RATE_LIMIT：每秒最大请求数，默认 5（<= 0 表示不限速）
+    - EMBEDDING_MAX_RETRIES：失败批次最大重试次数，默认 5
+    - EMBEDDING_CACHE_PATH：缓存文件路径，设置为空字符串时禁用缓存
+
+    Args:
+        model_name: Embedding 模型名称
+        api_key: DashScope API Key
+
+    Returns:
+        CachedBatchEmbeddings 实例
+    """
+
+    provider_limit = BATCH_SIZE.get(model_name, 10)
+    batch_size = int(os.getenv("EMBEDDING_BATCH_SIZE") or provider_limit)
+
+    cache_path = os.getenv("EMBEDDING_CACHE_PATH", str(EMBEDDING_CACHE_PATH))
+    cache = EmbeddingCache(Path(cache_path)) if cache_path else None
+
+    # 重试由包装层统一负责，底层模型仅尝试一次，避免重试次数叠加
+    base_embeddings = DashScopeEmbeddings(
+        model=model_name,
+        dashscope_api_key=api_key,
+        max_retries=1,
+    )
+
+    return CachedBatchEmbeddings(
+        embeddings=base_embeddings,
+        model_name=model_name,
+        cache=cache,
+        batch_size=min(batch_size, provider_limit),
+        max_concurrency=int(os.getenv("EMBEDDING_MAX_CONCURRENCY") or 4),
+        requests_per_second=float(os.getenv("EMBEDDING_RATE_LIMIT") or 5),
+        max_retries=int(os.getenv("EMBEDDING_MAX_RETRIES") or 5),
+        async_client=AsyncDashScopeEmbeddingClient(model=model_name, api_key=api_key),
+    )
@@ -0,0 +1,138 @@
+"""
+索引代际（Generation）发布与定位（RAG 公共组件）。
+
+模块职责：
+- 在一次构建完成后，将工作索引快照发布为一个不可变的“代际”目录
+- 通过原子替换 CURRENT 指针文件切换当前代际
+- 为检索侧提供当前代际的定位与变更检测
+
+设计说明：
+- 工作目录（knowledge_db/.vector_db）由 Ingestion 独占读写；
+  检索侧只读取 generations/<代际ID>/ 下的快照，构建过程中不会读到半成品
+- 索引文件均以“写临时文件 + os.replace”方式更新，可直接硬链接进快照；
+  chunk 存储会被原地修改，因此通过 SQLite backup API 复制一致性快照
+- 类别分片同样硬链接进快照，只更新了一个类别时，其余分片在新旧代际间共享同一份文件
+- 旧代际按保留数量清理；仍被其他进程映射的文件在部分平台上无法删除，跳过即可
+"""
+
+# ===== 标准库 =====
+from pathlib import Path
+import os
+import shutil
+import sqlite3
+import time
+
+# ===== 本地模块 =====
+from knowledge_db.rag.ann_index import (
+    ANN_INDEX_FILE_NAME,
+    FLAT_INDEX_FILE_NAME,
+    INDEX_META_FILE_NAME,
+)
+from knowledge_db.rag.chunk_store import CHUNK_STORE_FILE_NAME
+from knowledge_db.rag.shards import SHARD_META_FILE_NAME, SHARDS_DIR_NAME, load_shard_meta
+
+
+# 代际目录与当前代际指针文件名（位于向量数据库目录下）
+GENERATIONS_DIR_NAME = "generations"
+CURRENT_FILE_NAME = "CURRENT"
+
+# 默认保留的代际数量（含当前代际）
+DEFAULT_KEEP_GENERATIONS = 3
+
+
+def read_current_generation(vector_db_dir: Path) -> str | None:
+    """
+    读取当前代际 ID。
+
+    Args:
+        vector_db_dir: 向量数据库目录
+
+    Returns:
+        代际 ID；尚未发布过代际时返回 None
+    """
+    current_path = Path(vector_db_dir) / CURRENT_FILE_NAME
+    try:
+        return current_path.read_text(encoding="utf-8").strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _link_or_copy(src: Path, dst: Path) -> None:
+    """优先硬链接（零拷贝），文件系统不支持时退回复制。"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def publish_generation(
+    vector_db_dir: Path, keep: int = DEFAULT_KEEP_GENERATIONS
+) -> str:
+    """
+    将工作目录中的索引快照发布为新的代际，并切换 CURRENT 指针。
+
+    Args:
+        vector_db_dir: 向量数据库目录
+        keep: 保留的代际数量（含新发布的代际）
+
+    Returns:
+        新代际 ID
+    """
+
+    vector_db_dir = Path(vector_db_dir)
+    generations_dir = vector_db_dir / GENERATIONS_DIR_NAME
+
+    generation = f"{time.time_ns() // 1_000_000:d}"
+    staging_dir = generations_dir / f".{generation}.tmp"
+    staging_dir.mkdir(parents=True, exist_ok=True)
+
+    # ===== 索引与元数据：原子替换写入的文件，直接硬链接 =====
+    for name in (FLAT_INDEX_FILE_NAME, ANN_INDEX_FILE_NAME, INDEX_META_FILE_NAME):
+        src = vector_db_dir / name
+        if src.exists():
+            _link_or_copy(src, staging_dir / name)
+
+    # ===== 类别分片：同样为原子替换写入，按元数据逐个硬链接 =====
+    shard_meta = load_shard_meta(vector_db_dir)
+    if shard_meta is not None:
+        shards_dir = vector_db_dir / SHARDS_DIR_NAME
+        (staging_dir / SHARDS_DIR_NAME).mkdir()
+        names = [entry["file"] for entry in shard_meta["shards"].values()]
+        for name in names + [SHARD_META_FILE_NAME]:
+            _link_or_copy(shards_dir / name, staging_dir / SHARDS_DIR_NAME / name)
+
+    # ===== chunk 存储：通过 backup API 复制一致性快照 =====
+    src_conn = sqlite3.connect(str(vector_db_dir / CHUNK_STORE_FILE_NAME))
+    dst_conn = sqlite3.connect(str(staging_dir / CHUNK_STORE_FILE_NAME))
+    try:
+        src_conn.backup(dst_conn)
+    finally:
+        dst_conn.close()
+        src_conn.close()
+
+    # 快照目录完整后再改名并切换指针，检索侧永远只能看到完整的代际
+    generation_dir = generations_dir / generation
+    os.replace(staging_dir, generation_dir)
+
+    current_path = vector_db_dir / CURRENT_FILE_NAME
+    tmp_path = current_path.with_suffix(".tmp")
+    tmp_path.write_text(generation, encoding="utf-8")
+    os.replace(tmp_path, current_path)
+
+    _prune_generations(generations_dir, keep)
+    return generation
+
+
+def _prune_generations(generations_dir: Path, keep: int) -> None:
+    """删除多余的旧代际及残留的临时目录。"""
+
+    finished = sorted(
+        (path for path in generations_dir.iterdir() if not path.name.startswith(".")),
+        key=lambda path: int(path.name),
+    )
+    stale = finished[: max(0, len(finished) - max(1, keep))]
+    stale += [path for path in generations_dir.iterdir() if path.name.startswith(".")]
+
+    for path in stale:
+        # 仍被其他进程打开的文件在部分平台上无法删除，留待下次清理
+        shutil.rmtree(path, ignore_errors=True)
@@ -2,15 +2,20 @@
 本模块用于初始化并构建本地知识库向量索引（RAG - Ingestion 阶段）。
 
 模块职责：
-- 从指定目录中加载本地文档（Markdown / Text）
+- 从指定目录（含子目录）中并行加载本地文档（Markdown / Text）
 - 对文档进行分块（Chunking）
 - 使用向量模型生成 Embedding
-- 构建并持久化向量数据库（FAISS）
+- 构建并持久化向量数据库（FAISS 索引 + SQLite chunk 存储）
 
 设计说明：
 - 当前采用 FAISS 作为本地向量存储，适合单机 / Demo / 面试场景
 - 文档切分策略针对 Markdown 标题结构进行了简单优化
-- Embedding 模型通过参数注入，便于后续替换
+- Embedding 模型通过参数注入，便于后续替换；向量经批量并发请求生成并持久化缓存
+- 通过增量清单（manifest.json）记录文件与 chunk 哈希，重复构建时仅向量化变更部分
+- 采用流式管道按固定批次写入索引并定期落盘检查点，内存占用与语料规模无关，中断后可续建
+- chunk 写入 SQLite 存储时同步构建 BM25 倒排表，供检索阶段的混合检索与词法快速路径使用
+- 除全量索引外，按类别（docs 子目录或文件）维护独立的索引分片，只重写发生变化的分片；
+  可通过 --category 仅处理指定类别的文档
 
 特别说明：
 - 构建知识库时，一个MD文件代表一类前端代码生成规范。若想生成多类网站规范，请直接添加MD即可。
@@ -18,16 +23,51 @@
 """
 
 # ===== 标准库 =====
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from pathlib import Path
+from typing import Iterable, Iterator, List, Tuple
+import argparse
+import json
 import os
+import shutil
+import time
 
 # ===== 第三方库 =====
 from dotenv import load_dotenv
+from langchain_core.documents import Document
 from langchain_community.document_loaders import TextLoader
 from langchain_text_splitters import MarkdownHeaderTextSplitter
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import DashScopeEmbeddings
-from langchain_community.vectorstores import FAISS
+import faiss
+import numpy as np
+
+# ===== 本地模块 =====
+from knowledge_db.rag.ann_index import (
+    FLAT_INDEX_FILE_NAME,
+    build_ann_index,
+    load_index_config,
+    load_index_meta,
+    new_flat_index,
+    write_index_atomic,
+)
+from knowledge_db.rag.chunk_store import CHUNK_STORE_FILE_NAME, ChunkStore
+from knowledge_db.rag.embedding import (
+    build_embeddings,
+    check_embedding_signature,
+    embedding_signature,
+    text_cache_key,
+)
+from knowledge_db.rag.generations import publish_generation, read_current_generation
+from knowledge_db.rag.legacy import LEGACY_EMBEDDING_BACKEND, has_legacy_index, read_legacy_index
+from knowledge_db.rag.manifest import (
+    IngestManifest,
+    chunk_faiss_id,
+    hash_text,
+    make_chunk_id,
+)
+from knowledge_db.rag.shards import SHARDS_DIR_NAME, ShardSet
 
 
 # ===== 路径配置 =====
@@ -37,84 +77,714 @@ KB_DIR = Path("knowledge_db/docs")
 # 向量数据库持久化目录
 VECTOR_DB_DIR = Path("knowledge_db/.vector_db")
 
+# 参与构建的文档类型
+SUPPORTED_SUFFIXES = {".md", ".txt"}
 
-def ingest_documents(model_name: str, dashscope_api_key: str) -> None:
+
+class StageTimer:
     """
-    执行知识库文档的向量化与索引构建。
+    分阶段耗时统计。
+
+    同一阶段可以多次累加（例如多个工作进程各自的切分耗时）。
+    """
+
+    def __init__(self):
+        self.durations: dict = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        """累加指定阶段的耗时。"""
+        self.durations[stage] = self.durations.get(stage, 0.0) + seconds
+
+    def report(self) -> str:
+        """生成单行耗时报告。"""
+        return "，".join(
+            f"{stage} {seconds:.2f}s" for stage, seconds in self.durations.items()
+        )
+
+
+@lru_cache(maxsize=1)
+def get_splitters() -> Tuple[MarkdownHeaderTextSplitter, RecursiveCharacterTextSplitter]:
+    """
+    获取当前进程内复用的切分器。
+
+    切分器本身无状态，每个（工作）进程只需构建一次。
+
+    Returns:
+        (Markdown 标题切分器, 字符长度切分器)
+    """
+    headers_to_split_on = [("###", "Header 3")]
+    markdown_splitter = MarkdownHeaderTextSplitter(
+        headers_to_split_on=headers_to_split_on, strip_headers=False
+    )
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=100)
+    return markdown_splitter, text_splitter
+
+
+def split_documents(docs_from_file: List[Document]) -> List[Document]:
+    """
+    对单个文件加载得到的文档执行两级切分。
 
-    该函数会完成以下流程：
-    1. 加载本地 Markdown / Text 文档
-    2. 按指定规则进行文本切分
-    3. 使用 Embedding 模型生成向量
-    4. 构建 FAISS 向量索引并保存到本地
+    1. 按 Markdown 三级标题进行逻辑切分
+    2. 对超长块按字符长度进行二次切分
 
     Args:
-        model_name: Embedding 模型名称
-        dashscope_api_key: DashScope API Key
+        docs_from_file: TextLoader 加载得到的文档列表
+
+    Returns:
+        切分后的 chunk 列表（保留 source 与标题元数据）
     """
 
-    all_chunks = []  # 用于存放最终切分好的 chunk
+    chunks: List[Document] = []
+    markdown_splitter, text_splitter = get_splitters()
 
-    # ===== 加载本地文档 =====
-    for file_path in KB_DIR.glob("*"):
-        if file_path.suffix in {".md", ".txt"}:
-            loader = TextLoader(str(file_path), encoding="utf-8")
-            # 注意：load() 返回的是 List[Document]
-            docs_from_file = loader.load()
+    for doc in docs_from_file:
+        # 1. 提取原始元数据（包含 source）
+        original_metadata = doc.metadata
+
+        # 2. 执行 Markdown 逻辑切分
+        # 注意：这里返回的是 List[Document]，metadata 里只有 Header 信息
+        md_header_splits = markdown_splitter.split_text(doc.page_content)
+
+        # 3. 手动将原始元数据（source）补回给每一个 md_split 对象
+        for md_split in md_header_splits:
+            # 合并字典：保留 Header 标题，同时加入原始的 source 信息
+            md_split.metadata.update(original_metadata)
+
+        # 4. 执行二次切分（处理超长块）
+        # split_documents 会自动保留已有的 metadata
+        chunks.extend(text_splitter.split_documents(md_header_splits))
+
+    return chunks
+
+
+def load_and_split_file(task: Tuple[str, str | None]) -> dict:
+    """
+    加载并切分单个文件（在工作进程中执行）。
+
+    若文件内容哈希与清单记录一致，则跳过切分，由主进程保留其已有向量。
+
+    Args:
+        task: (文件路径, 清单中记录的内容哈希或 None)
+
+    Returns:
+        包含 source、content_hash、chunks（未变更时为 None）及各阶段耗时的字典
+    """
+
+    file_path, known_hash = task
+
+    started = time.perf_counter()
+    loader = TextLoader(file_path, encoding="utf-8")
+    # 注意：load() 返回的是 List[Document]
+    docs_from_file = loader.load()
+    content_hash = hash_text("".join(doc.page_content for doc in docs_from_file))
+    load_seconds = time.perf_counter() - started
+
+    chunks = None
+    split_seconds = 0.0
+    if content_hash != known_hash:
+        started = time.perf_counter()
+        chunks = split_documents(docs_from_file)
+        split_seconds = time.perf_counter() - started
+
+    return {
+        "source": Path(file_path).as_posix(),
+        "content_hash": content_hash,
+        "chunks": chunks,
+        "load_seconds": load_seconds,
+        "split_seconds": split_seconds,
+    }
+
+
+def iter_kb_files(kb_dir: Path = KB_DIR) -> List[Path]:
+    """
+    递归收集知识库目录下的所有可入库文件。
+
+    结果按路径排序，保证多次构建的处理顺序（以及索引内容）一致。
+
+    Args:
+        kb_dir: 知识库根目录
+
+    Returns:
+        文件路径列表
+    """
+    return sorted(
+        (
+            path
+            for path in kb_dir.rglob("*")
+            if path.is_file() and path.suffix in SUPPORTED_SUFFIXES
+        ),
+        key=lambda path: path.as_posix(),
+    )
+
+
+def load_and_split_all(
+    file_paths: List[Path], manifest: IngestManifest, workers: int
+) -> Iterator[dict]:
+    """
+    将加载与切分分发到进程池中执行。
+
+    结果严格按输入顺序产出，合并顺序与文件排序一致，与工作进程数量无关。
+    同一时刻仅有有限个文件处于处理中，下游消费缓慢时不会在内存中堆积切分结果。
+    workers 为 1 时直接在当前进程执行，避免进程启动开销。
+
+    Args:
+        file_paths: 待处理文件列表（已排序）
+        manifest: 增量清单，用于跳过未变更文件的切分
+        workers: 工作进程数量
+
+    Yields:
+        load_and_split_file 的结果字典
+    """
+
+    tasks = (
+        (str(path), manifest.content_hash(path.as_posix())) for path in file_paths
+    )
+
+    if workers <= 1 or len(file_paths) <= 1:
+        yield from map(load_and_split_file, tasks)
+        return
+
+    # 处理中的文件窗口：每个工作进程最多预取两个文件
+    window = workers * 2
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight: deque = deque()
+        for task in tasks:
+            in_flight.append(executor.submit(load_and_split_file, task))
+            if len(in_flight) >= window:
+                yield in_flight.popleft().result()
+
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+def assign_chunk_ids(source: str, chunks: List[Document]) -> List[dict]:
+    """
+    为文件内的每个 chunk 计算哈希与确定性 ID。
+
+    Args:
+        source: 文件相对路径（清单中的键）
+        chunks: 该文件切分得到的 chunk 列表
+
+    Returns:
+        与 chunks 一一对应的记录列表，每项包含 hash 与 id
+    """
+
+    records: List[dict] = []
+    occurrences: dict = {}
+
+    for chunk in chunks:
+        # 标题元数据同样影响检索结果，因此一并纳入哈希
+        chunk_hash = hash_text(
+            chunk.page_content
+            + "\0"
+            + json.dumps(chunk.metadata, ensure_ascii=False, sort_keys=True)
+        )
+        occurrence = occurrences.get(chunk_hash, 0)
+        occurrences[chunk_hash] = occurrence + 1
+
+        records.append(
+            {"hash": chunk_hash, "id": make_chunk_id(source, chunk_hash, occurrence)}
+        )
+
+    return records
 
-            # ===== 文本切分（针对每个文件） =====
-            headers_to_split_on = [("###", "Header 3")]
-            markdown_splitter = MarkdownHeaderTextSplitter(
-                headers_to_split_on=headers_to_split_on, strip_headers=False
-            )
 
-            for doc in docs_from_file:
-                # 1. 提取原始元数据（包含 source）
-                original_metadata = doc.metadata
+class IndexWriter:
+    """
+    流式索引写入器。
 
-                # 2. 执行 Markdown 逻辑切分
-                # 注意：这里返回的是 List[Document]，metadata 里只有 Header 信息
-                md_header_splits = markdown_splitter.split_text(doc.page_content)
+    负责把 chunk 按固定批次送入 Embedding、FAISS 索引（全量索引与所属类别的分片）
+    与 chunk 存储，并周期性地一起落盘（检查点）。内存中仅保留当前批次的 chunk 与向量。
 
-                # 3. 手动将原始元数据（source）补回给每一个 md_split 对象
-                for md_split in md_header_splits:
-                    # 合并字典：保留 Header 标题，同时加入原始的 source 信息
-                    md_split.metadata.update(original_metadata)
+    一致性约定：
+    - 清单只记录“所有 chunk 均已写入索引”的文件
+    - 写入以 chunk ID 幂等：chunk 存储中已存在的 ID 会被跳过
+    - 检查点按 索引文件 → 分片 → chunk 存储提交 → 清单 的顺序落盘，
+      启动时再以 chunk 存储为准修正索引与分片中多出的向量
+    因此中断后重新执行即可从最近的检查点继续，已写入的 chunk 不会重复向量化。
+    """
 
-                # 4. 执行二次切分（处理超长块）
-                # split_documents 会自动保留已有的 metadata
-                text_splitter = RecursiveCharacterTextSplitter(
-                    chunk_size=800, chunk_overlap=100
+    def __init__(
+        self,
+        embeddings,
+        manifest: IngestManifest,
+        index,
+        store: ChunkStore,
+        shards: ShardSet,
+        timer: StageTimer,
+        batch_size: int,
+        checkpoint_every: int,
+    ):
+        """
+        Args:
+            embeddings: Embedding 模型
+            manifest: 增量清单（仅在文件完整写入后更新）
+            index: 已有的精确索引，全量构建时为 None
+            store: chunk 存储
+            shards: 按类别划分的索引分片
+            timer: 阶段耗时统计
+            batch_size: 每批向量化并写入索引的 chunk 数量
+            checkpoint_every: 每写入多少批落盘一次
+        """
+        self.embeddings = embeddings
+        self.manifest = manifest
+        self.index = index
+        self.store = store
+        self.shards = shards
+        self.timer = timer
+        self.batch_size = max(1, batch_size)
+        self.checkpoint_every = max(1, checkpoint_every)
+
+        self._buffer: List[Tuple[Document, str, str]] = []  # (chunk, id, source)
+        self._pending_deletes: set = set()
+        self._pending_files: dict = {}  # source -> 待完成文件记录
+        self._pending_removals: List[str] = []
+        self._batches_since_checkpoint = 0
+
+        self.added = 0
+        self.deleted = 0
+        self.changed = False
+
+        self._reconcile()
+
+        # 旧版本构建的向量库没有分片，从全量索引中补建
+        self.shards_bootstrapped = shards.missing and self.index is not None
+        if self.shards_bootstrapped:
+            shards.bootstrap(self.index, store)
+
+    def _reconcile(self) -> None:
+        """
+        以 chunk 存储为准修正索引。
+
+        索引文件与分片先于 chunk 存储提交，若两者之间发生中断，索引中会多出
+        未提交 chunk 的向量，这里将其移除，避免续建时产生重复向量。
+        """
+        if self.index is None:
+            return
+
+        valid_ids = self.store.all_ids()
+        index_ids = set(faiss.vector_to_array(self.index.id_map).tolist())
+        stale = index_ids - valid_ids
+        if stale:
+            self.index.remove_ids(np.array(sorted(stale), dtype=np.int64))
+        self.shards.reconcile(valid_ids)
+
+    def delete(self, chunk_ids) -> None:
+        """登记需要删除的 chunk ID，在下一次批量写入时生效。"""
+        self._pending_deletes.update(chunk_faiss_id(chunk_id) for chunk_id in chunk_ids)
+
+    def add_file(self, source: str, content_hash: str, chunks, records) -> None:
+        """
+        登记一个新增或变更的文件。
+
+        Args:
+            source: 文件相对路径
+            content_hash: 文件内容哈希
+            chunks: 切分结果
+            records: assign_chunk_ids 生成的记录
+        """
+        existing = self.store.existing_ids(
+            [chunk_faiss_id(record["id"]) for record in records]
+        )
+
+        outstanding = 0
+        for chunk, record in zip(chunks, records):
+            if chunk_faiss_id(record["id"]) in existing:
+                # 内容未变的 chunk（或上次中断前已写入的 chunk）直接复用
+                continue
+            self._buffer.append((chunk, record["id"], source))
+            outstanding += 1
+
+        self._pending_files[source] = {
+            "content_hash": content_hash,
+            "records": records,
+            "outstanding": outstanding,
+        }
+        self.changed = True
+
+        while len(self._buffer) >= self.batch_size:
+            self._flush_batch(self._buffer[: self.batch_size])
+            del self._buffer[: self.batch_size]
+
+    def remove_file(self, source: str) -> None:
+        """登记一个已从知识库目录移除的文件。"""
+        self.delete(self.manifest.chunk_ids(source))
+        self._pending_removals.append(source)
+        self.changed = True
+
+    def _flush_batch(self, batch: List[Tuple[Document, str, str]]) -> None:
+        """对一批 chunk 执行向量化与索引写入，并更新已完成文件的清单记录。"""
+
+        texts = [chunk.page_content for chunk, _, _ in batch]
+
+        started = time.perf_counter()
+        vectors = self.embeddings.embed_documents(texts) if texts else []
+        self.timer.add("向量化", time.perf_counter() - started)
+
+        started = time.perf_counter()
+        if self._pending_deletes:
+            delete_ids = sorted(self._pending_deletes)
+            self.deleted += self.store.delete_many(delete_ids)
+            if self.index is not None:
+                self.index.remove_ids(np.array(delete_ids, dtype=np.int64))
+            self.shards.remove_ids(delete_ids)
+            self._pending_deletes.clear()
+
+        if batch:
+            matrix = np.asarray(vectors, dtype=np.float32)
+            faiss_ids = [chunk_faiss_id(chunk_id) for _, chunk_id, _ in batch]
+
+            if self.index is None:
+                self.index = new_flat_index(matrix.shape[1])
+            self.index.add_with_ids(matrix, np.array(faiss_ids, dtype=np.int64))
+
+            # 同一批次可能跨越多个类别，按类别分组写入各自的分片
+            rows_by_category: dict = {}
+            for row, (_, _, source) in enumerate(batch):
+                category = self.shards.category_of(source)
+                rows_by_category.setdefault(category, []).append(row)
+            for category, rows in rows_by_category.items():
+                self.shards.add(
+                    category,
+                    matrix[rows],
+                    np.array([faiss_ids[row] for row in rows], dtype=np.int64),
                 )
-                chunks = text_splitter.split_documents(md_header_splits)
 
-                all_chunks.extend(chunks)
+            self.store.add_many(
+                (faiss_id, chunk_id, source, chunk.page_content, chunk.metadata)
+                for faiss_id, (chunk, chunk_id, source) in zip(faiss_ids, batch)
+            )
+            self.added += len(batch)
+
+            for _, _, source in batch:
+                self._pending_files[source]["outstanding"] -= 1
+
+        # 所有 chunk 均已写入的文件，才更新其清单记录
+        for source, entry in list(self._pending_files.items()):
+            if entry["outstanding"] == 0:
+                self.manifest.update_file(source, entry["content_hash"], entry["records"])
+                del self._pending_files[source]
+
+        for source in self._pending_removals:
+            self.manifest.remove_file(source)
+        self._pending_removals.clear()
+
+        self.timer.add("索引写入", time.perf_counter() - started)
+
+        self._batches_since_checkpoint += 1
+        if self._batches_since_checkpoint >= self.checkpoint_every:
+            self.checkpoint()
+
+    def checkpoint(self) -> None:
+        """将索引、分片、chunk 存储与清单依次落盘，保证清单记录的 chunk 一定可检索。"""
+        if self.index is None:
+            return
+
+        started = time.perf_counter()
+        write_index_atomic(self.index, VECTOR_DB_DIR / FLAT_INDEX_FILE_NAME)
+        self.shards.save(self.store)
+        self.store.commit()
+        self.manifest.save(VECTOR_DB_DIR)
+        self._batches_since_checkpoint = 0
+        self.timer.add("索引写入", time.perf_counter() - started)
+
+    def finish(self) -> None:
+        """
+        写入剩余批次，清理孤儿向量并执行最终检查点。
+
+        孤儿向量来自上一次中断时尚未完整写入、之后又被删除或修改的文件。
+        """
+        self._flush_batch(self._buffer)
+        self._buffer = []
+
+        referenced = set()
+        for source in self.manifest.files:
+            referenced.update(
+                chunk_faiss_id(chunk_id) for chunk_id in self.manifest.chunk_ids(source)
+            )
+        orphans = self.store.all_ids() - referenced
+        if orphans:
+            self._pending_deletes.update(orphans)
+            self._flush_batch([])
+
+        self.checkpoint()
 
-    if not all_chunks:
-        print("⚠️ 未发现可用文档或切分失败。")
+
+def seed_cache_from_legacy_index(embeddings) -> None:
+    """
+    将旧版（LangChain FAISS + pickle docstore）索引中的向量导入 Embedding 缓存。
+
+    旧版索引无法增量升级，只能全量重建；预先把其向量写入缓存后，
+    重建过程中相同文本直接命中缓存，无需重新请求 Embedding 服务。
+
+    旧版索引由 DashScope 构建，只有当前后端同为 DashScope 且向量维度一致时才导入，
+    否则缓存中会混入其他向量空间的向量。旧版文件随仓库提交，导入后保留不删除。
+
+    Args:
+        embeddings: build_embeddings 返回的 Embedding 层
+    """
+
+    if not has_legacy_index(VECTOR_DB_DIR) or getattr(embeddings, "cache", None) is None:
+        return
+    if embedding_signature(embeddings).get("backend") != LEGACY_EMBEDDING_BACKEND:
+        return
+
+    index, documents = read_legacy_index(VECTOR_DB_DIR)
+    vectors = index.reconstruct_n(0, index.ntotal)
+    items = {
+        text_cache_key(doc.page_content): vectors[position].tolist()
+        for position, doc in enumerate(documents)
+    }
+
+    namespace = f"{embeddings.model_name}:document"
+    if len(embeddings.cache.get_many(namespace, list(items))) == len(items):
+        return
+
+    # 同一后端的不同模型维度可能不同，以一次查询向量探测当前模型的维度
+    dimension = len(embeddings.embed_query(documents[0].page_content)) if documents else 0
+    if dimension != index.d:
+        print(f"⚠️ 旧版索引向量维度 {index.d} 与当前模型维度 {dimension} 不一致，跳过导入。")
         return
 
+    embeddings.cache.put_many(namespace, items)
+    print(f"♻️ 已从旧版索引导入 {len(items)} 条向量到 Embedding 缓存。")
+
+
+def ingest_documents(
+    model_name: str,
+    dashscope_api_key: str,
+    full: bool = False,
+    workers: int | None = None,
+    batch_size: int | None = None,
+    checkpoint_every: int | None = None,
+    index_type: str | None = None,
+    categories: Iterable[str] | None = None,
+) -> None:
+    """
+    执行知识库文档的向量化与索引构建。
+
+    该函数以流式管道完成以下流程（加载 → 切分 → 向量化 → 写入）：
+    1. 并行加载本地 Markdown / Text 文档，并与增量清单比对内容哈希
+    2. 对新增或变更的文件按指定规则进行文本切分
+    3. 以固定批次对新增 chunk 生成向量并写入 FAISS 索引与 chunk 存储，删除已失效的向量
+    4. 周期性地将索引与清单落盘，中断后重新执行即可断点续建
+    5. 按配置基于 Flat 索引派生 ANN 索引（IVF-Flat / HNSW / IVF-PQ），并输出 recall 评估
+    6. 将索引快照发布为新的代际，检索侧在不中断服务的情况下切换
+
+    指定 categories 时仅扫描这些类别的文档（新增、变更与删除均只涉及对应分片），
+    其余类别的文档与分片保持不动。
+
+    Args:
+        model_name: Embedding 模型名称
+        dashscope_api_key: DashScope API Key
+        full: 是否忽略清单，强制全量重建索引
+        workers: 加载与切分的工作进程数，默认读取 INGEST_WORKERS 或 CPU 核数
+        batch_size: 每批写入索引的 chunk 数，默认读取 INGEST_BATCH_SIZE 或 256
+        checkpoint_every: 每写入多少批执行一次检查点，默认读取 INGEST_CHECKPOINT_EVERY 或 20
+        index_type: ANN 索引类型，默认读取 RAG_INDEX_TYPE 或 flat
+        categories: 仅处理的类别列表，默认处理全部类别
+    """
+
+    categories = set(categories) if categories else None
+    if full and categories:
+        raise RuntimeError("❌ 全量重建会清空所有类别的索引，不能与指定类别同时使用。")
+
+    if workers is None:
+        workers = int(os.getenv("INGEST_WORKERS") or os.cpu_count() or 1)
+    if batch_size is None:
+        batch_size = int(os.getenv("INGEST_BATCH_SIZE") or 256)
+    if checkpoint_every is None:
+        checkpoint_every = int(os.getenv("INGEST_CHECKPOINT_EVERY") or 20)
+
+    timer = StageTimer()
+    index_config = load_index_config(index_type)
+
     # ===== 初始化 Embedding 模型 =====
-    embeddings = DashScopeEmbeddings(
-        model=model_name,
-        dashscope_api_key=dashscope_api_key,
+    # 带缓存的批量并发 Embedding 层，相同文本不会重复请求
+    embeddings = build_embeddings(model_name, dashscope_api_key)
+
+    # ===== 加载增量清单与已有索引 =====
+    # 清单缺失、版本不兼容或索引文件不存在时，均退化为全量重建
+    seed_cache_from_legacy_index(embeddings)
+    manifest = None if full else IngestManifest.load(VECTOR_DB_DIR)
+    flat_index_path = VECTOR_DB_DIR / FLAT_INDEX_FILE_NAME
+    chunk_store_path = VECTOR_DB_DIR / CHUNK_STORE_FILE_NAME
+    index = None
+
+    if manifest is not None and flat_index_path.exists() and chunk_store_path.exists():
+        # 增量构建要求已有向量与当前 Embedding 后端处于同一向量空间
+        meta = load_index_meta(VECTOR_DB_DIR)
+        check_embedding_signature(meta.get("embedding") if meta else None, embeddings)
+        index = faiss.read_index(str(flat_index_path))
+    else:
+        manifest = IngestManifest()
+        # 全量重建：清理旧的索引产物，从空索引开始
+        for path in (flat_index_path, chunk_store_path, VECTOR_DB_DIR / "manifest.json"):
+            path.unlink(missing_ok=True)
+        shutil.rmtree(VECTOR_DB_DIR / SHARDS_DIR_NAME, ignore_errors=True)
+
+    shards = ShardSet(VECTOR_DB_DIR, KB_DIR)
+    writer = IndexWriter(
+        embeddings=embeddings,
+        manifest=manifest,
+        index=index,
+        store=ChunkStore(chunk_store_path),
+        shards=shards,
+        timer=timer,
+        batch_size=batch_size,
+        checkpoint_every=checkpoint_every,
     )
+    current_sources = set()
+    unchanged_files = 0
+
+    # ===== 流式加载、切分并写入 =====
+    file_paths = iter_kb_files()
+    if categories is not None:
+        file_paths = [
+            path for path in file_paths if shards.category_of(path.as_posix()) in categories
+        ]
+
+    for result in load_and_split_all(file_paths, manifest, workers):
+        source = result["source"]
+        current_sources.add(source)
+        timer.add("加载", result["load_seconds"])
+        timer.add("切分", result["split_seconds"])
+
+        chunks = result["chunks"]
+        if chunks is None:
+            # 文件内容未变化，其向量保持不动
+            unchanged_files += 1
+            continue
+
+        records = assign_chunk_ids(source, chunks)
+
+        # 对比新旧 chunk ID：消失的删除，其余交给写入器幂等处理
+        current_ids = {record["id"] for record in records}
+        writer.delete(set(manifest.chunk_ids(source)) - current_ids)
+        writer.add_file(source, result["content_hash"], chunks, records)
+
+    # 已从知识库目录移除的文件，其向量全部删除
+    for source in list(manifest.files):
+        if categories is not None and shards.category_of(source) not in categories:
+            continue
+        if source not in current_sources:
+            writer.remove_file(source)
+
+    if not writer.changed and writer.index is not None:
+        print(f"✅ 知识库无变化（{unchanged_files} 个文件未变更），跳过索引构建。")
+        if writer.shards_bootstrapped:
+            writer.checkpoint()
+            print(f"🧩 已从全量索引补建 {len(shards.indexes)} 个类别分片。")
+        # 文档未变化但更换了索引类型时，仍需重新派生 ANN 索引
+        meta = load_index_meta(VECTOR_DB_DIR)
+        if (
+            not meta
+            or meta.get("requested_index_type") != index_config["index_type"]
+            or meta.get("embedding") is None
+        ):
+            _build_ann(writer.index, index_config, timer, embeddings)
+            _publish(timer)
+        elif (
+            read_current_generation(VECTOR_DB_DIR) is None
+            or writer.store.lexical_rebuilt
+            or writer.shards_bootstrapped
+        ):
+            # 尚未发布过代际，或旧存储刚补建了倒排表 / 分片
+            _publish(timer)
+        print(f"⏱️ 阶段耗时：{timer.report()}")
+        return
 
-    # ===== 构建向量数据库 =====
-    vectorstore = FAISS.from_documents(all_chunks, embeddings)
+    writer.finish()
 
-    # 持久化向量索引到本地
-    vectorstore.save_local(VECTOR_DB_DIR)
+    if writer.index is None:
+        print("⚠️ 未发现可用文档或切分失败。")
+        return
+
+    print(
+        f"✅ 成功向量化并索引 {writer.added} 个新文本块，"
+        f"删除 {writer.deleted} 个失效文本块，{unchanged_files} 个文件未变更。"
+    )
+    _build_ann(writer.index, index_config, timer, embeddings)
+    _publish(timer)
+    print(f"⏱️ 阶段耗时：{timer.report()}")
 
-    print(f"✅ 成功向量化并索引 {len(all_chunks)} 个文本块。")
+
+def _publish(timer: StageTimer) -> None:
+    """将工作索引发布为新的代际，检索侧会自动切换到新代际。"""
+
+    started = time.perf_counter()
+    generation = publish_generation(VECTOR_DB_DIR)
+    timer.add("发布", time.perf_counter() - started)
+    print(f"🚀 已发布索引代际 {generation}。")
+
+
+def _build_ann(index, index_config: dict, timer: StageTimer, embeddings) -> None:
+    """派生 ANN 索引并打印 recall / 延迟评估结果。"""
+
+    started = time.perf_counter()
+    meta = build_ann_index(
+        index, VECTOR_DB_DIR, index_config, embedding=embedding_signature(embeddings)
+    )
+    timer.add("ANN 构建", time.perf_counter() - started)
+
+    if meta["build_params"].get("fallback_reason"):
+        print(
+            f"⚠️ 索引类型 {index_config['index_type']} 无法构建"
+            f"（{meta['build_params']['fallback_reason']}），已退回 flat。"
+        )
+
+    recall = meta.get("recall")
+    if recall:
+        print(
+            f"📊 {meta['index_type']} 索引 recall@{recall['k']} = {recall['recall']:.3f}"
+            f"（{recall['queries']} 条留出查询），平均延迟 "
+            f"{recall['ann_latency_ms']:.3f}ms（精确索引 {recall['exact_latency_ms']:.3f}ms）"
+        )
 
 
 if __name__ == "__main__":
     """
     脚本入口：
-    用于在本地一次性完成知识库的初始化构建。
+    用于在本地完成知识库的初始化构建或增量更新。
+
+    使用方式（在项目根目录执行）：
+        python -m knowledge_db.rag.ingest          # 增量更新
+        python -m knowledge_db.rag.ingest --full   # 强制全量重建
+        python -m knowledge_db.rag.ingest --category vue   # 仅更新指定类别
     """
 
+    parser = argparse.ArgumentParser(description="构建本地知识库向量索引")
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="忽略增量清单，强制全量重建索引",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="加载与切分的工作进程数（默认读取 INGEST_WORKERS 或 CPU 核数）",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=None,
+        help="每批向量化并写入索引的文本块数量（默认读取 INGEST_BATCH_SIZE 或 256）",
+    )
+    parser.add_argument(
+        "--index-type",
+        choices=["flat", "ivf_flat", "hnsw", "ivf_pq"],
+        default=None,
+        help="ANN 索引类型（默认读取 RAG_INDEX_TYPE 或 flat）",
+    )
+    parser.add_argument(
+        "--category",
+        action="append",
+        default=None,
+        help="仅处理指定类别（docs 下的子目录名或文件名，不含扩展名），可重复指定",
+    )
+    args = parser.parse_args()
+
     # 1. 获取当前脚本的绝对路径
     current_file_path = Path(__file__).resolve()
 
@@ -135,10 +805,17 @@ if __name__ == "__main__":
     EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "")
     EMBEDDING_MODEL_KEY = os.getenv("EMBEDDING_MODEL_KEY", "")
 
-    if not EMBEDDING_MODEL_KEY:
+    # 仅 DashScope 后端需要 API Key；本地后端可在离线环境中构建索引
+    backend = (os.getenv("EMBEDDING_BACKEND") or "dashscope").lower()
+    if backend == "dashscope" and not EMBEDDING_MODEL_KEY:
         raise RuntimeError("❌ 未检测到 EMBEDDING_MODEL_KEY，请先配置环境变量。")
 
     ingest_documents(
         model_name=EMBEDDING_MODEL_NAME,
         dashscope_api_key=EMBEDDING_MODEL_KEY,
+        full=args.full,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        index_type=args.index_type,
+        categories=args.category,
     )
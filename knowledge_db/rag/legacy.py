@@ -0,0 +1,104 @@
+"""
+旧版向量库（LangChain FAISS + pickle docstore）的兼容读取（RAG 公共组件）。
+
+模块职责：
+- 识别仅包含旧版产物（index.faiss + index.pkl）、尚未按新格式构建的向量库
+- 读取旧版索引中的向量与文档，供检索侧临时使用、供构建阶段导入 Embedding 缓存
+
+设计说明：
+- 仓库自带的预构建索引为旧版格式；新格式（chunk 存储 + 索引元数据）需执行一次 ingest 生成。
+  在此之前检索器直接使用旧版索引，全新克隆的仓库无需构建即可检索
+- 旧版索引由 DashScope Embedding 构建且未记录后端标识，只有当前后端同为 DashScope 时才能使用
+- 旧版文件随仓库一起提交，此处只读取、不删除；执行 ingest 后新格式产物优先
+- 旧版 docstore 通过 pickle 反序列化，只应读取仓库自带或自行构建的文件
+"""
+
+# ===== 标准库 =====
+from pathlib import Path
+from typing import List, Tuple
+import pickle
+
+# ===== 第三方库 =====
+import faiss
+from langchain_core.documents import Document
+
+# ===== 本地模块 =====
+from knowledge_db.rag.ann_index import FLAT_INDEX_FILE_NAME
+from knowledge_db.rag.chunk_store import CHUNK_STORE_FILE_NAME, ChunkStore
+
+
+# 旧版 docstore 文件名（位于向量数据库目录下）
+LEGACY_DOCSTORE_FILE_NAME = "index.pkl"
+
+# 构建旧版索引使用的 Embedding 后端
+LEGACY_EMBEDDING_BACKEND = "dashscope"
+
+
+def has_legacy_index(vector_db_dir: Path) -> bool:
+    """
+    判断向量库目录中是否只有旧版索引（尚未按新格式构建）。
+
+    Args:
+        vector_db_dir: 向量数据库目录
+
+    Returns:
+        存在旧版 docstore 与索引文件，且没有新格式的 chunk 存储时返回 True
+    """
+    vector_db_dir = Path(vector_db_dir)
+    return (
+        (vector_db_dir / LEGACY_DOCSTORE_FILE_NAME).exists()
+        and (vector_db_dir / FLAT_INDEX_FILE_NAME).exists()
+        and not (vector_db_dir / CHUNK_STORE_FILE_NAME).exists()
+    )
+
+
+def read_legacy_index(vector_db_dir: Path) -> Tuple[object, List[Document]]:
+    """
+    读取旧版索引。
+
+    Args:
+        vector_db_dir: 向量数据库目录
+
+    Returns:
+        (faiss 索引, 与向量位置一一对应的文档列表)
+    """
+    vector_db_dir = Path(vector_db_dir)
+    index = faiss.read_index(str(vector_db_dir / FLAT_INDEX_FILE_NAME))
+    with open(vector_db_dir / LEGACY_DOCSTORE_FILE_NAME, "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+
+    if len(index_to_docstore_id) != index.ntotal:
+        raise RuntimeError(
+            f"❌ 旧版索引不完整：{index.ntotal} 个向量对应 {len(index_to_docstore_id)} 条文档"
+        )
+    documents = [docstore.search(index_to_docstore_id[position]) for position in range(index.ntotal)]
+    return index, documents
+
+
+def _posix_source(source: str) -> str:
+    """旧版索引可能在 Windows 上构建，统一来源路径的分隔符。"""
+    return source.replace("\\", "/")
+
+
+def load_legacy_serving_index(vector_db_dir: Path) -> Tuple[object, ChunkStore]:
+    """
+    加载旧版索引供检索使用：向量 ID 即向量位置，chunk 写入内存中的 ChunkStore。
+
+    Args:
+        vector_db_dir: 向量数据库目录
+
+    Returns:
+        (faiss 索引, 内存中的 ChunkStore)
+    """
+    index, documents = read_legacy_index(vector_db_dir)
+
+    store = ChunkStore(Path(":memory:"))
+    rows = []
+    for position, doc in enumerate(documents):
+        metadata = dict(doc.metadata)
+        source = _posix_source(metadata.get("source", ""))
+        metadata["source"] = source
+        rows.append((position, str(doc.id or position), source, doc.page_content, metadata))
+    store.add_many(rows)
+    store.commit()
+    return index, store
@@ -0,0 +1,265 @@
+"""
+BM25Searcher：基于 SQLite 倒排索引的本地词法检索（RAG 公共组件）。
+
+模块职责：
+- 提供中英文混合文本的分词（英文标识符整词保留，中文按二元组切分）
+- 基于 chunk 存储中的倒排表执行 BM25 检索，无需任何远程调用
+- 提供倒排结果与向量结果的倒数排名融合（RRF），以及“词法结果足够可信”的判断
+
+设计说明：
+- 倒排表与 chunk 文本存放在同一个 SQLite 文件中，由 ChunkStore 在写入 / 删除时同步维护，
+  因此随索引代际一起发布，天然与向量索引保持一致
+- 中文没有空格分词，采用重叠二元组（bigram）近似分词，不依赖额外的分词库
+- 英文标识符（如 RAG_INDEX_TYPE、app.get）统一小写，下划线连接的标识符同时保留整词与各组成部分
+- 快速路径判定：查询较短、最佳命中覆盖了全部查询词，且完全匹配的 chunk 数不超过 k，
+  此时词法结果已足以回答，可跳过 Embedding 请求
+- 检索开销控制：文档频率超过上限比例的检索词（常见中文二元组等）区分度极低、倒排列表却覆盖大半语料，
+  视为停用词不参与打分；其余检索词的倒排列表一条 SQL 读出，文档长度常驻内存，以 numpy 向量化打分
+- 混合检索默认关闭（RAG_HYBRID=0）：即使做了上述优化，词法检索仍明显慢于纯向量检索，按需开启
+"""
+
+# ===== 标准库 =====
+from collections import Counter
+from typing import Dict, List, NamedTuple, Sequence
+import math
+import os
+import re
+import unicodedata
+
+# ===== 第三方库 =====
+import numpy as np
+
+
+# 分词器版本：分词规则变化时递增，ChunkStore 会据此重建倒排表
+TOKENIZER_VERSION = "1"
+
+# 英文 / 数字标识符，以及连续的中日韩统一表意文字
+_TOKEN_RE = re.compile(r"[a-z0-9_]+|[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+")
+
+# 混合检索时，词法候选至少覆盖该比例的查询词（按 IDF 加权）才参与融合
+_MIN_HYBRID_COVERAGE = 0.5
+
+# 文档频率不超过该值的检索词始终参与打分（小语料下倒排列表很短，无需按比例过滤）
+_MIN_STOPWORD_DF = 100
+
+
+def tokenize(text: str, expand_identifiers: bool = True) -> List[str]:
+    """
+    将中英文混合文本切分为检索词。
+
+    Args:
+        text: 任意文本
+        expand_identifiers: 是否为下划线连接的标识符额外产出各组成部分
+
+    Returns:
+        检索词列表（保留重复，用于统计词频）
+    """
+    tokens: List[str] = []
+    for match in _TOKEN_RE.finditer(unicodedata.normalize("NFKC", text).lower()):
+        piece = match.group()
+        if piece.isascii():
+            tokens.append(piece)
+            if expand_identifiers and "_" in piece:
+                tokens.extend(part for part in piece.split("_") if part)
+        elif len(piece) == 1:
+            tokens.append(piece)
+        else:
+            tokens.extend(piece[i : i + 2] for i in range(len(piece) - 1))
+    return tokens
+
+
+def term_frequencies(text: str) -> Dict[str, int]:
+    """
+    统计文本的词频（写入倒排表使用）。
+
+    Args:
+        text: chunk 文本
+
+    Returns:
+        {检索词: 词频} 字典
+    """
+    return dict(Counter(tokenize(text)))
+
+
+class LexicalHit(NamedTuple):
+    """词法检索命中：向量 ID、BM25 得分、查询词覆盖率（按 IDF 加权，0~1）。"""
+
+    faiss_id: int
+    score: float
+    coverage: float
+
+
+class BM25Searcher:
+    """
+    基于 ChunkStore 倒排表的 BM25 检索器。
+
+    检索侧加载的是不可变的索引代际，文档总数与平均长度在初始化时读取一次即可。
+    """
+
+    def __init__(
+        self,
+        store,
+        k1: float = 1.2,
+        b: float = 0.75,
+        fast_path_max_terms: int = 3,
+        candidates: int = 20,
+        rrf_k: int = 60,
+        max_df_ratio: float = 0.05,
+    ):
+        """
+        Args:
+            store: 含倒排表的 ChunkStore
+            k1: BM25 词频饱和参数
+            b: BM25 文档长度归一化参数
+            fast_path_max_terms: 触发快速路径的查询最多包含的检索词数，<= 0 表示禁用快速路径
+            candidates: 混合检索时每一路召回的候选数量
+            rrf_k: RRF 融合常数
+            max_df_ratio: 文档频率超过该比例的检索词视为停用词，<= 0 或 >= 1 表示不过滤
+        """
+        self.store = store
+        self.k1 = k1
+        self.b = b
+        self.fast_path_max_terms = fast_path_max_terms
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+        self.doc_count, self.avg_length = store.lexical_stats()
+        self.max_df = (
+            max(_MIN_STOPWORD_DF, int(self.doc_count * max_df_ratio))
+            if 0 < max_df_ratio < 1
+            else self.doc_count
+        )
+
+        # 文档长度常驻内存（按 faiss_id 排序，以二分查找定位）
+        lengths = store.doc_lengths()
+        self._doc_ids = np.fromiter((row[0] for row in lengths), dtype=np.int64, count=len(lengths))
+        self._doc_lengths = np.fromiter(
+            (row[1] for row in lengths), dtype=np.float64, count=len(lengths)
+        )
+
+    def search(self, query: str, k: int) -> List[LexicalHit]:
+        """
+        执行 BM25 检索。
+
+        Args:
+            query: 查询文本
+            k: 返回的最大命中数
+
+        Returns:
+            按得分降序排列的命中列表
+        """
+        terms = set(tokenize(query))
+        if not terms or not self.doc_count:
+            return []
+
+        # 未出现在任何 chunk 中的检索词同样计入覆盖率的分母；高频词视为停用词，两者都不参与打分
+        frequencies = self.store.document_frequencies(terms)
+        idf = {
+            term: math.log(1 + (self.doc_count - df + 0.5) / (df + 0.5))
+            for term, df in frequencies.items()
+            if df <= self.max_df
+        }
+        total_idf = sum(idf.values()) + sum(
+            math.log(1 + (self.doc_count + 0.5) / 0.5)
+            for term in terms
+            if term not in frequencies
+        )
+        if not idf:
+            return []
+
+        rows = self.store.postings(idf)
+        term_idf = np.fromiter((idf[row[0]] for row in rows), dtype=np.float64, count=len(rows))
+        ids = np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows))
+        tf = np.fromiter((row[2] for row in rows), dtype=np.float64, count=len(rows))
+
+        lengths = self._doc_lengths[np.searchsorted(self._doc_ids, ids)]
+        norm = self.k1 * (1 - self.b + self.b * lengths / self.avg_length)
+        contributions = term_idf * (tf * (self.k1 + 1) / (tf + norm))
+
+        # 按文档聚合各检索词的得分与命中的 IDF
+        unique_ids, inverse = np.unique(ids, return_inverse=True)
+        scores = np.bincount(inverse, weights=contributions)
+        matched_idf = np.bincount(inverse, weights=term_idf)
+
+        top = np.argsort(-scores, kind="stable")[:k]
+        return [
+            LexicalHit(int(unique_ids[i]), float(scores[i]), float(matched_idf[i] / total_idf))
+            for i in top
+        ]
+
+    def is_confident(self, query: str, hits: Sequence[LexicalHit], k: int) -> bool:
+        """
+        判断词法结果是否足以直接作为检索结果（跳过 Embedding 请求）。
+
+        Args:
+            query: 查询文本
+            hits: search 返回的命中列表（至少 k + 1 条才能判断完全匹配数是否超过 k）
+            k: 需要返回的结果数
+
+        Returns:
+            是否走快速路径
+        """
+        if self.fast_path_max_terms <= 0 or not hits:
+            return False
+        if len(set(tokenize(query, expand_identifiers=False))) > self.fast_path_max_terms:
+            return False
+
+        full_matches = sum(1 for hit in hits if hit.coverage >= 1 - 1e-9)
+        return 1 <= full_matches <= k
+
+    def fuse(
+        self, vector_ids: Sequence[int], lexical_hits: Sequence[LexicalHit], k: int
+    ) -> List[int]:
+        """
+        以倒数排名融合（RRF）合并向量与词法两路结果。
+
+        Args:
+            vector_ids: 向量检索命中的 ID（已按相似度排序并过滤阈值）
+            lexical_hits: 词法检索命中
+            k: 返回的结果数
+
+        Returns:
+            融合后的向量 ID 列表
+        """
+        fused: Dict[int, float] = {}
+        for rank, faiss_id in enumerate(vector_ids):
+            fused[faiss_id] = fused.get(faiss_id, 0.0) + 1 / (self.rrf_k + rank + 1)
+
+        lexical_ids = [
+            hit.faiss_id for hit in lexical_hits if hit.coverage >= _MIN_HYBRID_COVERAGE
+        ]
+        for rank, faiss_id in enumerate(lexical_ids):
+            fused[faiss_id] = fused.get(faiss_id, 0.0) + 1 / (self.rrf_k + rank + 1)
+
+        return [
+            faiss_id
+            for faiss_id, _ in sorted(fused.items(), key=lambda item: item[1], reverse=True)
+        ][:k]
+
+
+def build_bm25_searcher(store) -> BM25Searcher | None:
+    """
+    根据环境变量构建词法检索器。
+
+    支持的环境变量：
+    - RAG_HYBRID：是否启用混合检索，默认 0（仅使用向量检索），1 表示启用
+    - RAG_LEXICAL_FAST_PATH_MAX_TERMS：触发快速路径的最大查询词数，默认 3（0 表示禁用）
+    - RAG_HYBRID_CANDIDATES：混合检索时每一路的候选数量，默认 20
+    - RAG_RRF_K：RRF 融合常数，默认 60
+    - RAG_LEXICAL_MAX_DF：文档频率超过该比例的检索词视为停用词，默认 0.05（0 表示不过滤）
+
+    Args:
+        store: ChunkStore 实例
+
+    Returns:
+        BM25Searcher；未启用或索引代际中没有倒排表时返回 None
+    """
+    if (os.getenv("RAG_HYBRID") or "0") != "1" or not store.has_lexical_index():
+        return None
+
+    return BM25Searcher(
+        store,
+        fast_path_max_terms=int(os.getenv("RAG_LEXICAL_FAST_PATH_MAX_TERMS") or 3),
+        candidates=int(os.getenv("RAG_HYBRID_CANDIDATES") or 20),
+        rrf_k=int(os.getenv("RAG_RRF_K") or 60),
+        max_df_ratio=float(os.getenv("RAG_LEXICAL_MAX_DF") or 0.05),
+    )
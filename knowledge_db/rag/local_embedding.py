@@ -0,0 +1,109 @@
+"""
+HashingEmbeddings：离线、确定性的本地 Embedding 实现（RAG 公共组件）。
+
+模块职责：
+- 在不访问网络的前提下，为文档与查询生成固定维度的稠密向量
+- 供离线 CI、压测环境以及无法访问 Embedding 服务商的场景构建与查询索引
+
+设计说明：
+- 采用特征哈希（hashing trick）：检索词经带密钥的 BLAKE2b 哈希映射到固定维度，
+  并以哈希位决定正负号，相当于对词袋向量做一次稀疏随机投影
+- 分词复用词法检索的中英文混合分词器，词频取对数平滑，结果做 L2 归一化，
+  使 L2 距离与余弦相似度单调对应
+- 同一文本在任意机器、任意进程中得到完全相同的向量；维度与随机种子记录在索引元数据中，
+  与构建时不一致的索引在加载时会直接报错
+- 计算成本为微秒级，无需批量并发与持久化缓存
+"""
+
+# ===== 标准库 =====
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Tuple
+import hashlib
+
+# ===== 第三方库 =====
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# ===== 本地模块 =====
+from knowledge_db.rag.lexical import tokenize
+
+
+@lru_cache(maxsize=1 << 16)
+def _hash_token(token: str, dimension: int, seed: int) -> Tuple[int, float]:
+    """将检索词映射为 (维度下标, 符号)。"""
+    digest = hashlib.blake2b(
+        token.encode("utf-8"), digest_size=8, key=seed.to_bytes(8, "little")
+    ).digest()
+    value = int.from_bytes(digest, "little")
+    return value % dimension, 1.0 if value >> 63 else -1.0
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    基于特征哈希的本地 Embedding。
+
+    文档向量与查询向量使用同一映射，无需区分 text_type。
+    """
+
+    def __init__(self, dimension: int = 512, seed: int = 0):
+        """
+        Args:
+            dimension: 向量维度
+            seed: 哈希密钥，不同种子得到互不兼容的向量空间
+        """
+        self.dimension = dimension
+        self.seed = seed
+
+    @property
+    def signature(self) -> Dict:
+        """Embedding 后端标识，写入索引元数据用于兼容性校验。"""
+        return {"backend": "hashing", "dimension": self.dimension, "seed": self.seed}
+
+    def _embed(self, text: str) -> List[float]:
+        """为单条文本生成归一化向量。"""
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for token, tf in Counter(tokenize(text)).items():
+            position, sign = _hash_token(token, self.dimension, self.seed)
+            vector[position] += sign * (1.0 + np.log(tf))
+
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        为文档文本生成向量。
+
+        Args:
+            texts: 文档文本列表
+
+        Returns:
+            与输入一一对应的向量列表
+        """
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        为查询文本生成向量。
+
+        Args:
+            text: 查询文本
+
+        Returns:
+            查询向量
+        """
+        return self._embed(text)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """为多条查询生成向量（与检索器的批量接口保持一致）。"""
+        return [self._embed(text) for text in texts]
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        """纯本地计算且耗时极短，直接在事件循环中执行。"""
+        return self.embed_queries(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """纯本地计算且耗时极短，直接在事件循环中执行。"""
+        return self._embed(text)
@@ -0,0 +1,200 @@
+"""
+IngestManifest：知识库增量索引清单（RAG - Ingestion 阶段）。
+
+模块职责：
+- 记录每个源文件的内容哈希、切分后 chunk 的哈希及其在向量库中的 ID
+- 对比本次扫描结果与上次清单，识别新增 / 变更 / 删除的文件与 chunk
+- 以原子写入方式持久化清单，避免中途失败导致清单与索引不一致
+
+设计说明：
+- 清单以 JSON 形式保存在向量数据库目录中（manifest.json），便于人工排查
+- chunk ID 由“来源 + chunk 哈希 + 同文件内重复序号”确定性生成，
+  相同内容在重复构建时得到相同 ID，从而可以精确复用或删除向量
+- FAISS 向量 ID 由 chunk ID 直接推导（见 chunk_faiss_id），无需额外的映射表
+- 清单版本号变化时视为不兼容，调用方应执行全量重建
+"""
+
+# ===== 标准库 =====
+from pathlib import Path
+from typing import Dict, List
+import hashlib
+import json
+import os
+
+
+# 清单格式版本，结构发生不兼容变化时递增
+# v2：索引改为以 chunk_faiss_id 为 ID 的 FAISS IndexIDMap + SQLite chunk 存储
+MANIFEST_VERSION = 2
+
+# 清单文件名（位于向量数据库目录下）
+MANIFEST_FILE_NAME = "manifest.json"
+
+
+def hash_text(text: str) -> str:
+    """
+    计算文本内容的 SHA-256 哈希。
+
+    Args:
+        text: 任意文本
+
+    Returns:
+        十六进制哈希字符串
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def make_chunk_id(source: str, chunk_hash: str, occurrence: int) -> str:
+    """
+    为 chunk 生成确定性 ID。
+
+    同一文件中可能出现完全相同的 chunk（如重复的模板段落），
+    因此需要引入 occurrence 序号保证 ID 唯一。
+
+    Args:
+        source: chunk 所属文件的相对路径
+        chunk_hash: chunk 文本哈希
+        occurrence: 该哈希在同一文件中出现的序号（从 0 开始）
+
+    Returns:
+        chunk ID 字符串
+    """
+    return hash_text(f"{source}\0{chunk_hash}\0{occurrence}")[:32]
+
+
+def chunk_faiss_id(chunk_id: str) -> int:
+    """
+    由 chunk ID 推导 FAISS 向量 ID。
+
+    取 chunk ID 的前 15 位十六进制（60 bit），保证结果为正的 int64。
+
+    Args:
+        chunk_id: make_chunk_id 生成的 chunk ID
+
+    Returns:
+        FAISS 向量 ID
+    """
+    return int(chunk_id[:15], 16)
+
+
+class IngestManifest:
+    """
+    知识库增量索引清单。
+
+    内部结构：
+        {
+            "version": 2,
+            "files": {
+                "<相对路径>": {
+                    "content_hash": "...",
+                    "chunks": [{"hash": "...", "id": "..."}, ...]
+                }
+            }
+        }
+    """
+
+    def __init__(self, files: Dict[str, dict] | None = None):
+        """
+        初始化清单。
+
+        Args:
+            files: 文件级记录，键为文件相对路径
+        """
+        self.files: Dict[str, dict] = files or {}
+
+    @classmethod
+    def load(cls, vector_db_dir: Path) -> "IngestManifest | None":
+        """
+        从向量数据库目录加载清单。
+
+        Args:
+            vector_db_dir: 向量数据库目录
+
+        Returns:
+            清单实例；若清单不存在或版本不兼容则返回 None
+        """
+        manifest_path = Path(vector_db_dir) / MANIFEST_FILE_NAME
+        if not manifest_path.exists():
+            return None
+
+        with open(manifest_path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+
+        if data.get("version") != MANIFEST_VERSION:
+            return None
+
+        return cls(files=data.get("files", {}))
+
+    def save(self, vector_db_dir: Path) -> None:
+        """
+        原子写入清单文件。
+
+        先写入临时文件再替换，保证任意时刻磁盘上的清单都是完整的。
+
+        Args:
+            vector_db_dir: 向量数据库目录
+        """
+        vector_db_dir = Path(vector_db_dir)
+        vector_db_dir.mkdir(parents=True, exist_ok=True)
+
+        manifest_path = vector_db_dir / MANIFEST_FILE_NAME
+        tmp_path = manifest_path.with_suffix(".json.tmp")
+
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(
+                {"version": MANIFEST_VERSION, "files": self.files},
+                file,
+                ensure_ascii=False,
+                indent=2,
+            )
+
+        os.replace(tmp_path, manifest_path)
+
+    def content_hash(self, source: str) -> str | None:
+        """
+        获取指定文件上次入库时的内容哈希。
+
+        Args:
+            source: 文件相对路径
+
+        Returns:
+            内容哈希；若文件从未入库则返回 None
+        """
+        entry = self.files.get(source)
+        return entry["content_hash"] if entry else None
+
+    def chunk_ids(self, source: str) -> List[str]:
+        """
+        获取指定文件已入库的全部 chunk ID。
+
+        Args:
+            source: 文件相对路径
+
+        Returns:
+            chunk ID 列表
+        """
+        entry = self.files.get(source)
+        return [chunk["id"] for chunk in entry["chunks"]] if entry else []
+
+    def update_file(self, source: str, content_hash: str, chunks: List[dict]) -> None:
+        """
+        记录文件最新的入库状态。
+
+        Args:
+            source: 文件相对路径
+            content_hash: 文件内容哈希
+            chunks: chunk 记录列表，每项包含 hash 与 id
+        """
+        self.files[source] = {"content_hash": content_hash, "chunks": chunks}
+
+    def remove_file(self, source: str) -> List[str]:
+        """
+        从清单中移除文件，并返回其遗留的 chunk ID。
+
+        Args:
+            source: 文件相对路径
+
+        Returns:
+            需要从向量库中删除的 chunk ID 列表
+        """
+        entry = self.files.pop(source, None)
+        return [chunk["id"] for chunk in entry["chunks"]] if entry else []
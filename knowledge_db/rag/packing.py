@@ -0,0 +1,306 @@
+"""
+检索结果打包：将召回的 chunk 压缩为带引用的紧凑上下文（RAG 公共组件）。
+
+模块职责：
+- 合并同一来源中相邻（存在切分重叠）的 chunk，去掉重叠部分
+- 去除完全重复、相互包含以及高度相似的片段
+- 按 token 预算截取，输出带来源编号的紧凑字符串，直接作为工具结果交给 LLM
+
+设计说明：
+- 构建阶段按 800 字符切分并保留 100 字符重叠（见 ingest.py），相邻 chunk 的首尾文本完全一致，
+  因此通过前后缀匹配即可识别并拼接，无需在索引中额外记录 chunk 位置
+- 相似度基于词法分词器（见 lexical.py）的检索词集合计算 Jaccard 系数，中英文均适用
+- token 数按“中日韩字符 1 个 token、其余字符约 4 个字符 1 个 token”估算，
+  不依赖具体模型的分词器，离线可用且足以控制预算
+- 同一来源的片段归入一节、只输出一次引用，各节按来源的最高排名排列；
+  批量查询时每个问题各自合并、去重自己的检索结果（问题下只出现它检索到的内容），
+  各问题共享预算与引用编号，某个片段已完整出现在前面问题的输出中时只引用编号
+"""
+
+# ===== 标准库 =====
+from typing import Dict, List, Sequence
+import os
+import re
+
+# ===== 本地模块 =====
+from knowledge_db.rag.lexical import tokenize
+
+
+# 中日韩统一表意文字及全角标点，按 1 个 token 估算
+_CJK_RE = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]")
+
+# 识别切分重叠的最短公共前后缀长度（字符），过短的匹配可能只是巧合
+_MIN_OVERLAP = 20
+
+# 剩余预算不足该 token 数时不再截断输出片段，避免产生无意义的残句
+_MIN_TRUNCATED_TOKENS = 40
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    估算文本的 token 数。
+
+    Args:
+        text: 任意文本
+
+    Returns:
+        估算的 token 数
+    """
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _merge_overlap(left: str, right: str, max_overlap: int) -> str | None:
+    """
+    若 left 的结尾与 right 的开头重叠，返回去重拼接后的文本。
+
+    Args:
+        left: 在前的片段
+        right: 在后的片段
+        max_overlap: 允许的最大重叠长度
+
+    Returns:
+        拼接结果；不存在足够长的重叠时返回 None
+    """
+    left_tail = left.rstrip()
+    right_head = right.lstrip()
+    upper = min(max_overlap, len(left_tail), len(right_head))
+    for size in range(upper, _MIN_OVERLAP - 1, -1):
+        if left_tail.endswith(right_head[:size]):
+            return left_tail + right_head[size:]
+    return None
+
+
+def _jaccard(left: set, right: set) -> float:
+    """检索词集合的 Jaccard 相似度。"""
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+class _Passage:
+    """打包过程中的片段：所属来源、文本与对应的检索词集合。"""
+
+    __slots__ = ("source", "text", "terms")
+
+    def __init__(self, source: str, text: str):
+        self.source = source
+        self.text = text.strip()
+        self.terms = set(tokenize(self.text))
+
+
+class ContextPacker:
+    """
+    检索结果打包器。
+    """
+
+    def __init__(
+        self,
+        token_budget: int = 1500,
+        dedup_threshold: float = 0.9,
+        max_overlap: int = 200,
+    ):
+        """
+        Args:
+            token_budget: 输出内容的 token 预算，<= 0 表示不限制
+            dedup_threshold: 检索词 Jaccard 相似度达到该值的片段视为重复
+            max_overlap: 识别相邻 chunk 时允许的最大重叠长度（字符）
+        """
+        self.token_budget = token_budget
+        self.dedup_threshold = dedup_threshold
+        self.max_overlap = max_overlap
+
+    def _collect(self, results: Sequence[Dict], passages: List[_Passage]) -> List[int]:
+        """
+        将一个查询的检索结果并入片段列表（合并相邻、去除重复）。
+
+        Args:
+            results: search_knowledge_recall 返回的结果（已按排名排序）
+            passages: 该查询已收集的片段，会被原地修改
+
+        Returns:
+            该查询命中的片段下标（按排名排列，不含重复）
+        """
+        hits: List[int] = []
+
+        for item in results:
+            incoming = _Passage(item["来源"], item["内容"])
+            if not incoming.text:
+                continue
+
+            target = None
+            for position, passage in enumerate(passages):
+                if incoming.text in passage.text:
+                    # 完全包含（含不同来源中的重复内容）
+                    target = position
+                elif passage.source == incoming.source:
+                    # 同一来源：包含或首尾重叠的片段合并为一段
+                    if passage.text in incoming.text:
+                        passage.text, passage.terms = incoming.text, incoming.terms
+                        target = position
+                    else:
+                        merged = _merge_overlap(
+                            passage.text, incoming.text, self.max_overlap
+                        ) or _merge_overlap(incoming.text, passage.text, self.max_overlap)
+                        if merged is not None:
+                            passage.text = merged
+                            passage.terms |= incoming.terms
+                            target = position
+                if target is None and (
+                    _jaccard(passage.terms, incoming.terms) >= self.dedup_threshold
+                ):
+                    # 近似重复的片段，只保留排名靠前的一份
+                    target = position
+                if target is not None:
+                    break
+
+            if target is None:
+                passages.append(incoming)
+                target = len(passages) - 1
+            if target not in hits:
+                hits.append(target)
+
+        return hits
+
+    def _render(
+        self, passages: List[_Passage], order: List[int], state: Dict
+    ) -> List[str]:
+        """
+        按预算渲染片段：同一来源的片段归入一节，只输出一次来源引用。
+
+        Args:
+            passages: 该查询的片段
+            order: 待输出片段的下标（按排名排列）
+            state: 跨查询共享的状态：剩余预算、来源编号、各来源已输出的文本、是否已截断
+
+        Returns:
+            每个来源一节的文本列表
+        """
+        groups: Dict[str, List[int]] = {}
+        for position in order:
+            groups.setdefault(passages[position].source, []).append(position)
+
+        sections: List[str] = []
+        for source, positions in groups.items():
+            if state["truncated"]:
+                break
+
+            citation = state["sources"].setdefault(source, len(state["sources"]) + 1)
+            header = f"[{citation}] {source}"
+            emitted = state["emitted"].setdefault(source, [])
+            fresh = [
+                position
+                for position in positions
+                if not any(passages[position].text in text for text in emitted)
+            ]
+            if not fresh:
+                # 批量查询中已在前面的问题下完整输出过
+                sections.append(f"[{citation}]（见上文）")
+                continue
+
+            texts: List[str] = []
+            if state["remaining"] is not None:
+                state["remaining"] -= estimate_tokens(header)
+            for position in fresh:
+                text = passages[position].text
+                if state["remaining"] is not None:
+                    cost = estimate_tokens(text)
+                    if cost > state["remaining"]:
+                        state["truncated"] = True
+                        if state["remaining"] < _MIN_TRUNCATED_TOKENS:
+                            break
+                        text = self._truncate(text, state["remaining"]) + "…"
+                        cost = state["remaining"]
+                    state["remaining"] -= cost
+                texts.append(text)
+                emitted.append(text)
+                if state["truncated"]:
+                    break
+
+            if texts:
+                sections.append(header + "\n" + "\n……\n".join(texts))
+
+        return sections
+
+    @staticmethod
+    def _truncate(text: str, tokens: int) -> str:
+        """截取不超过给定 token 数的前缀（二分查找字符位置）。"""
+        low, high = 0, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if estimate_tokens(text[:middle]) <= tokens:
+                low = middle
+            else:
+                high = middle - 1
+        return text[:low].rstrip()
+
+    def _new_state(self) -> Dict:
+        """创建一次打包（单个或批量查询）的渲染状态。"""
+        return {
+            "remaining": self.token_budget if self.token_budget > 0 else None,
+            "sources": {},
+            "emitted": {},
+            "truncated": False,
+        }
+
+    def pack(self, results: Sequence[Dict]) -> str:
+        """
+        将单个查询的检索结果打包为紧凑上下文。
+
+        Args:
+            results: search_knowledge_recall 返回的结果
+
+        Returns:
+            形如 “[1] 来源路径\\n片段文本” 的多段文本，以空行分隔；无结果时返回提示语
+        """
+        passages: List[_Passage] = []
+        order = self._collect(results, passages)
+        return self._body(passages, order, self._new_state())
+
+    def pack_batch(self, queries: Sequence[str], results: Sequence[Sequence[Dict]]) -> str:
+        """
+        将批量查询的检索结果打包为一段上下文（共享预算与来源编号）。
+
+        Args:
+            queries: 查询列表
+            results: 与 queries 一一对应的检索结果
+
+        Returns:
+            按问题分节的紧凑上下文，已在前面输出过的来源以 “[编号]（见上文）” 引用
+        """
+        state = self._new_state()
+        sections: List[str] = []
+        for query, query_results in zip(queries, results):
+            # 每个问题单独合并、去重，避免其他问题的片段被拼接进本问题的输出
+            passages: List[_Passage] = []
+            order = self._collect(query_results, passages)
+            sections.append(f"## {query}\n{self._body(passages, order, state)}")
+        return "\n\n".join(sections)
+
+    def _body(self, passages: List[_Passage], order: List[int], state: Dict) -> str:
+        """渲染一个查询的输出，无命中或预算耗尽时返回提示语。"""
+        if not order:
+            return "（知识库中未找到相关内容）"
+        sections = [] if state["truncated"] else self._render(passages, order, state)
+        return "\n\n".join(sections) if sections else "（超出上下文预算，已省略）"
+
+
+def build_context_packer() -> ContextPacker | None:
+    """
+    根据环境变量构建检索结果打包器。
+
+    支持的环境变量：
+    - RAG_CONTEXT_PACKING：是否打包检索结果，默认 1（0 表示直接返回原始结果列表）
+    - RAG_CONTEXT_TOKEN_BUDGET：单次工具调用输出的 token 预算，默认 1500（0 表示不限制）
+    - RAG_DEDUP_THRESHOLD：近似重复判定阈值（检索词 Jaccard 相似度），默认 0.9
+
+    Returns:
+        ContextPacker；未启用时返回 None
+    """
+    if (os.getenv("RAG_CONTEXT_PACKING") or "1") == "0":
+        return None
+
+    return ContextPacker(
+        token_budget=int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET") or 1500),
+        dedup_threshold=float(os.getenv("RAG_DEDUP_THRESHOLD") or 0.9),
+    )
@@ -2,28 +2,98 @@
 LocalRAGRetriever：本地知识库检索组件（RAG - Retrieval 阶段）。
 
 模块职责：
-- 加载本地已构建的向量数据库（FAISS）
+- 以只读内存映射方式加载本地已构建的向量索引（FAISS）
 - 基于用户查询执行相似度检索
 - 返回带有来源信息的知识片段，支持可追溯性
 
 设计说明：
 - 本模块仅负责“召回”，不负责回答生成
 - Embedding 模型通过参数注入，避免与 Ingestion 阶段强耦合
+- 查询向量与 Ingestion 阶段共用同一份 Embedding 缓存
+- 索引类型（Flat / IVF / HNSW / PQ）由构建阶段写入的元数据决定
+- chunk 文本与元数据存放在 SQLite 中，仅为 top-k 命中懒加载，
+  进程启动成本与常驻内存不随语料规模增长
+- 检索侧只读取已发布的索引代际；进程内共享一个检索器实例，
+  新代际发布后在后台加载并原子切换（见 SharedRetriever）
+- 查询向量经进程内 LRU → 持久化 Embedding 缓存 → 服务商逐层回退；
+  检索结果按 (查询, k, 阈值, 类别, 代际) 缓存并设置 TTL，命中统计见 cache_stats()
+- 提供原生异步接口（asearch_knowledge_recall）：查询向量走异步 HTTP，
+  FAISS 搜索在独立的有界线程池中执行，多个会话并发检索时互不阻塞
+- 混合检索（RAG_HYBRID=1 时启用）：构建阶段同步生成 BM25 倒排表，检索时与向量结果做 RRF 融合；
+  标识符类短查询在词法结果可信时直接返回，完全跳过 Embedding 请求
+- 类别路由：查询可显式指定类别，或根据查询中出现的类别 / 文件 / 三级标题名称
+  自动选择唯一类别，此时只检索该类别的分片；无法确定类别的查询仍检索全量索引。
+  按查询向量与分片质心距离的路由容易漏召回，需通过 RAG_ROUTE_MARGIN 显式开启
+- 尚未按新格式构建索引时（如全新克隆的仓库），直接使用仓库自带的旧版索引（见 legacy.py）
 - 返回结构中保留 source 与 chunk 索引，便于后续引用与调试
 """
 
 # ===== 标准库 =====
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict
+import asyncio
+import logging
+import os
+import threading
+import time
 
 # ===== 第三方库 =====
-from langchain_community.embeddings import DashScopeEmbeddings
-from langchain_community.vectorstores import FAISS
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# ===== 本地模块 =====
+from knowledge_db.rag.ann_index import load_serving_index
+from knowledge_db.rag.cache import LRUCache, build_query_cache, build_result_cache
+from knowledge_db.rag.chunk_store import CHUNK_STORE_FILE_NAME, ChunkStore
+from knowledge_db.rag.embedding import (
+    build_embeddings,
+    check_embedding_signature,
+    embedding_signature,
+    text_cache_key,
+)
+from knowledge_db.rag.generations import (
+    GENERATIONS_DIR_NAME,
+    read_current_generation,
+)
+from knowledge_db.rag.legacy import (
+    LEGACY_EMBEDDING_BACKEND,
+    has_legacy_index,
+    load_legacy_serving_index,
+)
+from knowledge_db.rag.lexical import build_bm25_searcher
+from knowledge_db.rag.shards import load_shard_router
+
+
+logger = logging.getLogger(__name__)
 
 
 # ===== 向量数据库路径 =====
 VECTOR_DB_DIR = Path("knowledge_db/.vector_db")
 
+# 异步检索专用的有界线程池（FAISS 搜索与 chunk 读取），避免占满默认线程池
+_search_executor: ThreadPoolExecutor | None = None
+_search_executor_lock = threading.Lock()
+
+
+def _get_search_executor() -> ThreadPoolExecutor:
+    """
+    获取异步检索使用的线程池（懒加载）。
+
+    支持的环境变量：
+    - RAG_SEARCH_WORKERS：同时执行的向量检索数，默认 4
+    """
+    global _search_executor
+
+    if _search_executor is None:
+        with _search_executor_lock:
+            if _search_executor is None:
+                _search_executor = ThreadPoolExecutor(
+                    max_workers=int(os.getenv("RAG_SEARCH_WORKERS") or 4),
+                    thread_name_prefix="rag-search",
+                )
+    return _search_executor
+
 
 class LocalRAGRetriever:
     """
@@ -33,30 +103,94 @@ class LocalRAGRetriever:
     根据用户查询召回最相关的知识片段。
     """
 
-    def __init__(self, model_name: str, api_key: str):
+    def __init__(
+        self,
+        model_name: str,
+        api_key: str,
+        embeddings: Embeddings | None = None,
+        query_cache: LRUCache | None = None,
+        result_cache: LRUCache | None = None,
+    ):
         """
         初始化检索器并加载向量数据库。
 
         Args:
             model_name: Embedding 模型名称
             api_key: DashScope API Key
+            embeddings: 复用已有的 Embedding 层（热加载新代际时避免重建客户端）
+            query_cache: 复用已有的查询向量缓存
+            result_cache: 复用已有的检索结果缓存
         """
 
         # 初始化 Embedding 模型（需与 Ingestion 阶段保持一致）
-        self.embeddings = DashScopeEmbeddings(
-            model=model_name,
-            dashscope_api_key=api_key,
+        # 与 Ingestion 共用同一份持久化缓存，重复查询无需再次请求服务商
+        self.model_name = model_name
+        self.embeddings = embeddings or build_embeddings(model_name, api_key)
+
+        # 进程内缓存：热加载新代际时沿用，查询向量与代际无关可继续命中
+        # （LRUCache 定义了 __len__，空缓存为假值，因此显式判断 None）
+        self.query_cache = query_cache if query_cache is not None else build_query_cache()
+        self.result_cache = result_cache if result_cache is not None else build_result_cache()
+
+        # 定位当前代际；尚未发布过代际时直接读取工作目录
+        self.generation = read_current_generation(VECTOR_DB_DIR)
+        index_dir = (
+            VECTOR_DB_DIR / GENERATIONS_DIR_NAME / self.generation
+            if self.generation
+            else VECTOR_DB_DIR
         )
 
-        # 加载本地 FAISS 向量索引
-        self.vectorstore = FAISS.load_local(
-            VECTOR_DB_DIR,
-            self.embeddings,
-            allow_dangerous_deserialization=True,
+        chunk_store_path = index_dir / CHUNK_STORE_FILE_NAME
+        if not self.generation and has_legacy_index(VECTOR_DB_DIR):
+            # 尚未按新格式构建：使用仓库自带的旧版索引
+            self.index, self.chunk_store = self._load_legacy_index()
+            self.index_meta = None
+        else:
+            if not chunk_store_path.exists():
+                raise RuntimeError(
+                    "❌ 未找到知识库 chunk 存储，请先执行 python -m knowledge_db.rag.ingest 构建索引。"
+                )
+
+            # 以只读内存映射方式加载索引：若构建阶段派生了 ANN 索引（IVF / HNSW / PQ）
+            # 则优先使用，并按索引元数据应用 nprobe / efSearch 等检索参数
+            self.index, self.index_meta = load_serving_index(index_dir)
+
+            # 查询向量必须与构建索引时处于同一向量空间，后端不一致时直接报错
+            check_embedding_signature(
+                self.index_meta.get("embedding") if self.index_meta else None,
+                self.embeddings,
+            )
+
+            # chunk 文本与元数据按需从 SQLite 读取，不在内存中常驻
+            self.chunk_store = ChunkStore(chunk_store_path, read_only=True)
+
+        # BM25 词法检索（与向量结果 RRF 融合，可信时跳过 Embedding 请求）
+        self.lexical = build_bm25_searcher(self.chunk_store)
+        self.lexical_fast_path_hits = 0
+
+        # 类别分片路由器（旧版本构建的代际没有分片时为 None，始终检索全量索引）
+        self.router = load_shard_router(index_dir)
+        self.route_counts = {"explicit": 0, "metadata": 0, "centroid": 0, "global": 0}
+
+    def _load_legacy_index(self):
+        """加载旧版索引（要求当前 Embedding 后端与构建旧版索引时一致）。"""
+        backend = embedding_signature(self.embeddings).get("backend")
+        if backend != LEGACY_EMBEDDING_BACKEND:
+            raise RuntimeError(
+                f"❌ 仓库自带的旧版索引由 {LEGACY_EMBEDDING_BACKEND} Embedding 构建，"
+                f"与当前后端 {backend} 不一致，请先执行 python -m knowledge_db.rag.ingest 构建索引。"
+            )
+        logger.warning(
+            "正在使用旧版知识库索引，执行 python -m knowledge_db.rag.ingest 可迁移为新格式"
         )
+        return load_legacy_serving_index(VECTOR_DB_DIR)
 
     def search_knowledge_recall(
-        self, query: str, k: int = 4, score_threshold: int = 0.6
+        self,
+        query: str,
+        k: int = 4,
+        score_threshold: int = 0.6,
+        category: str | None = None,
     ) -> List[Dict]:
         """
         在本地知识库中执行相似度检索。
@@ -65,6 +199,7 @@ class LocalRAGRetriever:
             query: 用户输入的自然语言查询
             k: 返回的相似文本块数量
             score_threshold: 相似度阈值。
+            category: 仅在指定类别（docs 子目录名或文件名）中检索，默认自动路由
 
         Returns:
             一个包含多个知识片段的列表，每个片段包含：
@@ -72,26 +207,520 @@ class LocalRAGRetriever:
             - chunk 索引
             - 具体内容
         """
+        return self.search_knowledge_recall_batch([query], k, score_threshold, category)[0]
+
+    def search_knowledge_recall_batch(
+        self,
+        queries: List[str],
+        k: int = 4,
+        score_threshold: int = 0.6,
+        category: str | None = None,
+    ) -> List[List[Dict]]:
+        """
+        批量执行相似度检索。
+
+        词法结果足够可信的查询直接返回，不请求 Embedding；
+        其余查询只发起一次 Embedding 请求，并按路由到的分片分组完成 FAISS 搜索，
+        再与词法结果做 RRF 融合。
+
+        Args:
+            queries: 查询列表
+            k: 每个查询返回的相似文本块数量
+            score_threshold: 相似度阈值。
+            category: 仅在指定类别中检索，默认逐条自动路由
+
+        Returns:
+            与 queries 一一对应的结果列表，每项格式同 search_knowledge_recall
+        """
+        results, result_keys, pending = self._lookup_results(
+            queries, k, score_threshold, category
+        )
+        pending, routes = self._route(queries, pending, category, results)
+        pending, lexical_hits = self._lexical_pass(
+            queries, k, results, result_keys, pending, routes
+        )
+        if pending:
+            query_vectors = self._embed_queries([queries[position] for position in pending])
+            self._search_vectors(
+                query_vectors,
+                k,
+                score_threshold,
+                results,
+                result_keys,
+                pending,
+                lexical_hits,
+                routes,
+            )
+        return results
+
+    async def asearch_knowledge_recall(
+        self,
+        query: str,
+        k: int = 4,
+        score_threshold: int = 0.6,
+        category: str | None = None,
+    ) -> List[Dict]:
+        """
+        search_knowledge_recall 的异步版本。
+
+        查询向量通过异步 HTTP 客户端获取，FAISS 搜索与 chunk 读取在
+        独立的有界线程池中执行，不阻塞事件循环。
+
+        Args:
+            query: 用户输入的自然语言查询
+            k: 返回的相似文本块数量
+            score_threshold: 相似度阈值。
+            category: 仅在指定类别中检索，默认自动路由
+
+        Returns:
+            格式同 search_knowledge_recall
+        """
+        return (
+            await self.asearch_knowledge_recall_batch([query], k, score_threshold, category)
+        )[0]
+
+    async def asearch_knowledge_recall_batch(
+        self,
+        queries: List[str],
+        k: int = 4,
+        score_threshold: int = 0.6,
+        category: str | None = None,
+    ) -> List[List[Dict]]:
+        """
+        search_knowledge_recall_batch 的异步版本。
 
-        # 按分数进行选择返回
-        docs = self.vectorstore.similarity_search_with_score(query, k=k)
+        Args:
+            queries: 查询列表
+            k: 每个查询返回的相似文本块数量
+            score_threshold: 相似度阈值。
+            category: 仅在指定类别中检索，默认逐条自动路由
 
-        results: List[Dict] = []
-        for idx, (doc, score) in enumerate(docs):
-            # 过滤逻辑：只保留距离小于阈值的片段
-            if score > score_threshold:
-                continue
+        Returns:
+            格式同 search_knowledge_recall_batch
+        """
+        loop = asyncio.get_running_loop()
+        executor = _get_search_executor()
 
-            results.append(
-                {
-                    "来源": doc.metadata.get("source", "unknown"),
-                    "chunk索引": idx,
-                    "内容": doc.page_content,
-                }
+        results, result_keys, pending = self._lookup_results(
+            queries, k, score_threshold, category
+        )
+        pending, routes = self._route(queries, pending, category, results)
+        if pending and self.lexical is not None:
+            pending, lexical_hits = await loop.run_in_executor(
+                executor,
+                self._lexical_pass,
+                queries,
+                k,
+                results,
+                result_keys,
+                pending,
+                routes,
             )
+        else:
+            lexical_hits = {}
 
+        if pending:
+            query_vectors = await self._aembed_queries(
+                [queries[position] for position in pending]
+            )
+            await loop.run_in_executor(
+                executor,
+                self._search_vectors,
+                query_vectors,
+                k,
+                score_threshold,
+                results,
+                result_keys,
+                pending,
+                lexical_hits,
+                routes,
+            )
         return results
 
+    def _lookup_results(
+        self, queries: List[str], k: int, score_threshold: float, category: str | None
+    ):
+        """
+        查询结果缓存。
+
+        Returns:
+            (结果列表, 结果缓存键列表, 未命中查询的位置列表)；未命中位置的结果为 None
+        """
+        results: List[List[Dict] | None] = [None] * len(queries)
+        result_keys = [
+            (text_cache_key(query), k, score_threshold, category, self.generation)
+            for query in queries
+        ]
+
+        pending: List[int] = []
+        for position, result_key in enumerate(result_keys):
+            cached = self.result_cache.get(result_key)
+            if cached is not None:
+                results[position] = [dict(item) for item in cached]
+            else:
+                pending.append(position)
+
+        return results, result_keys, pending
+
+    def _route(
+        self,
+        queries: List[str],
+        pending: List[int],
+        category: str | None,
+        results: List,
+    ):
+        """
+        在向量化之前为查询选择类别：显式指定的类别优先，其次按查询中出现的名称匹配。
+
+        显式指定了不存在的类别时，对应查询直接返回空结果（不写入结果缓存）。
+
+        Returns:
+            (仍需检索的位置列表, {位置: 类别}，未确定类别的位置不在其中)
+        """
+        if self.router is None:
+            return pending, {}
+
+        if category is not None:
+            if category not in self.router.shards:
+                for position in pending:
+                    results[position] = []
+                return [], {}
+            self.route_counts["explicit"] += len(pending)
+            return pending, {position: category for position in pending}
+
+        routes: Dict[int, str] = {}
+        for position in pending:
+            routed = self.router.route_by_metadata(queries[position])
+            if routed is not None:
+                routes[position] = routed
+        self.route_counts["metadata"] += len(routes)
+        return pending, routes
+
+    def _lexical_pass(
+        self,
+        queries: List[str],
+        k: int,
+        results: List,
+        result_keys: List[tuple],
+        pending: List[int],
+        routes: Dict[int, str],
+    ):
+        """
+        对未命中缓存的查询执行 BM25 检索；词法结果足够可信的查询直接写回结果。
+
+        已确定类别的查询只保留该类别分片内的命中。
+
+        Returns:
+            (仍需向量检索的位置列表, {位置: 词法命中列表})
+        """
+        if self.lexical is None:
+            return pending, {}
+
+        remaining: List[int] = []
+        lexical_hits: Dict[int, list] = {}
+        confident: Dict[int, List[int]] = {}
+
+        for position in pending:
+            hits = self.lexical.search(
+                queries[position], max(k + 1, self.lexical.candidates)
+            )
+            if position in routes:
+                shard_ids = self.router.ids(routes[position])
+                hits = [hit for hit in hits if hit.faiss_id in shard_ids]
+            if self.lexical.is_confident(queries[position], hits, k):
+                confident[position] = [hit.faiss_id for hit in hits[:k]]
+            else:
+                lexical_hits[position] = hits
+                remaining.append(position)
+
+        if confident:
+            self.lexical_fast_path_hits += len(confident)
+            self._materialize(confident, results, result_keys)
+
+        return remaining, lexical_hits
+
+    def _search_vectors(
+        self,
+        query_vectors: List[List[float]],
+        k: int,
+        score_threshold: float,
+        results: List,
+        result_keys: List[tuple],
+        pending: List[int],
+        lexical_hits: Dict[int, list],
+        routes: Dict[int, str],
+    ) -> None:
+        """
+        按路由结果分组执行 FAISS 搜索（每个分片 / 全量索引各一次），
+        与词法结果融合后写回 results 与结果缓存。
+        """
+
+        matrix = np.asarray(query_vectors, dtype=np.float32)
+        if matrix.shape[1] != self.index.d:
+            raise RuntimeError(
+                f"❌ 查询向量维度 {matrix.shape[1]} 与索引维度 {self.index.d} 不一致，"
+                "请检查 Embedding 配置或重新构建索引。"
+            )
+        n_candidates = max(k, self.lexical.candidates) if self.lexical else k
+
+        # 名称未能确定类别的查询，再按查询向量与分片质心的距离路由（未开启时均检索全量索引）
+        groups: Dict[str | None, List[int]] = {}
+        for row, position in enumerate(pending):
+            routed = routes.get(position)
+            if routed is None and self.router is not None:
+                routed = self.router.route_by_vector(matrix[row])
+                self.route_counts["centroid" if routed else "global"] += 1
+            groups.setdefault(routed, []).append(row)
+
+        ranked: Dict[int, List[int]] = {}
+        for routed, rows in groups.items():
+            index = self.index if routed is None else self.router.index(routed)
+            scores, ids = index.search(matrix[rows], n_candidates)
+
+            for offset, row in enumerate(rows):
+                position = pending[row]
+                # 过滤逻辑：只保留距离小于阈值的片段
+                vector_ids = [
+                    int(faiss_id)
+                    for faiss_id, score in zip(ids[offset], scores[offset])
+                    if faiss_id != -1 and score <= score_threshold
+                ]
+                if self.lexical is not None:
+                    ranked[position] = self.lexical.fuse(
+                        vector_ids, lexical_hits.get(position, []), k
+                    )
+                else:
+                    ranked[position] = vector_ids[:k]
+
+        self._materialize(ranked, results, result_keys)
+
+    def _materialize(
+        self, ranked: Dict[int, List[int]], results: List, result_keys: List[tuple]
+    ) -> None:
+        """为排序后的命中批量读取 chunk 内容，写回 results 与结果缓存。"""
+
+        # 仅为最终命中读取 chunk 内容
+        chunks = self.chunk_store.get_many(
+            {faiss_id for faiss_ids in ranked.values() for faiss_id in faiss_ids}
+        )
+
+        for position, faiss_ids in ranked.items():
+            query_results: List[Dict] = []
+            for idx, faiss_id in enumerate(faiss_ids):
+                if faiss_id not in chunks:
+                    continue
+
+                chunk = chunks[faiss_id]
+                query_results.append(
+                    {
+                        "来源": chunk["metadata"].get("source", chunk["source"]),
+                        "chunk索引": idx,
+                        "内容": chunk["content"],
+                    }
+                )
+
+            self.result_cache.put(
+                result_keys[position], [dict(item) for item in query_results]
+            )
+            results[position] = query_results
+
+    def _embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """为多条查询生成向量，优先命中进程内 LRU 缓存，其余合并为一次请求。"""
+
+        keys, vectors, missing = self._lookup_query_vectors(queries)
+        if missing:
+            embed_queries = getattr(self.embeddings, "embed_queries", None)
+            texts = list(missing.values())
+            fresh = (
+                embed_queries(texts)
+                if embed_queries is not None
+                else [self.embeddings.embed_query(text) for text in texts]
+            )
+            self._store_query_vectors(vectors, missing, fresh)
+
+        return [vectors[key] for key in keys]
+
+    async def _aembed_queries(self, queries: List[str]) -> List[List[float]]:
+        """_embed_queries 的异步版本。"""
+
+        keys, vectors, missing = self._lookup_query_vectors(queries)
+        if missing:
+            aembed_queries = getattr(self.embeddings, "aembed_queries", None)
+            texts = list(missing.values())
+            fresh = (
+                await aembed_queries(texts)
+                if aembed_queries is not None
+                else [await self.embeddings.aembed_query(text) for text in texts]
+            )
+            self._store_query_vectors(vectors, missing, fresh)
+
+        return [vectors[key] for key in keys]
+
+    def _lookup_query_vectors(self, queries: List[str]):
+        """
+        查询进程内向量缓存。
+
+        Returns:
+            (缓存键列表, {缓存键: 向量或 None}, {未命中缓存键: 查询文本})
+        """
+        keys = [(self.model_name, text_cache_key(query)) for query in queries]
+        vectors = {key: self.query_cache.get(key) for key in keys}
+
+        missing: Dict[tuple, str] = {}
+        for key, query in zip(keys, queries):
+            if vectors[key] is None and key not in missing:
+                missing[key] = query
+
+        return keys, vectors, missing
+
+    def _store_query_vectors(
+        self, vectors: Dict, missing: Dict[tuple, str], fresh: List[List[float]]
+    ) -> None:
+        """将新生成的查询向量写入进程内缓存。"""
+        for key, vector in zip(missing, fresh):
+            self.query_cache.put(key, vector)
+            vectors[key] = vector
+
+    def cache_stats(self) -> Dict[str, Dict]:
+        """
+        返回检索缓存的命中统计，用于评估缓存容量是否合适。
+
+        Returns:
+            {"query_embedding": {...}, "result": {...}, "lexical_fast_path": {...},
+             "routing": {...}} 字典
+        """
+        return {
+            "query_embedding": self.query_cache.stats(),
+            "result": self.result_cache.stats(),
+            "lexical_fast_path": {"hits": self.lexical_fast_path_hits},
+            "routing": dict(self.route_counts),
+        }
+
+
+class SharedRetriever:
+    """
+    进程级共享检索器，支持索引代际热加载。
+
+    - 首次访问时懒加载，之后所有调用共享同一个 LocalRAGRetriever
+    - 按固定间隔检查 CURRENT 指针，发现新代际后在后台线程中加载，
+      加载完成后原子替换引用；进行中的检索继续使用旧实例，不被阻塞
+    - get() 除首次加载外不做任何阻塞 IO，可在线程池与 asyncio 中安全调用
+    """
+
+    def __init__(self, model_name: str, api_key: str, check_interval: float = 2.0):
+        """
+        Args:
+            model_name: Embedding 模型名称
+            api_key: DashScope API Key
+            check_interval: 检查新代际的最小间隔（秒）
+        """
+        self.model_name = model_name
+        self.api_key = api_key
+        self.check_interval = check_interval
+
+        self._retriever: LocalRAGRetriever | None = None
+        self._init_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._last_check = 0.0
+
+    def get(self) -> LocalRAGRetriever:
+        """
+        获取当前代际的检索器。
+
+        Returns:
+            LocalRAGRetriever 实例
+        """
+        retriever = self._retriever
+        if retriever is None:
+            with self._init_lock:
+                if self._retriever is None:
+                    self._retriever = LocalRAGRetriever(self.model_name, self.api_key)
+                    self._last_check = time.monotonic()
+                return self._retriever
+
+        now = time.monotonic()
+        if now - self._last_check >= self.check_interval:
+            self._last_check = now
+            if read_current_generation(VECTOR_DB_DIR) != retriever.generation:
+                self._start_reload()
+
+        return retriever
+
+    def _start_reload(self) -> None:
+        """在后台线程中加载新代际；已有加载任务进行中时直接返回。"""
+        if not self._reload_lock.acquire(blocking=False):
+            return
+
+        def reload() -> None:
+            try:
+                current = self._retriever
+                fresh = LocalRAGRetriever(
+                    self.model_name,
+                    self.api_key,
+                    embeddings=current.embeddings if current else None,
+                    query_cache=current.query_cache if current else None,
+                    result_cache=current.result_cache if current else None,
+                )
+                self._retriever = fresh
+                logger.info("知识库索引已切换到代际 %s", fresh.generation)
+            except Exception:
+                logger.exception("加载新的知识库索引代际失败，继续使用当前代际")
+            finally:
+                self._reload_lock.release()
+
+        threading.Thread(target=reload, name="rag-index-reload", daemon=True).start()
+
+
+_shared_retriever: SharedRetriever | None = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_retriever(model_name: str, api_key: str) -> LocalRAGRetriever:
+    """
+    获取进程级共享的检索器（懒加载、线程安全、自动热加载新代际）。
+
+    Args:
+        model_name: Embedding 模型名称
+        api_key: DashScope API Key
+
+    Returns:
+        当前代际的 LocalRAGRetriever 实例
+    """
+    global _shared_retriever
+
+    if _shared_retriever is None:
+        with _shared_lock:
+            if _shared_retriever is None:
+                _shared_retriever = SharedRetriever(
+                    model_name,
+                    api_key,
+                    check_interval=float(os.getenv("RAG_RELOAD_INTERVAL") or 2.0),
+                )
+
+    return _shared_retriever.get()
+
+
+async def aget_shared_retriever(model_name: str, api_key: str) -> LocalRAGRetriever:
+    """
+    get_shared_retriever 的异步版本。
+
+    首次加载索引涉及磁盘 IO，放到线程中执行，避免阻塞事件循环；
+    加载完成后直接返回共享实例。
+    """
+    shared = _shared_retriever
+    if shared is not None and shared._retriever is not None:
+        return shared.get()
+    return await asyncio.to_thread(get_shared_retriever, model_name, api_key)
+
+
+async def aclose_shared_retriever() -> None:
+    """关闭共享检索器在当前事件循环中的异步 Embedding 连接池（服务退出前调用）。"""
+    shared = _shared_retriever
+    retriever = shared._retriever if shared is not None else None
+    aclose = getattr(retriever.embeddings, "aclose", None) if retriever is not None else None
+    if aclose is not None:
+        await aclose()
+
 
 if __name__ == "__main__":
     """
@@ -0,0 +1,380 @@
+"""
+按类别分片的向量索引与查询路由（RAG 公共组件）。
+
+模块职责：
+- 构建阶段：按文档类别（知识库子目录或文件）维护独立的精确索引分片，只重写发生变化的分片
+- 为每个分片记录路由信息：类别名、来源文件、三级标题以及向量质心
+- 检索阶段：根据显式类别或查询中出现的类别 / 文件 / 标题名称，选择唯一的相关分片进行检索；
+  无法确定时交由全量索引处理。按查询向量与各分片质心距离的路由默认关闭（需显式开启）
+
+设计说明：
+- 一个 Markdown 文件代表一类生成规范（见 ingest.py），因此默认“一个文件一个类别”；
+  放在 docs 子目录中的文件以子目录名作为类别，便于将多个文件归为一类
+- 分片与全量索引使用相同的向量 ID，共用同一份 chunk 存储；全量索引（含 ANN）继续服务未路由的查询
+- 分片文件名由类别名哈希得到，未变化的分片在发布代际时以硬链接复用，零拷贝
+- 分片在检查点中先于 chunk 存储提交落盘，启动时与全量索引一样以 chunk 存储为准修正
+- 旧版本构建的向量库没有分片时，从全量索引中重建分片，无需重新向量化
+- 质心只概括了类别的平均语义，按质心路由时只检索一个分片，可能漏掉其他类别中真正相关的片段
+  （如询问 FastAPI 路由的查询被路由到前端类别），因此默认不启用，仅在类别语义差异明显时按需开启
+"""
+
+# ===== 标准库 =====
+from pathlib import Path
+from typing import Dict, Iterable, List, Set
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import unicodedata
+
+# ===== 第三方库 =====
+import faiss
+import numpy as np
+
+# ===== 本地模块 =====
+from knowledge_db.rag.ann_index import new_flat_index, read_index_mmap, write_index_atomic
+
+
+logger = logging.getLogger(__name__)
+
+# 分片目录与分片元数据文件名（位于向量数据库目录下）
+SHARDS_DIR_NAME = "shards"
+SHARD_META_FILE_NAME = "shards.json"
+
+# 短于该长度的名称按子串匹配容易误匹配（如 vue 出现在 revue 中）：
+# 类别名与文件名改为按完整单词匹配，三级标题则不参与路由
+_MIN_ROUTING_NAME_LENGTH = 4
+
+
+def category_of(source: str, kb_dir: Path) -> str:
+    """
+    计算文档所属类别。
+
+    Args:
+        source: 文档相对路径（如 knowledge_db/docs/frontend/vue.md）
+        kb_dir: 知识库根目录
+
+    Returns:
+        类别名：docs 下的一级子目录名，直接位于 docs 下的文件则为文件名（不含扩展名）
+    """
+    relative = Path(source).relative_to(kb_dir)
+    return relative.parts[0] if len(relative.parts) > 1 else relative.stem
+
+
+def _shard_file_name(category: str) -> str:
+    """由类别名生成稳定且文件系统安全的分片文件名。"""
+    return f"shard_{hashlib.sha1(category.encode('utf-8')).hexdigest()[:16]}.faiss"
+
+
+def _normalize_name(text: str) -> str:
+    """规范化名称用于子串匹配：统一 Unicode 形式、小写，并将分隔符视为空格。"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    for separator in ("_", "-", "."):
+        text = text.replace(separator, " ")
+    return " ".join(text.split())
+
+
+def load_shard_meta(vector_db_dir: Path) -> Dict | None:
+    """
+    读取分片元数据。
+
+    Args:
+        vector_db_dir: 向量数据库（或代际）目录
+
+    Returns:
+        元数据字典；不存在时返回 None
+    """
+    meta_path = Path(vector_db_dir) / SHARDS_DIR_NAME / SHARD_META_FILE_NAME
+    if not meta_path.exists():
+        return None
+    return json.loads(meta_path.read_text(encoding="utf-8"))
+
+
+class ShardSet:
+    """
+    构建阶段的分片集合。
+
+    元数据结构：
+        {
+            "shards": {
+                "<类别>": {
+                    "file": "shard_xxx.faiss",
+                    "ntotal": 123,
+                    "sources": ["knowledge_db/docs/..."],
+                    "headers": ["三级标题", ...],
+                    "centroid": [...]
+                }
+            }
+        }
+    """
+
+    def __init__(self, vector_db_dir: Path, kb_dir: Path):
+        """
+        加载已有分片（不存在时为空集合）。
+
+        Args:
+            vector_db_dir: 向量数据库目录
+            kb_dir: 知识库根目录（用于计算类别）
+        """
+        self.shards_dir = Path(vector_db_dir) / SHARDS_DIR_NAME
+        self.kb_dir = kb_dir
+        self.indexes: Dict[str, object] = {}
+        self.meta = load_shard_meta(vector_db_dir) or {"shards": {}}
+        self._dirty: Set[str] = set()
+
+        for category, entry in self.meta["shards"].items():
+            self.indexes[category] = faiss.read_index(str(self.shards_dir / entry["file"]))
+
+        # 元数据缺失说明是旧版本构建的向量库（或全量重建），需要从全量索引中补建分片
+        self.missing = not (self.shards_dir / SHARD_META_FILE_NAME).exists()
+
+    def category_of(self, source: str) -> str:
+        """计算文档所属类别。"""
+        return category_of(source, self.kb_dir)
+
+    def bootstrap(self, flat_index, store) -> None:
+        """
+        从全量索引中重建全部分片（复用已有向量，无需重新向量化）。
+
+        Args:
+            flat_index: 全量精确索引（IndexIDMap + IndexFlatL2）
+            store: chunk 存储
+        """
+        self.indexes.clear()
+        self.meta = {"shards": {}}
+        if flat_index is None or flat_index.ntotal == 0:
+            self._dirty = set()
+            return
+
+        ids = faiss.vector_to_array(flat_index.id_map)
+        vectors = faiss.downcast_index(flat_index.index).reconstruct_n(0, flat_index.ntotal)
+        position = {int(faiss_id): row for row, faiss_id in enumerate(ids)}
+
+        for source, faiss_ids in store.ids_by_source().items():
+            rows = [position[faiss_id] for faiss_id in faiss_ids if faiss_id in position]
+            if rows:
+                self.add(
+                    self.category_of(source),
+                    vectors[rows],
+                    np.asarray(ids[rows], dtype=np.int64),
+                )
+
+    def add(self, category: str, vectors: np.ndarray, faiss_ids: np.ndarray) -> None:
+        """
+        向指定类别的分片写入向量。
+
+        Args:
+            category: 类别名
+            vectors: float32 向量矩阵
+            faiss_ids: 对应的向量 ID
+        """
+        index = self.indexes.get(category)
+        if index is None:
+            index = self.indexes[category] = new_flat_index(vectors.shape[1])
+        index.add_with_ids(vectors, faiss_ids)
+        self._dirty.add(category)
+
+    def remove_ids(self, faiss_ids: Iterable[int]) -> None:
+        """从所有分片中删除给定向量 ID，只有实际删除了向量的分片会被标记为待写入。"""
+        ids = np.asarray(sorted(faiss_ids), dtype=np.int64)
+        if not len(ids):
+            return
+        for category, index in self.indexes.items():
+            if index.remove_ids(ids):
+                self._dirty.add(category)
+
+    def reconcile(self, valid_ids: Set[int]) -> None:
+        """以 chunk 存储为准移除分片中多出的向量（与全量索引的修正逻辑一致）。"""
+        for category, index in self.indexes.items():
+            stale = set(faiss.vector_to_array(index.id_map).tolist()) - valid_ids
+            if stale:
+                index.remove_ids(np.asarray(sorted(stale), dtype=np.int64))
+                self._dirty.add(category)
+
+    def save(self, store) -> None:
+        """
+        写入发生变化的分片及其路由信息，最后原子替换分片元数据。
+
+        Args:
+            store: chunk 存储（读取分片的来源文件与三级标题）
+        """
+        if not self._dirty and not self.missing:
+            return
+
+        self.shards_dir.mkdir(parents=True, exist_ok=True)
+
+        for category in sorted(self._dirty):
+            index = self.indexes[category]
+            entry = self.meta["shards"].get(category)
+            file_name = _shard_file_name(category)
+
+            if index.ntotal == 0:
+                # 类别下的文档已全部删除
+                (self.shards_dir / file_name).unlink(missing_ok=True)
+                self.meta["shards"].pop(category, None)
+                del self.indexes[category]
+                continue
+
+            write_index_atomic(index, self.shards_dir / file_name)
+
+            faiss_ids = faiss.vector_to_array(index.id_map).tolist()
+            sources, headers = store.routing_metadata(faiss_ids)
+            centroid = faiss.downcast_index(index.index).reconstruct_n(0, index.ntotal).mean(axis=0)
+            norm = np.linalg.norm(centroid)
+
+            self.meta["shards"][category] = {
+                **(entry or {}),
+                "file": file_name,
+                "ntotal": index.ntotal,
+                "sources": sorted(sources),
+                "headers": sorted(headers),
+                "centroid": (centroid / norm if norm > 0 else centroid).tolist(),
+            }
+
+        meta_path = self.shards_dir / SHARD_META_FILE_NAME
+        tmp_path = meta_path.with_suffix(".json.tmp")
+        tmp_path.write_text(json.dumps(self.meta, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, meta_path)
+
+        self._dirty.clear()
+        self.missing = False
+
+
+class ShardRouter:
+    """
+    检索阶段的分片路由器。
+
+    分片索引按需以只读内存映射方式加载，并在实例内缓存。
+    """
+
+    def __init__(self, index_dir: Path, meta: Dict, margin: float = 0.0):
+        """
+        Args:
+            index_dir: 代际（或向量数据库）目录
+            meta: 分片元数据
+            margin: 质心路由要求的最佳与次佳相似度之差，<= 0（默认）表示禁用质心路由
+        """
+        self.shards_dir = Path(index_dir) / SHARDS_DIR_NAME
+        self.shards: Dict[str, Dict] = meta["shards"]
+        self.margin = margin
+
+        self.categories: List[str] = sorted(self.shards)
+        self._centroids = (
+            np.asarray([self.shards[name]["centroid"] for name in self.categories], dtype=np.float32)
+            if self.categories
+            else None
+        )
+
+        # 每个类别可被匹配的名称：类别名、来源文件名、较长的三级标题；
+        # 较短的类别名 / 文件名只在前后不紧邻英文字母或数字时匹配
+        self._names: Dict[str, Set[str]] = {}
+        self._short_names: Dict[str, re.Pattern] = {}
+        for category, entry in self.shards.items():
+            identifiers = {_normalize_name(category)}
+            identifiers.update(_normalize_name(Path(source).stem) for source in entry["sources"])
+            headers = {_normalize_name(header) for header in entry["headers"]}
+            self._names[category] = {
+                name for name in identifiers | headers if len(name) >= _MIN_ROUTING_NAME_LENGTH
+            }
+            short = sorted(
+                name for name in identifiers if 2 <= len(name) < _MIN_ROUTING_NAME_LENGTH
+            )
+            if short:
+                self._short_names[category] = re.compile(
+                    r"(?<![a-z0-9])(?:" + "|".join(map(re.escape, short)) + r")(?![a-z0-9])"
+                )
+
+        self._indexes: Dict[str, object] = {}
+        self._id_sets: Dict[str, Set[int]] = {}
+        self._lock = threading.Lock()
+
+    def route_by_metadata(self, query: str) -> str | None:
+        """
+        若查询中出现且仅出现一个类别的类别名 / 文件名 / 标题，则路由到该类别。
+        较短的类别名与文件名（如 vue）按完整单词匹配。
+
+        Args:
+            query: 查询文本
+
+        Returns:
+            类别名；无法唯一确定时返回 None
+        """
+        normalized = _normalize_name(query)
+        matched = [
+            category
+            for category, names in self._names.items()
+            if any(name in normalized for name in names)
+            or (
+                category in self._short_names
+                and self._short_names[category].search(normalized) is not None
+            )
+        ]
+        return matched[0] if len(matched) == 1 else None
+
+    def route_by_vector(self, vector: np.ndarray) -> str | None:
+        """
+        以查询向量与各分片质心的余弦相似度进行路由（质心差距足够大时才路由）。
+
+        Args:
+            vector: 查询向量
+
+        Returns:
+            类别名；分片不足两个或差距不明显时返回 None
+        """
+        if self.margin <= 0 or len(self.categories) < 2:
+            return None
+
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return None
+        similarity = self._centroids @ (np.asarray(vector, dtype=np.float32) / norm)
+
+        best, second = np.argsort(similarity)[::-1][:2]
+        if similarity[best] - similarity[second] >= self.margin:
+            return self.categories[best]
+        return None
+
+    def index(self, category: str):
+        """获取类别对应的分片索引（懒加载）。"""
+        index = self._indexes.get(category)
+        if index is None:
+            with self._lock:
+                index = self._indexes.get(category)
+                if index is None:
+                    index = read_index_mmap(self.shards_dir / self.shards[category]["file"])
+                    self._indexes[category] = index
+        return index
+
+    def ids(self, category: str) -> Set[int]:
+        """获取类别包含的向量 ID 集合（用于过滤词法检索结果）。"""
+        id_set = self._id_sets.get(category)
+        if id_set is None:
+            id_set = set(faiss.vector_to_array(self.index(category).id_map).tolist())
+            self._id_sets[category] = id_set
+        return id_set
+
+
+def load_shard_router(index_dir: Path) -> ShardRouter | None:
+    """
+    根据环境变量构建分片路由器。
+
+    支持的环境变量：
+    - RAG_SHARD_ROUTING：是否启用分片路由，默认 1（0 表示始终检索全量索引）
+    - RAG_ROUTE_MARGIN：质心路由的最小相似度差距，默认 0（仅按显式类别与元数据路由），大于 0 时开启质心路由
+
+    Args:
+        index_dir: 代际（或向量数据库）目录
+
+    Returns:
+        ShardRouter；未启用或代际中没有分片时返回 None
+    """
+    if (os.getenv("RAG_SHARD_ROUTING") or "1") == "0":
+        return None
+
+    meta = load_shard_meta(index_dir)
+    if not meta or not meta["shards"]:
+        return None
+
+    return ShardRouter(index_dir, meta, margin=float(os.getenv("RAG_ROUTE_MARGIN") or 0))
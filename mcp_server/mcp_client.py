@@ -6,24 +6,39 @@ MCPClientManager：多 MCP Server 客户端管理器。
 - 在异步上下文中初始化并连接 MCP Server
 - 提供集中化的工具（Tool）获取入口
 - 为 Agent 层屏蔽 MCP Client 的底层细节
+- 为每个 MCP Server 维护长连接会话池，定期健康检查并自动重启崩溃的 Server
+- 并发启动各 MCP Server，记录每个 Server 的启动耗时
 
 设计说明：
-- 使用 MultiServerMCPClient 同时连接多个 MCP Server
-- 通过 async with 管理客户端的初始化与清理
+- 使用 MultiServerMCPClient 保存多个 MCP Server 的连接配置
+- 工具调用复用会话池中的长连接，不再为每次调用启动新进程并重新握手
+- 通过 async with 管理客户端的初始化与清理，退出时关闭全部会话与子进程
+- 工具定义缓存命中时直接用缓存构建工具，对应 Server 在后台连接（冷启动无需等待进程启动与握手）；
+  后台连接完成后校验版本与工具定义，有变化时更新缓存，并就地刷新已构建工具的描述与参数 Schema
+  （Agent 每次调用模型时重新绑定工具，刷新立即生效）；已被移除的工具在调用时直接返回错误，
+  新增的工具在下次启动时加载
+- 搜索 MCP Server 的传输方式由配置决定（search_server_config）：stdio 时每个 Agent 进程各自启动子进程，
+  streamable_http 时多个 Agent 共用一个独立运行的搜索服务（共享缓存与限流额度）
 - Filesystem MCP 的根目录被限制在指定路径内，保证文件操作安全
 """
 
 # ===== 标准库 =====
 import os
+import time
+import asyncio
 import logging
-from typing import List, Any
+from typing import Dict, List, Any
 
 # ===== 第三方库 =====
 from langchain_mcp_adapters.client import MultiServerMCPClient
+from langchain_mcp_adapters.tools import convert_mcp_tool_to_langchain_tool
+from mcp.types import Tool
 
 # ===== 本地模块 =====
 from utils.load_prompt import find_project_root
 from log.logging_config import setup_logging
+from mcp_server.session_pool import MCPSessionPool, PooledSession
+from mcp_server.tool_schema_cache import ToolSchemaCache, build_tool_schema_cache
 
 
 # 初始化全局日志配置
@@ -31,6 +46,33 @@ setup_logging()
 logger = logging.getLogger(__name__)
 
 
+def search_server_config() -> Dict[str, Any]:
+    """
+    根据环境变量生成搜索 MCP Server 的连接配置。
+
+    支持的环境变量：
+    - MCP_SEARCH_TRANSPORT：stdio（默认，启动本地子进程）或 streamable_http（连接共享服务）
+    - MCP_SEARCH_URL：streamable_http 模式的服务地址，默认 http://127.0.0.1:8765/mcp
+      （共享服务启动方式：python mcp_server/tavily_mcp_server.py --transport http）
+
+    Returns:
+        MultiServerMCPClient 可用的单个 Server 连接配置
+    """
+    transport = os.getenv("MCP_SEARCH_TRANSPORT") or "stdio"
+    if transport in ("http", "streamable_http", "streamable-http"):
+        return {
+            "transport": "streamable_http",
+            "url": os.getenv("MCP_SEARCH_URL") or "http://127.0.0.1:8765/mcp",
+        }
+    if transport != "stdio":
+        raise RuntimeError(f"❌ 不支持的 MCP_SEARCH_TRANSPORT: {transport}")
+    return {
+        "transport": "stdio",
+        "command": "python",
+        "args": ["mcp_server/tavily_mcp_server.py"],
+    }
+
+
 class MCPClientManager:
     """
     MCP 客户端管理器，用于统一管理多个 MCP Server 连接。
@@ -40,13 +82,24 @@ class MCPClientManager:
     - MCP 工具的集中注册与分发入口
     """
 
-    def __init__(self, server_config: dict | None = None):
+    def __init__(
+        self,
+        server_config: dict | None = None,
+        pool_size: int | None = None,
+        health_interval: float | None = None,
+        schema_cache: ToolSchemaCache | None = None,
+    ):
         """
         初始化 MCPClientManager。
 
         Args:
             server_config: MCP Server 的配置字典。
                            若为空，则使用内置的默认配置。
+            pool_size: 每个 Server 的最大会话数（并发工具调用数），
+                       默认读取环境变量 MCP_POOL_SIZE，缺省为 2
+            health_interval: 健康检查间隔（秒），默认读取环境变量 MCP_HEALTH_INTERVAL，
+                             缺省为 30；<= 0 表示不做周期检查
+            schema_cache: 工具定义缓存，默认由环境变量 MCP_TOOL_CACHE / MCP_TOOL_CACHE_PATH 构建
         """
 
         # ===== 项目路径配置 =====
@@ -58,14 +111,10 @@ class MCPClientManager:
         os.makedirs(generated_projects_dir, exist_ok=True)
 
         # ===== MCP Server 默认配置 =====
-        # - mcp_server：自定义搜索 / 业务 MCP Server
+        # - mcp_server：自定义搜索 / 业务 MCP Server（传输方式由 MCP_SEARCH_TRANSPORT 决定）
         # - filesystem：官方 Filesystem MCP，用于受控文件操作
         self.server_config = server_config or {
-            "mcp_server": {
-                "transport": "stdio",
-                "command": "python",
-                "args": ["mcp_server/tavily_mcp_server.py"],
-            },
+            "mcp_server": search_server_config(),
             "filesystem": {
                 "transport": "stdio",
                 "command": "mcp-server-filesystem",
@@ -73,8 +122,26 @@ class MCPClientManager:
             },
         }
 
+        self.pool_size = pool_size or int(os.getenv("MCP_POOL_SIZE") or 2)
+        self.health_interval = (
+            health_interval
+            if health_interval is not None
+            else float(os.getenv("MCP_HEALTH_INTERVAL") or 30)
+        )
+        self.ping_timeout = float(os.getenv("MCP_PING_TIMEOUT") or 10)
+        self.schema_cache = schema_cache or build_tool_schema_cache()
+
         self.client: MultiServerMCPClient | None = None
+        self.pools: Dict[str, MCPSessionPool] = {}
         self._tools: List[Any] = []
+        # 各 Server 的会话代理与已构建的工具（按 MCP 工具名索引），用于工具定义变化时就地刷新
+        self._sessions: Dict[str, PooledSession] = {}
+        self._server_tools: Dict[str, Dict[str, Any]] = {}
+        self._health_task: asyncio.Task | None = None
+        self._connect_tasks: List[asyncio.Task] = []
+
+        # 各 Server 从启动到完成握手并拉取工具定义的耗时（秒）
+        self.startup_seconds: Dict[str, float] = {}
 
     async def __aenter__(self):
         """
@@ -82,8 +149,9 @@ class MCPClientManager:
 
         在该阶段：
         - 初始化 MultiServerMCPClient
-        - 建立与各 MCP Server 的连接
-        - 预加载并缓存所有可用工具
+        - 为每个 MCP Server 建立会话池，并发启动各 Server
+        - 工具定义缓存命中的 Server 直接返回缓存的工具，在后台完成连接
+        - 启动周期性健康检查
         """
 
         logger.info(
@@ -91,25 +159,184 @@ class MCPClientManager:
             list(self.server_config.keys()),
         )
 
+        started = time.perf_counter()
         self.client = MultiServerMCPClient(self.server_config)
+        self.pools = {
+            name: MCPSessionPool(
+                self.client, name, size=self.pool_size, ping_timeout=self.ping_timeout
+            )
+            for name in self.server_config
+        }
+
+        try:
+            server_tools = await asyncio.gather(
+                *(self._start_server(name) for name in self.server_config)
+            )
+        except BaseException:
+            await self.aclose()
+            raise
+        for tools in server_tools:
+            self._tools.extend(tools)
 
-        # 预先拉取并缓存工具列表，避免后续重复请求
-        self._tools = await self.client.get_tools()
+        if self.health_interval > 0:
+            self._health_task = asyncio.create_task(self._health_loop())
 
-        logger.info("MCP 客户端启动成功，已加载 %d 个工具。", len(self._tools))
+        logger.info(
+            "MCP 客户端启动成功，已加载 %d 个工具，耗时 %.2fs。",
+            len(self._tools),
+            time.perf_counter() - started,
+        )
         return self
 
-    async def __aexit__(self, exc_type, exc_val, exc_tb):
+    async def _start_server(self, name: str) -> List[Any]:
+        """
+        启动单个 Server 并返回其 LangChain 工具。
+        工具定义缓存命中时立即返回，连接在后台进行；否则等待连接完成。
         """
-        退出异步上下文。
+        cached = (
+            self.schema_cache.get(name, self.server_config[name])
+            if self.schema_cache
+            else None
+        )
+        if cached is None:
+            return self._build_tools(name, await self._connect(name))
+
+        logger.info("MCP Server %s 使用缓存的工具定义（%d 个），后台连接中", name, len(cached))
+        self._connect_tasks.append(asyncio.create_task(self._connect_in_background(name)))
+        return self._build_tools(name, cached)
 
-        当前 MultiServerMCPClient 通常会随进程结束自动释放资源，
-        但在复杂或长生命周期应用中，可在此扩展显式清理逻辑。
+    async def _connect(self, name: str, from_cache: bool = False) -> List[Tool]:
         """
+        建立首条会话、拉取工具定义并更新缓存，记录启动耗时。
+
+        Args:
+            name: Server 名称
+            from_cache: 当前工具是否由缓存的工具定义构建（缓存过期时就地刷新工具）
+        """
+        started = time.perf_counter()
+        pool = self.pools[name]
+        await pool.start()
+        tools = await PooledSession(pool).list_all_tools()
+
+        self.startup_seconds[name] = round(time.perf_counter() - started, 3)
+        logger.info(
+            "MCP Server %s 已就绪（版本 %s），启动耗时 %.2fs",
+            name,
+            pool.server_info.version if pool.server_info else "unknown",
+            self.startup_seconds[name],
+        )
+
+        if self.schema_cache is not None:
+            self.schema_cache.put(name, self.server_config[name], pool.server_info, tools)
+        if from_cache:
+            self._refresh_tools(name, tools)
+        return tools
 
+    def _refresh_tools(self, name: str, tools: List[Tool]) -> None:
+        """
+        按 Server 的最新工具定义刷新由缓存构建的工具（与缓存一致时不做改动）。
+
+        - 仍存在的工具：就地替换描述、参数 Schema 与元数据
+        - 已移除的工具：调用时直接返回错误结果
+        - 新增的工具：无法加入已创建的 Agent，下次启动时加载
+        """
+        session = self._sessions[name]
+        session.tool_names = {tool.name for tool in tools}
+
+        built = self._server_tools[name]
+        refreshed = []
+        for tool in tools:
+            lc_tool = built.get(tool.name)
+            if lc_tool is None:
+                continue
+            fresh = self._convert_tool(name, session, tool)
+            if (
+                fresh.description != lc_tool.description
+                or fresh.args_schema != lc_tool.args_schema
+                or fresh.metadata != lc_tool.metadata
+            ):
+                lc_tool.description = fresh.description
+                lc_tool.args_schema = fresh.args_schema
+                lc_tool.metadata = fresh.metadata
+                refreshed.append(tool.name)
+
+        removed = sorted(built.keys() - session.tool_names)
+        added = sorted(session.tool_names - built.keys())
+        if not (refreshed or removed or added):
+            return
+        logger.warning(
+            "MCP Server %s 的工具定义已变化：已刷新 %s，已移除 %s（调用将返回错误），"
+            "新增 %s（下次启动时加载）",
+            name,
+            refreshed,
+            removed,
+            added,
+        )
+
+    async def _connect_in_background(self, name: str) -> None:
+        """后台连接；失败时仅记录日志，由健康检查或下一次工具调用重试。"""
+        try:
+            await self._connect(name, from_cache=True)
+        except Exception as exc:
+            logger.error("❌ MCP Server %s 后台连接失败: %s", name, exc)
+
+    def _build_tools(self, name: str, tools: List[Tool]) -> List[Any]:
+        """将 MCP 工具定义转换为 LangChain 工具，调用时从会话池借用长连接。"""
+        session = self._sessions.setdefault(name, PooledSession(self.pools[name]))
+        built = {tool.name: self._convert_tool(name, session, tool) for tool in tools}
+        self._server_tools[name] = built
+        return list(built.values())
+
+    def _convert_tool(self, name: str, session: PooledSession, tool: Tool) -> Any:
+        """将单个 MCP 工具定义转换为 LangChain 工具。"""
+        return convert_mcp_tool_to_langchain_tool(
+            session,
+            tool,
+            callbacks=self.client.callbacks,
+            server_name=name,
+            tool_interceptors=self.client.tool_interceptors,
+            tool_name_prefix=self.client.tool_name_prefix,
+            handle_tool_errors=self.client.handle_tool_errors,
+        )
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """
+        退出异步上下文：停止健康检查，关闭全部会话及 MCP Server 子进程。
+        """
+
+        await self.aclose()
         if self.client:
             logger.info("已退出 MCP 客户端上下文，连接已关闭。")
 
+    async def _health_loop(self) -> None:
+        """周期性检查各 Server 的空闲会话，失效时自动重启。"""
+        while True:
+            await asyncio.sleep(self.health_interval)
+            for pool in self.pools.values():
+                try:
+                    await pool.health_check()
+                except Exception as exc:
+                    logger.warning("MCP Server %s 健康检查异常: %s", pool.server_name, exc)
+
+    async def aclose(self) -> None:
+        """停止后台连接与健康检查，关闭全部会话池（可重复调用）。"""
+        for task in self._connect_tasks:
+            task.cancel()
+        await asyncio.gather(*self._connect_tasks, return_exceptions=True)
+        self._connect_tasks.clear()
+
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+
+        await asyncio.gather(
+            *(pool.aclose() for pool in self.pools.values()), return_exceptions=True
+        )
+
     @property
     def tools(self) -> List[Any]:
         """
@@ -132,3 +359,15 @@ class MCPClientManager:
             MultiServerMCPClient 实例，若尚未初始化则为 None
         """
         return self.client
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        返回各 MCP Server 会话池的统计信息。
+
+        Returns:
+            以 Server 名称为键的统计字典（会话池统计及启动耗时 startup_seconds）
+        """
+        return {
+            name: {**pool.stats(), "startup_seconds": self.startup_seconds.get(name)}
+            for name, pool in self.pools.items()
+        }
@@ -0,0 +1,255 @@
+"""
+SearchResultCache：Web 搜索结果缓存与请求合并（供 Tavily MCP Server 使用）。
+
+模块职责：
+- 以规范化后的查询为键缓存搜索结果：同一轮对话或不同会话重复搜索相同问题时不再请求 Tavily
+- 进程内 LRU + TTL 缓存；可选 SQLite 持久层，进程重启后缓存依然有效
+- 相同查询的并发请求合并为一次上游请求（singleflight），其余请求等待并共享结果；
+  上游请求在独立任务中执行，个别调用方取消不会中断其他调用方共享的请求
+- 统计内存 / SQLite 命中、上游请求与合并次数，便于评估缓存效果
+
+设计说明：
+- 查询规范化：Unicode NFKC、去除首尾空白、合并连续空白、忽略大小写；
+  返回结果数（max_results）同样参与缓存键
+- 查询顺序：内存缓存 → SQLite（命中后回填内存）→ 进行中的相同请求 → 上游请求
+- 上游请求失败时不写入缓存，异常传递给所有等待中的请求
+- SQLite 层同样按 TTL 判断过期，超出条目数上限时删除最早写入的条目
+"""
+
+# ===== 标准库 =====
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+# ===== 本地模块 =====
+from knowledge_db.rag.cache import LRUCache
+from utils.load_prompt import find_project_root
+
+
+# SQLite 搜索缓存默认位置（相对项目根目录）
+DEFAULT_SEARCH_CACHE_PATH = Path(".devmate") / "search_cache.sqlite"
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """规范化查询文本，使仅有大小写、全半角或空白差异的查询共用缓存。"""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", query)).strip().casefold()
+
+
+class _SQLiteSearchStore:
+    """搜索结果的 SQLite 持久层（线程安全）。"""
+
+    def __init__(self, path: Path, ttl: float | None, max_entries: int):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS search_results ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS search_results_created_at"
+            " ON search_results (created_at)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Any:
+        """读取未过期的结果；未命中返回 None。"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM search_results WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        value, created_at = row
+        if self.ttl is not None and time.time() - created_at >= self.ttl:
+            return None
+        return json.loads(value)
+
+    def put(self, key: str, value: Any) -> None:
+        """写入结果，超出条目数上限时删除最早写入的条目。"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO search_results (key, value, created_at)"
+                " VALUES (?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), time.time()),
+            )
+            if self.max_entries > 0:
+                self._conn.execute(
+                    "DELETE FROM search_results WHERE key IN"
+                    " (SELECT key FROM search_results ORDER BY created_at DESC"
+                    "  LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM search_results").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class SearchResultCache:
+    """
+    搜索结果缓存：内存 LRU/TTL + 可选 SQLite 持久层 + 相同查询的请求合并。
+    需在同一个事件循环中使用。
+    """
+
+    def __init__(
+        self,
+        max_size: int = 256,
+        ttl: float | None = 3600,
+        sqlite_path: Path | None = None,
+        sqlite_max_entries: int = 10000,
+    ):
+        """
+        Args:
+            max_size: 内存缓存的最大条目数（0 表示不使用内存缓存）
+            ttl: 结果存活时间（秒），None 或 <= 0 表示永不过期
+            sqlite_path: SQLite 持久层路径，None 表示不启用
+            sqlite_max_entries: SQLite 持久层的最大条目数（<= 0 表示不限制）
+        """
+        ttl = ttl if ttl and ttl > 0 else None
+        self.memory = LRUCache(max_size=max_size, ttl=ttl)
+        self.store = (
+            _SQLiteSearchStore(sqlite_path, ttl, sqlite_max_entries) if sqlite_path else None
+        )
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+        self.store_hits = 0
+        self.upstream_requests = 0
+        self.upstream_errors = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def make_key(query: str, max_results: int) -> str:
+        """缓存键：返回结果数 + 规范化查询。"""
+        return f"{max_results}:{normalize_query(query)}"
+
+    async def get_or_fetch(
+        self,
+        query: str,
+        max_results: int,
+        fetch: Callable[[], Awaitable[List[dict]]],
+    ) -> List[dict]:
+        """
+        查询缓存，未命中时调用 fetch 请求上游；相同查询的并发调用只请求一次。
+
+        Args:
+            query: 原始查询
+            max_results: 返回结果数
+            fetch: 请求上游的协程函数
+
+        Returns:
+            搜索结果列表
+        """
+        key = self.make_key(query, max_results)
+
+        results = self.memory.get(key)
+        if results is not None:
+            return results
+
+        if self.store is not None:
+            results = self.store.get(key)
+            if results is not None:
+                self.store_hits += 1
+                self.memory.put(key, results)
+                return results
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(self._fetch(key, fetch))
+            # 所有调用方都已取消时无人读取异常，在此读取以免产生 “exception was never retrieved” 日志
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[key] = task
+        # shield：某个调用方被取消时不影响共享同一请求的其他调用方
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key: str, fetch: Callable[[], Awaitable[List[dict]]]) -> List[dict]:
+        """请求上游并写入缓存（失败时不缓存）。"""
+        self.upstream_requests += 1
+        try:
+            results = await fetch()
+        except Exception:
+            self.upstream_errors += 1
+            raise
+        finally:
+            del self._inflight[key]
+
+        self.memory.put(key, results)
+        if self.store is not None:
+            self.store.put(key, results)
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        返回缓存统计信息。
+
+        Returns:
+            包含内存缓存统计（memory）、SQLite 命中与条目数、上游请求数、
+            合并请求数以及总体命中率（hit_rate）的字典
+        """
+        memory = self.memory.stats()
+        lookups = memory["hits"] + memory["misses"]
+        served = memory["hits"] + self.store_hits + self.coalesced
+        return {
+            "memory": memory,
+            "sqlite": (
+                {"size": len(self.store), "hits": self.store_hits}
+                if self.store is not None
+                else None
+            ),
+            "upstream_requests": self.upstream_requests,
+            "upstream_errors": self.upstream_errors,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+            "hit_rate": round(served / lookups, 4) if lookups else 0.0,
+        }
+
+
+def build_search_cache() -> SearchResultCache:
+    """
+    根据环境变量构建搜索结果缓存。
+
+    支持的环境变量：
+    - TAVILY_CACHE_SIZE：内存缓存的最大条目数，默认 256（0 表示禁用内存缓存）
+    - TAVILY_CACHE_TTL：结果存活时间（秒），默认 3600
+    - TAVILY_CACHE_SQLITE：是否启用 SQLite 持久层，默认 0（1 表示启用）
+    - TAVILY_CACHE_PATH：SQLite 文件路径，默认为项目根目录下的 .devmate/search_cache.sqlite
+    - TAVILY_CACHE_MAX_ENTRIES：SQLite 持久层的最大条目数，默认 10000
+
+    Returns:
+        SearchResultCache 实例
+    """
+    sqlite_path = None
+    if (os.getenv("TAVILY_CACHE_SQLITE") or "0") == "1":
+        sqlite_path = Path(os.getenv("TAVILY_CACHE_PATH") or DEFAULT_SEARCH_CACHE_PATH)
+        if not sqlite_path.is_absolute():
+            sqlite_path = Path(find_project_root()) / sqlite_path
+
+    return SearchResultCache(
+        max_size=int(os.getenv("TAVILY_CACHE_SIZE") or 256),
+        ttl=float(os.getenv("TAVILY_CACHE_TTL") or 3600),
+        sqlite_path=sqlite_path,
+        sqlite_max_entries=int(os.getenv("TAVILY_CACHE_MAX_ENTRIES") or 10000),
+    )
@@ -0,0 +1,378 @@
+"""
+MCPSessionPool：单个 MCP Server 的长连接会话池。
+
+模块职责：
+- 为每个 MCP Server 维护若干条长期存活的会话（stdio 下即若干个常驻子进程），
+  工具调用复用已建立的会话，不再每次调用都启动新进程并重新握手
+- 并发的工具调用各自借用一条会话，池满时排队等待归还
+- 周期性发送 ping 检查空闲会话，失效会话被关闭并自动重启
+- 退出时关闭全部会话与对应的子进程
+
+设计说明：
+- 每条会话运行在独立的后台任务中：MCP SDK 基于 anyio，会话上下文必须在同一个任务中进入和退出，
+  因此由后台任务持有 client.session(...) 上下文，关闭时通知该任务自行退出
+- 调用过程中出现连接类错误（子进程崩溃、管道断开等）时丢弃该会话，下次借用时重新建立；
+  工具本身的执行错误由 MCP 以 isError 结果返回，不影响会话复用
+- 借出的会话不做健康检查，健康检查只针对空闲会话，避免与正在进行的调用争用
+- PooledSession 实现工具所需的 list_tools / call_tool 接口，可直接传给 load_mcp_tools，
+  生成的 LangChain 工具在每次调用时从池中借用会话；若请求未被 Server 执行
+  （空闲期间 stdio 子进程崩溃，或 HTTP 服务重启后会话失效），换一条新会话重试一次
+- PooledSession 可记录 Server 当前提供的工具名称；调用已被 Server 移除的工具时直接返回错误结果，
+  不再发往 Server（工具由过期的工具定义缓存构建时可能出现）
+"""
+
+# ===== 标准库 =====
+from contextlib import asynccontextmanager
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List
+import asyncio
+import logging
+import time
+
+# ===== 第三方库 =====
+import anyio
+from langchain_mcp_adapters.client import MultiServerMCPClient
+from mcp import ClientSession
+from mcp.shared.exceptions import McpError
+from mcp.types import CONNECTION_CLOSED, CallToolResult, Implementation, TextContent, Tool
+
+
+logger = logging.getLogger(__name__)
+
+# 向已关闭的连接写入请求时抛出的异常：请求尚未送达 Server
+_UNSENT_ERRORS = (anyio.ClosedResourceError, anyio.BrokenResourceError)
+
+# streamable-HTTP 下 Server 不认识当前会话（如服务重启）时 MCP SDK 返回的错误码：请求未被执行
+_SESSION_TERMINATED = 32600
+
+
+def _is_unsent_error(exc: BaseException) -> bool:
+    """判断请求是否未被 Server 执行（可安全地换一条会话重试）。"""
+    if isinstance(exc, McpError):
+        return exc.error.code == _SESSION_TERMINATED
+    return isinstance(exc, _UNSENT_ERRORS)
+
+
+class _SessionSlot:
+    """一条长连接会话及持有它的后台任务。"""
+
+    def __init__(self, client: MultiServerMCPClient, server_name: str):
+        self.client = client
+        self.server_name = server_name
+        self.session: ClientSession | None = None
+        self.server_info: Implementation | None = None
+        self.broken = False
+        self.created_at = 0.0
+        self._stop = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    async def open(self, timeout: float) -> None:
+        """启动后台任务并等待会话完成初始化握手。"""
+        ready: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._task = asyncio.create_task(
+            self._run(ready), name=f"mcp-session-{self.server_name}"
+        )
+        try:
+            await asyncio.wait_for(asyncio.shield(ready), timeout)
+        except BaseException:
+            await self.close()
+            raise
+        self.created_at = time.monotonic()
+
+    async def _run(self, ready: asyncio.Future) -> None:
+        """持有会话上下文，直到收到关闭通知。"""
+        try:
+            async with self.client.session(
+                self.server_name, auto_initialize=False
+            ) as session:
+                result = await session.initialize()
+                self.server_info = result.serverInfo
+                self.session = session
+                ready.set_result(None)
+                await self._stop.wait()
+        except Exception as exc:
+            if not ready.done():
+                ready.set_exception(exc)
+            else:
+                logger.debug("MCP Server %s 会话关闭时出现异常: %s", self.server_name, exc)
+        finally:
+            self.session = None
+            self.broken = True
+            if not ready.done():
+                ready.set_exception(
+                    RuntimeError(f"❌ MCP Server {self.server_name} 会话意外结束")
+                )
+
+    @property
+    def alive(self) -> bool:
+        """会话是否仍可使用。"""
+        return (
+            not self.broken
+            and self.session is not None
+            and self._task is not None
+            and not self._task.done()
+        )
+
+    async def close(self, timeout: float = 5.0) -> None:
+        """通知后台任务退出会话上下文（同时结束 stdio 子进程），超时则强制取消。"""
+        self.broken = True
+        self._stop.set()
+        if self._task is None or self._task.done():
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+            try:
+                await self._task
+            except BaseException:
+                pass
+        except Exception:
+            pass
+
+
+def _is_connection_error(exc: BaseException) -> bool:
+    """判断异常是否意味着会话已不可用（与工具执行失败区分）。"""
+    if isinstance(exc, asyncio.CancelledError):
+        # 调用方取消（如客户端断开）不影响会话本身
+        return False
+    if isinstance(exc, McpError):
+        return exc.error.code in (CONNECTION_CLOSED, _SESSION_TERMINATED)
+    return True
+
+
+class MCPSessionPool:
+    """
+    单个 MCP Server 的会话池。
+    会话按需建立，数量不超过 size；会话失效时自动重建。
+    """
+
+    def __init__(
+        self,
+        client: MultiServerMCPClient,
+        server_name: str,
+        size: int = 2,
+        connect_timeout: float = 30.0,
+        ping_timeout: float = 10.0,
+    ):
+        """
+        初始化会话池（不立即建立连接）。
+
+        Args:
+            client: 持有各 Server 连接配置的 MultiServerMCPClient
+            server_name: Server 名称（server_config 中的键）
+            size: 最大会话数，即该 Server 可同时处理的工具调用数
+            connect_timeout: 建立会话（启动进程 + 握手）的超时时间（秒）
+            ping_timeout: 健康检查 ping 的超时时间（秒）
+        """
+        self.client = client
+        self.server_name = server_name
+        self.size = max(1, size)
+        self.connect_timeout = connect_timeout
+        self.ping_timeout = ping_timeout
+
+        self._idle: Deque[_SessionSlot] = deque()
+        self._slots: set[_SessionSlot] = set()
+        # 会话归还或失效（腾出容量）时唤醒等待中的借用方
+        self._available = asyncio.Condition()
+        # 正在建立中的会话也计入容量，避免并发借用时超出 size
+        self._opening = 0
+        self._closed = False
+
+        # 最近一次握手得到的 Server 名称与版本
+        self.server_info: Implementation | None = None
+
+        self.calls = 0
+        self.sessions_opened = 0
+        self.sessions_failed = 0
+        self.ping_failures = 0
+
+    async def start(self) -> None:
+        """确保至少建立一条会话（Server 已启动并完成握手）。"""
+        await self._checkin(await self._checkout())
+
+    async def _open_slot(self) -> _SessionSlot:
+        """建立一条新会话并计入池中（调用方已预先占用 _opening 名额）。"""
+        try:
+            slot = _SessionSlot(self.client, self.server_name)
+            await slot.open(self.connect_timeout)
+        finally:
+            self._opening -= 1
+            await self._notify()
+        self._slots.add(slot)
+        self.sessions_opened += 1
+        self.server_info = slot.server_info
+        return slot
+
+    async def _discard(self, slot: _SessionSlot) -> None:
+        """关闭并移除会话；池未关闭时计为一次会话失效。"""
+        self._slots.discard(slot)
+        if not self._closed:
+            self.sessions_failed += 1
+        await slot.close()
+        await self._notify()
+
+    async def _notify(self) -> None:
+        """唤醒一个等待中的借用方。"""
+        async with self._available:
+            self._available.notify()
+
+    async def _checkout(self) -> _SessionSlot:
+        """借用一条可用会话：优先空闲会话，其次在容量内新建，否则等待归还。"""
+        while True:
+            async with self._available:
+                while True:
+                    if self._closed:
+                        raise RuntimeError(f"❌ MCP Server {self.server_name} 的会话池已关闭")
+                    if self._idle or len(self._slots) + self._opening < self.size:
+                        break
+                    await self._available.wait()
+                slot = self._idle.pop() if self._idle else None
+                if slot is None:
+                    self._opening += 1
+
+            if slot is None:
+                return await self._open_slot()
+            if slot.alive:
+                return slot
+            # 空闲期间子进程已退出：丢弃后重新借用（必要时新建）
+            logger.warning("MCP Server %s 的会话已失效，正在重建", self.server_name)
+            await self._discard(slot)
+
+    async def _checkin(self, slot: _SessionSlot) -> None:
+        """归还会话；失效或池已关闭时关闭会话，不再放回。"""
+        if self._closed or not slot.alive:
+            await self._discard(slot)
+            return
+        self._idle.append(slot)
+        await self._notify()
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[ClientSession]:
+        """
+        借用一条会话，退出上下文时自动归还。
+        使用过程中出现连接类错误时，该会话被标记为失效，不再复用。
+        """
+        slot = await self._checkout()
+        self.calls += 1
+        try:
+            yield slot.session
+        except BaseException as exc:
+            if _is_connection_error(exc):
+                slot.broken = True
+            raise
+        finally:
+            await self._checkin(slot)
+
+    async def health_check(self) -> None:
+        """
+        ping 当前所有空闲会话，关闭无响应或已退出的会话；
+        若池中因此没有任何会话，则立即重建一条（自动重启崩溃的 Server）。
+        """
+        idle = list(self._idle)
+        self._idle.clear()
+
+        for slot in idle:
+            healthy = slot.alive
+            if healthy:
+                try:
+                    await asyncio.wait_for(slot.session.send_ping(), self.ping_timeout)
+                except Exception as exc:
+                    healthy = False
+                    logger.warning("MCP Server %s 健康检查失败: %r", self.server_name, exc)
+
+            if healthy:
+                self._idle.append(slot)
+                await self._notify()
+                continue
+            self.ping_failures += 1
+            await self._discard(slot)
+
+        if self._closed or self._slots or self._opening:
+            return
+        self._opening += 1
+        try:
+            self._idle.append(await self._open_slot())
+            await self._notify()
+            logger.info("MCP Server %s 已重新启动", self.server_name)
+        except Exception as exc:
+            logger.error("❌ MCP Server %s 重启失败: %s", self.server_name, exc)
+
+    async def aclose(self) -> None:
+        """关闭全部会话（包括借出中的会话）及其子进程。"""
+        self._closed = True
+        slots = list(self._slots)
+        self._slots.clear()
+        self._idle.clear()
+        async with self._available:
+            self._available.notify_all()
+        await asyncio.gather(*(slot.close() for slot in slots), return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        返回会话池统计信息。
+
+        Returns:
+            包含 server_version / size / open / idle / calls / sessions_opened / sessions_failed / ping_failures 的字典
+        """
+        return {
+            "server_version": self.server_info.version if self.server_info else None,
+            "size": self.size,
+            "open": len(self._slots),
+            "idle": len(self._idle),
+            "calls": self.calls,
+            "sessions_opened": self.sessions_opened,
+            "sessions_failed": self.sessions_failed,
+            "ping_failures": self.ping_failures,
+        }
+
+
+class PooledSession:
+    """
+    面向 LangChain 工具的会话代理：每次 list_tools / call_tool 都从池中借用一条会话。
+    可作为 session 参数传给 load_mcp_tools。
+    """
+
+    def __init__(self, pool: MCPSessionPool):
+        self.pool = pool
+        # Server 当前提供的工具名称；None 表示尚未拉取（不做检查）
+        self.tool_names: set[str] | None = None
+
+    async def _request(self, method: str, *args: Any, **kwargs: Any):
+        for attempt in range(2):
+            try:
+                async with self.pool.acquire() as session:
+                    return await getattr(session, method)(*args, **kwargs)
+            except Exception as exc:
+                # 仅在请求未被执行时重试，避免重复执行有副作用的工具
+                if attempt or not _is_unsent_error(exc):
+                    raise
+                logger.info("MCP Server %s 连接已断开，使用新会话重试", self.pool.server_name)
+
+    async def list_tools(self, *args: Any, **kwargs: Any):
+        return await self._request("list_tools", *args, **kwargs)
+
+    async def call_tool(self, name: str, *args: Any, **kwargs: Any):
+        if self.tool_names is not None and name not in self.tool_names:
+            return CallToolResult(
+                content=[
+                    TextContent(
+                        type="text",
+                        text=f"❌ MCP Server {self.pool.server_name} 已不再提供工具 {name}，"
+                        "请改用其他工具",
+                    )
+                ],
+                isError=True,
+            )
+        return await self._request("call_tool", name, *args, **kwargs)
+
+    async def list_all_tools(self) -> List[Tool]:
+        """分页拉取 Server 的全部工具定义。"""
+        tools: List[Tool] = []
+        cursor: str | None = None
+        while True:
+            page = await self.list_tools(cursor=cursor)
+            tools.extend(page.tools)
+            if not page.nextCursor:
+                return tools
+            cursor = page.nextCursor
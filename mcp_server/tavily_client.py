@@ -0,0 +1,203 @@
+"""
+SharedTavilyClient：进程内共享的 Tavily 异步客户端（供 Tavily MCP Server 使用）。
+
+模块职责：
+- 整个进程只创建一个 AsyncTavilyClient，底层 httpx 连接池开启 keep-alive，连接在请求间复用
+- 以信号量限制同时进行中的上游请求数，以令牌桶限制每秒请求数
+- Tavily 返回 429（UsageLimitExceededError）时按指数退避重试
+
+设计说明：
+- 使用原生异步客户端，不再为每次搜索占用线程池中的线程
+- httpx.AsyncClient 与创建它的事件循环绑定，因此在首次请求时懒加载
+- API Key 只在创建客户端时读取一次；未配置时直接报错（不使用 Tavily 的免密钥模式）
+- 自建 httpx 客户端时 Tavily SDK 不再处理代理，因此按 SDK 的方式读取
+  TAVILY_HTTP_PROXY / TAVILY_HTTPS_PROXY 并挂载代理传输层（代理连接同样受连接池大小限制）
+- 并发与速率限制作用于所有上游请求：单条搜索与批量搜索共享同一组限额
+"""
+
+# ===== 标准库 =====
+from typing import Any, Dict, List
+import asyncio
+import logging
+import os
+import random
+
+# ===== 第三方库 =====
+import httpx
+from tavily import AsyncTavilyClient
+from tavily.errors import UsageLimitExceededError
+
+# ===== 本地模块 =====
+from utils.rate_limit import RateLimiter
+
+
+logger = logging.getLogger(__name__)
+
+# Tavily API 地址
+TAVILY_API_BASE_URL = "https://api.tavily.com"
+
+
+def _proxy_mounts(limits: httpx.Limits) -> Dict[str, httpx.AsyncHTTPTransport] | None:
+    """按 TAVILY_HTTP_PROXY / TAVILY_HTTPS_PROXY 构建代理传输层（与 Tavily SDK 的行为一致）。"""
+    proxies = {
+        "http://": os.getenv("TAVILY_HTTP_PROXY"),
+        "https://": os.getenv("TAVILY_HTTPS_PROXY"),
+    }
+    mounts = {
+        scheme: httpx.AsyncHTTPTransport(proxy=proxy, limits=limits)
+        for scheme, proxy in proxies.items()
+        if proxy
+    }
+    return mounts or None
+
+
+class SharedTavilyClient:
+    """
+    带并发限制、速率限制与 429 退避重试的 Tavily 客户端。
+    需在同一个事件循环中使用。
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        requests_per_second: float = 5.0,
+        max_retries: int = 3,
+        timeout: float = 30.0,
+    ):
+        """
+        Args:
+            max_concurrency: 同时进行中的上游请求数（同时也是连接池大小）
+            requests_per_second: 每秒最大请求数，<= 0 表示不限速
+            max_retries: 遇到 429 后的最大重试次数
+            timeout: 单次请求超时时间（秒）
+        """
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max(0, max_retries)
+        self.timeout = timeout
+        self.rate_limiter = RateLimiter(requests_per_second, burst=self.max_concurrency)
+
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._client: AsyncTavilyClient | None = None
+        self._http_client: httpx.AsyncClient | None = None
+
+        self.in_flight = 0
+        self.requests = 0
+        self.rate_limited = 0
+        self.failures = 0
+
+    def _get_client(self) -> AsyncTavilyClient:
+        """懒加载共享客户端（首次调用时读取 API Key）。"""
+        if self._client is None:
+            api_key = os.getenv("TAVILY_API_KEY", "")
+            if not api_key:
+                raise RuntimeError("未配置 TAVILY_API_KEY 环境变量")
+
+            limits = httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=self.max_concurrency,
+            )
+            self._http_client = httpx.AsyncClient(
+                base_url=TAVILY_API_BASE_URL,
+                timeout=self.timeout,
+                limits=limits,
+                mounts=_proxy_mounts(limits),
+            )
+            self._client = AsyncTavilyClient(api_key=api_key, client=self._http_client)
+        return self._client
+
+    def _retry_delay(self, attempt: int, exc: Exception) -> float:
+        """计算第 attempt 次重试前的退避时间，超过重试次数时重新抛出异常。"""
+        if attempt >= self.max_retries:
+            raise exc
+        delay = min(30.0, 2**attempt) + random.uniform(0, 0.5)
+        logger.warning(
+            "Tavily 请求被限流（第 %d 次重试，%.1fs 后进行）: %s",
+            attempt + 1,
+            delay,
+            exc,
+        )
+        return delay
+
+    async def search(self, query: str, max_results: int = 5) -> List[dict]:
+        """
+        执行一次网络搜索。
+
+        Args:
+            query: 搜索关键词或问题
+            max_results: 最大返回结果数量
+
+        Returns:
+            Tavily 搜索结果列表
+        """
+        client = self._get_client()
+        attempt = 0
+        while True:
+            await self.rate_limiter.aacquire()
+            async with self._semaphore:
+                self.requests += 1
+                self.in_flight += 1
+                try:
+                    response = await client.search(
+                        query=query, max_results=max_results, timeout=self.timeout
+                    )
+                    return response.get("results", [])
+                except UsageLimitExceededError as exc:
+                    self.rate_limited += 1
+                    error = exc
+                except Exception:
+                    self.failures += 1
+                    raise
+                finally:
+                    self.in_flight -= 1
+
+            # 退避等待期间释放并发名额
+            try:
+                delay = self._retry_delay(attempt, error)
+            except UsageLimitExceededError:
+                self.failures += 1
+                raise
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def aclose(self) -> None:
+        """关闭底层连接池。"""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+            self._client = None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        返回上游请求统计信息。
+
+        Returns:
+            包含 max_concurrency / in_flight / requests / rate_limited / failures 的字典
+        """
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "rate_limited": self.rate_limited,
+            "failures": self.failures,
+        }
+
+
+def build_tavily_client() -> SharedTavilyClient:
+    """
+    根据环境变量构建共享 Tavily 客户端。
+
+    支持的环境变量：
+    - TAVILY_MAX_CONCURRENCY：同时进行中的上游请求数，默认 4
+    - TAVILY_REQUESTS_PER_SECOND：每秒最大请求数，默认 5（0 表示不限速）
+    - TAVILY_MAX_RETRIES：遇到 429 后的最大重试次数，默认 3
+    - TAVILY_TIMEOUT：单次请求超时时间（秒），默认 30
+
+    Returns:
+        SharedTavilyClient 实例
+    """
+    return SharedTavilyClient(
+        max_concurrency=int(os.getenv("TAVILY_MAX_CONCURRENCY") or 4),
+        requests_per_second=float(os.getenv("TAVILY_REQUESTS_PER_SECOND") or 5),
+        max_retries=int(os.getenv("TAVILY_MAX_RETRIES") or 3),
+        timeout=float(os.getenv("TAVILY_TIMEOUT") or 30),
+    )
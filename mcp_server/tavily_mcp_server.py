@@ -5,27 +5,44 @@ MCP 搜索服务器（Tavily Web Search）。
 - 通过 Model Context Protocol (MCP) 对外暴露 Web 搜索能力
 - 基于 Tavily Search API 执行实时网络搜索
 - 将搜索结果以 MCP 规范的 Tool Result 形式返回给客户端
+- 缓存搜索结果并合并相同的并发查询，减少对 Tavily 的重复请求
+- 提供批量搜索工具（search_web_batch）：一次调用并发执行多条查询，减少 Agent 的工具调用轮次
+- 通过 MCP Resource（devmate://search/cache-stats）暴露缓存命中率等统计信息
+- 支持 stdio 与 streamable-HTTP 两种传输方式
 
 设计说明：
-- 采用 stdio 作为传输方式，便于与 Agent 进程进行本地通信
-- 搜索逻辑通过 asyncio.to_thread 执行，避免阻塞事件循环
-- 服务器本身保持无状态，适合被多个 Agent 实例复用
+- stdio（默认）：由 Agent 进程以子进程方式启动，便于本地通信
+- http：以独立服务运行（POST/GET /mcp，SSE 流式响应），一个进程同时服务多个 Agent 的会话，
+  搜索结果缓存、请求合并、Tavily 连接池与限流额度在所有会话间共享；
+  Agent 侧通过 MCPClientManager 的配置选择传输方式（见 mcp_client.search_server_config）
+- 进程内共享一个异步 Tavily 客户端（连接复用），所有上游请求受同一组并发与速率限制约束，
+  遇到 429 时退避重试
+- 批量搜索中单条查询失败不影响其他查询，失败信息随结果一并返回
+- 除搜索结果缓存外服务器不保存业务状态，适合被多个 Agent 实例复用
+- 缓存统计以 Resource 而非 Tool 的形式提供，不占用 Agent 的工具列表
 """
 
 # ===== 标准库 =====
+from contextlib import asynccontextmanager
+import argparse
 import asyncio
 import json
 import os
 import sys
 
 # ===== 第三方库 =====
-from tavily import TavilyClient
 from mcp.server import Server, NotificationOptions
+from mcp.server.lowlevel.helper_types import ReadResourceContents
 from mcp.server.models import InitializationOptions
+from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
 import mcp.server.stdio
 import mcp.types as types
 from dotenv import load_dotenv
 from pathlib import Path
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+import uvicorn
 
 # 1. 获取当前脚本的绝对路径
 current_file_path = Path(__file__).resolve()
@@ -38,11 +55,34 @@ env_path = project_root / ".env"
 
 # 4. 加载环境变量
 load_dotenv(dotenv_path=env_path)
+
+# 5. 以脚本方式启动时将项目根目录加入模块搜索路径，以便复用项目内的公共模块
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from mcp_server.search_cache import build_search_cache  # noqa: E402
+from mcp_server.tavily_client import build_tavily_client  # noqa: E402
+
 # 打印一下，方便在 Docker 日志里调试（可选）
 print(f"DEBUG: 正在尝试加载 .env 文件，路径: {env_path}")
 print(f"DEBUG: .env 文件是否存在: {env_path.exists()}")
 # ===== 创建 MCP 服务器实例 =====
-server = Server("devmate-mcp-search")
+SERVER_NAME = "devmate-mcp-search"
+SERVER_VERSION = "1.1.0"
+server = Server(SERVER_NAME, version=SERVER_VERSION)
+
+# ===== 搜索结果缓存与 Tavily 客户端（进程内共享） =====
+search_cache = build_search_cache()
+tavily_client = build_tavily_client()
+
+# 缓存统计 Resource 的 URI
+CACHE_STATS_URI = "devmate://search/cache-stats"
+
+# 每次搜索返回的结果数
+SEARCH_MAX_RESULTS = 5
+
+# 单次批量搜索允许的最大查询数
+SEARCH_BATCH_MAX_QUERIES = 10
 
 
 @server.list_tools()
@@ -64,10 +104,65 @@ async def handle_list_tools():
                 },
                 "required": ["query"],
             },
-        )
+        ),
+        types.Tool(
+            name="search_web_batch",
+            description=(
+                "使用 Tavily 搜索引擎并发执行多条网络搜索，一次返回全部结果；"
+                "需要检索多个相互独立的问题时优先使用"
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "queries": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "minItems": 1,
+                        "maxItems": SEARCH_BATCH_MAX_QUERIES,
+                        "description": "需要搜索的关键词或问题列表",
+                    }
+                },
+                "required": ["queries"],
+            },
+        ),
+    ]
+
+
+def _text_result(text: str, is_error: bool = False) -> types.CallToolResult:
+    """构造只包含一段文本的 CallToolResult。"""
+    return types.CallToolResult(
+        isError=is_error,
+        content=[
+            types.TextContent(
+                type="text",
+                text=text,
+            )
+        ],
+    )
+
+
+def _format_results(results: list[dict]) -> list[dict]:
+    """提取搜索结果中 Agent 需要的字段，并截断过长的正文。"""
+    return [
+        {
+            "title": r.get("title", "无标题"),
+            "url": r.get("url", ""),
+            "content": r.get("content", "")[:500],
+        }
+        for r in results
     ]
 
 
+async def _search(query: str) -> list[dict]:
+    """执行一次搜索：命中缓存或有相同查询正在进行时不再请求 Tavily。"""
+    results = await search_cache.get_or_fetch(
+        query,
+        SEARCH_MAX_RESULTS,
+        lambda: search_tavily(query, SEARCH_MAX_RESULTS),
+    )
+    return _format_results(results)
+
+
 @server.call_tool()
 async def handle_call_tool(name: str, arguments: dict):
     """
@@ -81,102 +176,136 @@ async def handle_call_tool(name: str, arguments: dict):
         MCP CallToolResult 对象，包含工具执行结果
     """
 
-    if name != "search_web":
-        return types.CallToolResult(
-            isError=True,
-            content=[
-                types.TextContent(
-                    type="text",
-                    text=f"未知工具: {name}",
-                )
-            ],
-        )
+    if name == "search_web":
+        return await _handle_search_web(arguments)
+    if name == "search_web_batch":
+        return await _handle_search_web_batch(arguments)
+
+    return _text_result(f"未知工具: {name}", is_error=True)
+
 
+async def _handle_search_web(arguments: dict) -> types.CallToolResult:
+    """处理单条搜索。"""
     try:
         query = arguments.get("query", "").strip()
         print(f"[MCP Server] 收到搜索请求: {query}", file=sys.stderr)
 
-        # 使用 to_thread 将同步 IO 操作放入线程池，避免阻塞事件循环
-        results = await asyncio.to_thread(search_tavily, query)
+        results = await _search(query)
+        return _text_result(json.dumps(results, ensure_ascii=False, indent=2))
 
-        formatted_results = [
-            {
-                "title": r.get("title", "无标题"),
-                "url": r.get("url", ""),
-                "content": r.get("content", "")[:500],
-            }
-            for r in results
-        ]
+    except Exception as exc:
+        print(f"[MCP Server] 搜索执行异常: {exc}", file=sys.stderr)
+        return _text_result(f"搜索执行失败: {str(exc)}", is_error=True)
 
-        json_text = json.dumps(
-            formatted_results,
-            ensure_ascii=False,
-            indent=2,
-        )
 
-        return types.CallToolResult(
-            content=[
-                types.TextContent(
-                    type="text",
-                    text=json_text,
-                )
-            ]
+async def _handle_search_web_batch(arguments: dict) -> types.CallToolResult:
+    """
+    处理批量搜索：各查询并发执行（受共享客户端的并发与速率限制约束），
+    结果按查询顺序合并为一个 CallToolResult。
+    """
+    queries = [
+        query.strip()
+        for query in arguments.get("queries") or []
+        if isinstance(query, str) and query.strip()
+    ]
+    if not queries:
+        return _text_result("批量搜索失败: queries 不能为空", is_error=True)
+    if len(queries) > SEARCH_BATCH_MAX_QUERIES:
+        return _text_result(
+            f"批量搜索失败: 单次最多 {SEARCH_BATCH_MAX_QUERIES} 条查询，收到 {len(queries)} 条",
+            is_error=True,
         )
 
-    except Exception as exc:
-        print(f"[MCP Server] 搜索执行异常: {exc}", file=sys.stderr)
+    print(f"[MCP Server] 收到批量搜索请求: {queries}", file=sys.stderr)
+    outcomes = await asyncio.gather(
+        *(_search(query) for query in queries), return_exceptions=True
+    )
+
+    batch = []
+    for query, outcome in zip(queries, outcomes):
+        if isinstance(outcome, Exception):
+            print(f"[MCP Server] 搜索执行异常（{query}）: {outcome}", file=sys.stderr)
+            batch.append({"query": query, "error": f"搜索执行失败: {outcome}"})
+        else:
+            batch.append({"query": query, "results": outcome})
+
+    return _text_result(
+        json.dumps(batch, ensure_ascii=False, indent=2),
+        is_error=all("error" in item for item in batch),
+    )
+
+
+@server.list_resources()
+async def handle_list_resources():
+    """
+    返回当前 MCP Server 提供的资源列表。
 
-        return types.CallToolResult(
-            isError=True,
-            content=[
-                types.TextContent(
-                    type="text",
-                    text=f"搜索执行失败: {str(exc)}",
-                )
-            ],
+    Returns:
+        一个 MCP Resource 列表（目前仅有搜索缓存统计）。
+    """
+    return [
+        types.Resource(
+            uri=CACHE_STATS_URI,
+            name="search_cache_stats",
+            description=(
+                "搜索结果缓存统计：内存 / SQLite 命中、上游请求数、合并请求数与命中率，"
+                "以及 Tavily 客户端的并发与限流情况"
+            ),
+            mimeType="application/json",
         )
+    ]
 
 
-def search_tavily(query: str, max_results: int = 5) -> list[dict]:
+@server.read_resource()
+async def handle_read_resource(uri):
     """
-    调用 Tavily Search API 执行网络搜索。
+    读取 MCP Resource。
 
     Args:
-        query: 搜索关键词或问题
-        max_results: 最大返回结果数量
+        uri: 资源 URI
 
     Returns:
-        Tavily 搜索结果列表
+        资源内容列表
     """
+    if str(uri) != CACHE_STATS_URI:
+        raise ValueError(f"未知资源: {uri}")
 
-    api_key = os.getenv("TAVILY_API_KEY", "")
-    if not api_key:
-        raise RuntimeError("未配置 TAVILY_API_KEY 环境变量")
-
-    client = TavilyClient(api_key=api_key)
+    return [
+        ReadResourceContents(
+            content=json.dumps(
+                {**search_cache.stats(), "upstream": tavily_client.stats()},
+                ensure_ascii=False,
+                indent=2,
+            ),
+            mime_type="application/json",
+        )
+    ]
 
-    response = client.search(
-        query=query,
-        max_results=max_results,
-    )
 
-    return response.get("results", [])
+async def search_tavily(query: str, max_results: int = SEARCH_MAX_RESULTS) -> list[dict]:
+    """
+    调用 Tavily Search API 执行网络搜索（经由进程内共享的客户端）。
 
+    Args:
+        query: 搜索关键词或问题
+        max_results: 最大返回结果数量
 
-async def main():
+    Returns:
+        Tavily 搜索结果列表
     """
-    MCP Server 主入口。
 
-    通过 stdio 建立通信通道，并启动 MCP Server 事件循环。
-    """
+    return await tavily_client.search(query, max_results)
+
 
+async def run_stdio() -> None:
+    """通过 stdio 建立通信通道，服务单个客户端。"""
     async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
         await server.run(
             read_stream,
             write_stream,
             InitializationOptions(
-                server_name="devmate-mcp-search",
-                server_version="1.0.0",
+                server_name=SERVER_NAME,
+                server_version=SERVER_VERSION,
                 capabilities=server.get_capabilities(
                     notification_options=NotificationOptions(),
                     experimental_capabilities={},
@@ -185,15 +314,110 @@ async def main():
         )
 
 
+class _MCPEndpoint:
+    """将 StreamableHTTPSessionManager 适配为 Starlette 路由端点（ASGI 应用）。"""
+
+    def __init__(self, session_manager: StreamableHTTPSessionManager):
+        self.session_manager = session_manager
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.session_manager.handle_request(scope, receive, send)
+
+
+def build_http_app() -> Starlette:
+    """
+    构建 streamable-HTTP 模式的 ASGI 应用。
+
+    路由：
+    - /mcp：MCP 端点，每个客户端会话由 Mcp-Session-Id 区分
+    - /health：健康检查，返回缓存与上游请求统计
+    """
+    session_manager = StreamableHTTPSessionManager(app=server)
+
+    async def health(request):
+        return JSONResponse(
+            {
+                "status": "ok",
+                "version": SERVER_VERSION,
+                "cache": search_cache.stats(),
+                "upstream": tavily_client.stats(),
+            }
+        )
+
+    @asynccontextmanager
+    async def lifespan(app: Starlette):
+        async with session_manager.run():
+            yield
+
+    return Starlette(
+        routes=[
+            Route("/mcp", endpoint=_MCPEndpoint(session_manager)),
+            Route("/health", endpoint=health, methods=["GET"]),
+        ],
+        lifespan=lifespan,
+    )
+
+
+async def run_http(host: str, port: int) -> None:
+    """以 streamable-HTTP 方式运行，同一进程服务多个客户端会话。"""
+    print(f"[MCP Server] streamable-HTTP 服务已启动: http://{host}:{port}/mcp", file=sys.stderr)
+    config = uvicorn.Config(build_http_app(), host=host, port=port, log_level="warning")
+    await uvicorn.Server(config).serve()
+
+
+async def main(transport: str = "stdio", host: str = "127.0.0.1", port: int = 8765):
+    """
+    MCP Server 主入口。
+
+    Args:
+        transport: 传输方式，stdio 或 http
+        host: http 模式的监听地址
+        port: http 模式的监听端口
+    """
+
+    try:
+        if transport == "http":
+            await run_http(host, port)
+        else:
+            await run_stdio()
+    finally:
+        await tavily_client.aclose()
+
+
 if __name__ == "__main__":
     """
     程序入口点。
 
     支持通过 Ctrl+C 优雅中断服务器进程。
+
+    使用方式（在项目根目录执行）：
+        python mcp_server/tavily_mcp_server.py                      # stdio（由 Agent 启动）
+        python mcp_server/tavily_mcp_server.py --transport http     # 共享的 HTTP 服务
     """
 
+    parser = argparse.ArgumentParser(description="DevMate MCP 搜索服务器（Tavily）")
+    parser.add_argument(
+        "--transport",
+        choices=["stdio", "http"],
+        default="stdio",
+        # 不从环境变量读取：Agent 以子进程方式启动本脚本时必须使用 stdio
+        help="传输方式，默认 stdio",
+    )
+    parser.add_argument(
+        "--host",
+        default=os.getenv("TAVILY_MCP_HOST") or "127.0.0.1",
+        help="http 模式的监听地址（默认读取 TAVILY_MCP_HOST，缺省为 127.0.0.1）",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=int(os.getenv("TAVILY_MCP_PORT") or 8765),
+        help="http 模式的监听端口（默认读取 TAVILY_MCP_PORT，缺省为 8765）",
+    )
+    args = parser.parse_args()
+
     try:
-        asyncio.run(main())
+        asyncio.run(main(args.transport, args.host, args.port))
     except KeyboardInterrupt:
         print("[MCP Server] 服务器已被手动中断", file=sys.stderr)
     except Exception as exc:
@@ -0,0 +1,158 @@
+"""
+ToolSchemaCache：MCP 工具定义的本地缓存。
+
+模块职责：
+- 将每个 MCP Server 上一次成功启动时拉取的工具定义（名称、描述、参数 Schema）持久化到磁盘
+- 下次启动时直接用缓存的工具定义构建 Agent，Server 在后台连接，无需等待进程启动与握手
+- Server 的启动命令或版本发生变化时使缓存失效
+
+设计说明：
+- 以 Server 名称为键，记录连接配置指纹（启动命令、参数、环境变量等的 SHA-256）、
+  Server 版本与工具定义列表；环境变量只参与指纹计算，不以明文写入缓存文件
+- 启动时只能校验连接配置指纹（版本需要握手后才能得知）：指纹不一致视为未命中，同步连接该 Server；
+  后台连接完成后再比对版本与工具定义，有变化时覆盖缓存（已构建的工具由 MCPClientManager 就地刷新）
+- 缓存文件先写临时文件再原子替换，进程中途退出不会留下损坏的缓存
+"""
+
+# ===== 标准库 =====
+from pathlib import Path
+from typing import Any, Dict, List
+import hashlib
+import json
+import logging
+import os
+import time
+
+# ===== 第三方库 =====
+from mcp.types import Implementation, Tool
+
+# ===== 本地模块 =====
+from utils.load_prompt import find_project_root
+
+
+logger = logging.getLogger(__name__)
+
+# 工具定义缓存默认位置（相对项目根目录）
+DEFAULT_TOOL_CACHE_PATH = Path(".devmate") / "mcp_tools.json"
+
+
+def connection_fingerprint(connection: Dict[str, Any]) -> str:
+    """计算连接配置指纹（启动命令、参数或地址变化时随之变化）。"""
+    payload = json.dumps(connection, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ToolSchemaCache:
+    """基于 JSON 文件的 MCP 工具定义缓存。"""
+
+    def __init__(self, path: Path = DEFAULT_TOOL_CACHE_PATH):
+        """
+        加载缓存文件（不存在或损坏时视为空缓存）。
+
+        Args:
+            path: 缓存文件路径
+        """
+        self.path = Path(path)
+        self._servers: Dict[str, Dict[str, Any]] = {}
+        try:
+            self._servers = json.loads(self.path.read_text(encoding="utf-8"))["servers"]
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, TypeError) as exc:
+            logger.warning("MCP 工具定义缓存已损坏，将重新生成: %s", exc)
+
+    def get(self, server_name: str, connection: Dict[str, Any]) -> List[Tool] | None:
+        """
+        读取某个 Server 的缓存工具定义。
+
+        Args:
+            server_name: Server 名称
+            connection: 当前的连接配置
+
+        Returns:
+            工具定义列表；无缓存或连接配置已变化时返回 None
+        """
+        entry = self._servers.get(server_name)
+        if entry is None:
+            return None
+        if entry.get("fingerprint") != connection_fingerprint(connection):
+            logger.info("MCP Server %s 的启动配置已变化，工具定义缓存失效", server_name)
+            return None
+        try:
+            return [Tool.model_validate(tool) for tool in entry["tools"]]
+        except (ValueError, KeyError, TypeError) as exc:
+            logger.warning("MCP Server %s 的工具定义缓存无法解析: %s", server_name, exc)
+            return None
+
+    def put(
+        self,
+        server_name: str,
+        connection: Dict[str, Any],
+        server_info: Implementation | None,
+        tools: List[Tool],
+    ) -> bool:
+        """
+        记录某个 Server 的最新工具定义，与缓存一致时不写盘。
+
+        Args:
+            server_name: Server 名称
+            connection: 连接配置
+            server_info: 握手得到的 Server 名称与版本
+            tools: 工具定义列表
+
+        Returns:
+            是否覆盖了已过期的缓存（首次写入返回 False）
+        """
+        entry = {
+            "fingerprint": connection_fingerprint(connection),
+            "server_version": server_info.version if server_info else None,
+            "tools": [
+                tool.model_dump(mode="json", by_alias=True, exclude_none=True) for tool in tools
+            ],
+        }
+        previous = self._servers.get(server_name)
+        if previous is not None:
+            if all(previous.get(key) == value for key, value in entry.items()):
+                return False
+            if previous.get("server_version") != entry["server_version"]:
+                logger.info(
+                    "MCP Server %s 版本由 %s 变为 %s，工具定义缓存已更新",
+                    server_name,
+                    previous.get("server_version"),
+                    entry["server_version"],
+                )
+
+        entry["updated_at"] = time.time()
+        self._servers[server_name] = entry
+        self._save()
+        return previous is not None
+
+    def _save(self) -> None:
+        """原子写入缓存文件。"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp_path.write_text(
+            json.dumps({"servers": self._servers}, ensure_ascii=False, indent=2),
+            encoding="utf-8",
+        )
+        os.replace(tmp_path, self.path)
+
+
+def build_tool_schema_cache() -> ToolSchemaCache | None:
+    """
+    根据环境变量构建工具定义缓存。
+
+    支持的环境变量：
+    - MCP_TOOL_CACHE：是否启用，默认 1（0 表示每次启动都等待全部 Server 连接完成）
+    - MCP_TOOL_CACHE_PATH：缓存文件路径，默认为项目根目录下的 .devmate/mcp_tools.json
+
+    Returns:
+        ToolSchemaCache；未启用时返回 None
+    """
+    if (os.getenv("MCP_TOOL_CACHE") or "1") != "1":
+        return None
+
+    path = Path(os.getenv("MCP_TOOL_CACHE_PATH") or DEFAULT_TOOL_CACHE_PATH)
+    if not path.is_absolute():
+        path = Path(find_project_root()) / path
+    return ToolSchemaCache(path)
@@ -0,0 +1,137 @@
+"""
+AdmissionController：多会话 Agent 服务的并发控制与准入控制。
+
+模块职责：
+- 限制同时执行的 Agent 对话轮次数，保护模型服务与本地资源
+- 超出并发上限的请求进入有界等待队列；队列已满或等待超时时拒绝（HTTP 429）
+- 保证同一会话同一时刻只有一轮对话在执行，避免并发写入同一条对话记忆
+
+设计说明：
+- 基于 asyncio.Semaphore 实现，仅在事件循环线程中使用，无需额外加锁
+- 准入在返回流式响应之前完成，被拒绝的请求能拿到明确的状态码，而不是一个中途断开的流
+- 许可（AdmissionTicket）的释放是幂等的：流正常结束、客户端中途断开或响应未开始即被取消，
+  都会且只会释放一次
+"""
+
+# ===== 标准库 =====
+from typing import Dict
+import asyncio
+
+
+class AdmissionRejected(Exception):
+    """请求未被准入（队列已满、等待超时或会话忙）。"""
+
+    def __init__(self, reason: str, status_code: int = 429, retry_after: int = 1):
+        """
+        Args:
+            reason: 拒绝原因（返回给客户端）
+            status_code: 建议的 HTTP 状态码
+            retry_after: 建议客户端重试的等待秒数
+        """
+        super().__init__(reason)
+        self.reason = reason
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class AdmissionTicket:
+    """一次对话轮次的执行许可，结束时必须调用 release()。"""
+
+    def __init__(self, controller: "AdmissionController", session_id: str):
+        self._controller = controller
+        self.session_id = session_id
+        self._released = False
+
+    def release(self) -> None:
+        """释放许可（可重复调用）。"""
+        if self._released:
+            return
+        self._released = True
+        self._controller._release(self)
+
+
+class AdmissionController:
+    """
+    对话轮次的并发与准入控制器。
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float):
+        """
+        Args:
+            max_concurrency: 同时执行的对话轮次上限
+            max_queue: 等待执行的请求数上限，超出时立即拒绝
+            queue_timeout: 请求在队列中的最长等待时间（秒）
+        """
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._active_sessions: set = set()
+        self.running = 0
+        self.queued = 0
+
+        self.admitted = 0
+        self.rejected = 0
+
+    async def acquire(self, session_id: str) -> AdmissionTicket:
+        """
+        为指定会话申请一次执行许可。
+
+        Args:
+            session_id: 会话 ID
+
+        Returns:
+            AdmissionTicket
+
+        Raises:
+            AdmissionRejected: 会话已有进行中的轮次（409）、队列已满或等待超时（429）
+        """
+        if session_id in self._active_sessions:
+            self.rejected += 1
+            raise AdmissionRejected("该会话已有进行中的对话，请等待其完成", status_code=409)
+
+        if self._semaphore.locked() and self.queued >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected("服务繁忙，请稍后重试")
+
+        # 占住会话，防止同一会话的请求在排队期间重复进入
+        self._active_sessions.add(session_id)
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._active_sessions.discard(session_id)
+            self.rejected += 1
+            raise AdmissionRejected("排队超时，服务繁忙，请稍后重试")
+        except BaseException:
+            self._active_sessions.discard(session_id)
+            raise
+        finally:
+            self.queued -= 1
+
+        self.running += 1
+        self.admitted += 1
+        return AdmissionTicket(self, session_id)
+
+    def _release(self, ticket: AdmissionTicket) -> None:
+        """归还许可（由 AdmissionTicket.release 调用）。"""
+        self.running -= 1
+        self._active_sessions.discard(ticket.session_id)
+        self._semaphore.release()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        返回当前负载统计。
+
+        Returns:
+            包含 running / queued / max_concurrency / max_queue / admitted / rejected 的字典
+        """
+        return {
+            "running": self.running,
+            "queued": self.queued,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
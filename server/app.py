@@ -0,0 +1,216 @@
+"""
+DevMate 多会话 HTTP 服务（FastAPI + SSE 流式输出）。
+
+模块职责：
+- 在进程启动时初始化一次 MCP 客户端（长连接会话池）、工具集合、Agent 执行图与知识库检索器，所有会话共享
+- 以 HTTP 接口对外提供对话能力：每个请求携带会话 ID，不同会话的记忆互相隔离
+- 通过 Server-Sent Events 实时推送 Agent 事件（token 增量、工具调用开始 / 结束、最终回复）
+- 限制并发对话轮次，过载时排队或直接返回 429，避免拖垮整个进程
+
+设计说明：
+- 与命令行入口（simple_mcp_angent.py）共用 SimpleAgent，仅替换交互方式
+- Filesystem MCP 使用 MCPClientManager 的默认配置，访问范围限制在 generated_projects 目录，
+  多人共用服务时不会暴露项目源码目录
+- 准入控制在返回流式响应之前完成；客户端中途断开时对话轮次被取消并归还并发名额
+
+使用方式（在项目根目录执行）：
+    python -m server.app
+    uvicorn server.app:app --host 0.0.0.0 --port 8000
+"""
+
+# ===== 标准库 =====
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+import json
+import logging
+import os
+import uuid
+
+# ===== 第三方库 =====
+from dotenv import load_dotenv
+from fastapi import FastAPI, Header, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from starlette.background import BackgroundTask
+
+# ===== 本地模块 =====
+from agent.devMateAgent.events import FinalMessage, ToolCallStart
+from agent.devMateAgent.simple_agent import SimpleAgent
+from knowledge_db.rag.retriever import aclose_shared_retriever
+from log.logging_config import setup_logging
+from mcp_server.mcp_client import MCPClientManager
+from server.admission import AdmissionController, AdmissionRejected
+from utils.load_prompt import find_project_root
+from utils.search_knowledge import search_knowledge_base, search_knowledge_base_batch
+
+
+# ===== 日志与环境变量 =====
+setup_logging()
+logger = logging.getLogger(__name__)
+load_dotenv(os.path.join(find_project_root(), ".env"))
+
+
+class ChatRequest(BaseModel):
+    """对话请求体。"""
+
+    message: str = Field(..., min_length=1, description="用户输入")
+    session_id: str | None = Field(
+        default=None, description="会话 ID；也可通过 X-Session-Id 请求头传入，均缺省时自动生成"
+    )
+
+
+def _sse(event: str, data: dict) -> str:
+    """编码一条 Server-Sent Event。"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _rejected_response(exc: AdmissionRejected) -> JSONResponse:
+    """准入失败时的响应（429 附带 Retry-After）。"""
+    headers = {"Retry-After": str(exc.retry_after)} if exc.status_code == 429 else None
+    return JSONResponse({"detail": exc.reason}, status_code=exc.status_code, headers=headers)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    服务生命周期：启动时初始化共享资源，退出时关闭 Agent 记忆存储、检索连接池与 MCP 客户端。
+    """
+    async with MCPClientManager() as mcp:
+        tools = list(mcp.tools)
+        tools.append(search_knowledge_base)
+        tools.append(search_knowledge_base_batch)
+        logger.info("已加载 %d 个工具: %s", len(tools), [tool.name for tool in tools])
+
+        app.state.mcp = mcp
+        app.state.agent = SimpleAgent(tools)
+        app.state.admission = AdmissionController(
+            max_concurrency=int(os.getenv("SERVER_MAX_CONCURRENCY") or 8),
+            max_queue=int(os.getenv("SERVER_MAX_QUEUE") or 32),
+            queue_timeout=float(os.getenv("SERVER_QUEUE_TIMEOUT") or 30),
+        )
+
+        # 预热知识库检索器，避免第一个请求承担索引加载耗时；索引未构建时不影响服务启动
+        try:
+            from knowledge_db.rag.retriever import aget_shared_retriever
+
+            await aget_shared_retriever(
+                os.getenv("EMBEDDING_MODEL_NAME", ""), os.getenv("EMBEDDING_MODEL_KEY", "")
+            )
+        except Exception as exc:
+            logger.warning("知识库检索器预热失败（首次检索时将重试）: %s", exc)
+
+        logger.info("DevMate 服务已启动")
+        try:
+            yield
+        finally:
+            app.state.agent.close()
+            await aclose_shared_retriever()
+
+
+app = FastAPI(title="DevMate", lifespan=lifespan)
+
+
+async def _admit(request: Request, body: ChatRequest, header_session: str | None):
+    """解析会话 ID 并申请执行许可。"""
+    session_id = body.session_id or header_session or uuid.uuid4().hex
+    ticket = await request.app.state.admission.acquire(session_id)
+    return session_id, ticket
+
+
+@app.post("/chat/stream")
+async def chat_stream(
+    request: Request,
+    body: ChatRequest,
+    x_session_id: str | None = Header(default=None),
+):
+    """
+    流式对话接口（SSE）。
+
+    事件类型：
+    - token：模型输出的文本增量，data 为 {"text": ...}
+    - tool_start：工具调用开始，data 为 {"call_id", "name", "args"}
+    - tool_end：工具调用结束，data 为 {"call_id", "name", "output", "is_error"}
+    - final：最终回复，data 为 {"content": ...}
+    - done：本轮对话结束，data 为 {"session_id": ...}
+    - error：执行过程中出现异常，data 为 {"detail": ...}
+    """
+    try:
+        session_id, ticket = await _admit(request, body, x_session_id)
+    except AdmissionRejected as exc:
+        return _rejected_response(exc)
+
+    agent: SimpleAgent = request.app.state.agent
+
+    async def events() -> AsyncIterator[str]:
+        try:
+            async for event in agent.astream_events(body.message, session_id):
+                yield _sse(event.type, event.to_dict())
+            yield _sse("done", {"session_id": session_id})
+        except Exception as exc:
+            logger.exception("会话 %s 对话过程中发生异常", session_id)
+            yield _sse("error", {"detail": str(exc)})
+        finally:
+            ticket.release()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"X-Session-Id": session_id, "Cache-Control": "no-cache"},
+        # 客户端在响应开始前断开时生成器不会执行，由后台任务兜底归还名额
+        background=BackgroundTask(ticket.release),
+    )
+
+
+@app.post("/chat")
+async def chat(
+    request: Request,
+    body: ChatRequest,
+    x_session_id: str | None = Header(default=None),
+):
+    """非流式对话接口：等待本轮对话结束后一次性返回完整回复。"""
+    try:
+        session_id, ticket = await _admit(request, body, x_session_id)
+    except AdmissionRejected as exc:
+        return _rejected_response(exc)
+
+    agent: SimpleAgent = request.app.state.agent
+    reply = ""
+    tool_calls = []
+    try:
+        async for event in agent.astream_events(body.message, session_id):
+            if isinstance(event, FinalMessage):
+                reply = event.content
+            elif isinstance(event, ToolCallStart):
+                tool_calls.append(event.name)
+    finally:
+        ticket.release()
+
+    return JSONResponse(
+        {"session_id": session_id, "reply": reply, "tool_calls": tool_calls},
+        headers={"X-Session-Id": session_id},
+    )
+
+
+@app.get("/health")
+async def health(request: Request):
+    """健康检查与负载统计。"""
+    stats = {"status": "ok", "admission": request.app.state.admission.stats()}
+    stats["mcp"] = request.app.state.mcp.stats()
+    memory = request.app.state.agent.memory
+    if hasattr(memory, "stats"):
+        stats["checkpointer"] = memory.stats()
+    if request.app.state.agent.context_budget is not None:
+        stats["context"] = request.app.state.agent.context_budget.stats()
+    if request.app.state.agent.response_cache is not None:
+        stats["llm_cache"] = request.app.state.agent.response_cache.stats()
+    return stats
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(
+        app,
+        host=os.getenv("SERVER_HOST") or "0.0.0.0",
+        port=int(os.getenv("SERVER_PORT") or 8000),
+    )
@@ -23,9 +23,10 @@ import logging
 from dotenv import load_dotenv
 
 # ===== 本地模块 =====
-from mcp_server.mcp_client import MCPClientManager
+from mcp_server.mcp_client import MCPClientManager, search_server_config
 from agent.devMateAgent.simple_agent import SimpleAgent
-from utils.search_knowledge import search_knowledge_base
+from knowledge_db.rag.retriever import aclose_shared_retriever
+from utils.search_knowledge import search_knowledge_base, search_knowledge_base_batch
 from log.logging_config import setup_logging
 
 
@@ -59,11 +60,7 @@ async def run_my_agent() -> None:
     )
 
     mcp_config = {
-        "mcp_server": {
-            "transport": "stdio",
-            "command": "python",
-            "args": ["mcp_server/tavily_mcp_server.py"],
-        },
+        "mcp_server": search_server_config(),
         "filesystem": {
             "transport": "stdio",
             "command": "mcp-server-filesystem",
@@ -76,8 +73,9 @@ async def run_my_agent() -> None:
         tools = mcp.tools
 
         # ===== 追加本地工具（RAG 检索） =====
-        logger.info("正在加载本地工具: search_knowledge_base")
+        logger.info("正在加载本地工具: search_knowledge_base, search_knowledge_base_batch")
         tools.append(search_knowledge_base)
+        tools.append(search_knowledge_base_batch)
         logger.info("本地工具加载完成")
 
         # 打印并确认已加载的 MCP 工具
@@ -91,30 +89,39 @@ async def run_my_agent() -> None:
         print("👉 输入内容开始对话（输入 exit / quit 退出）\n")
 
         # ===== 4. 多轮对话循环 =====
-        while True:
-            try:
-                user_input = await asyncio.to_thread(
-                    input,
-                    "👤 你：",
-                )
-
-                if user_input.strip().lower() in {"exit", "quit"}:
-                    print("👋 已退出对话")
+        # 无论正常退出、Ctrl+C 取消还是异常退出，都在 finally 中写入会话记录并释放资源
+        try:
+            while True:
+                try:
+                    user_input = await asyncio.to_thread(
+                        input,
+                        "👤 你：",
+                    )
+
+                    if user_input.strip().lower() in {"exit", "quit"}:
+                        print("👋 已退出对话")
+                        break
+
+                    if not user_input.strip():
+                        continue
+
+                    # ===== 5. 调用 Agent（流式输出） =====
+                    await devmate_agent.stream(user_input)
+
+                except (KeyboardInterrupt, EOFError):
+                    print("\n👋 用户中断，对话结束")
                     break
 
-                if not user_input.strip():
-                    continue
+                except Exception as exc:
+                    logger.exception("对话过程中发生异常")
+                    print(f"⚠️ 出现错误：{exc}")
 
-                # ===== 5. 调用 Agent（流式输出） =====
-                await devmate_agent.stream(user_input)
-
-            except KeyboardInterrupt:
-                print("\n👋 用户中断，对话结束")
-                break
-
-            except Exception as exc:
-                logger.exception("对话过程中发生异常")
-                print(f"⚠️ 出现错误：{exc}")
+        finally:
+            # ===== 6. 退出前将尚未提交的会话记录写入磁盘，并关闭检索连接池 =====
+            try:
+                devmate_agent.close()
+            finally:
+                await aclose_shared_retriever()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,77 @@
+"""
+RateLimiter：令牌桶速率限制器（公共组件）。
+
+模块职责：
+- 限制每秒向外部服务发起的请求数，允许有限的瞬时突发
+- 同时提供阻塞（线程）与异步（事件循环）两种等待方式
+
+设计说明：
+- 令牌按时间连续补充，桶容量即允许的突发请求数
+- 内部使用线程锁，同一实例可同时被线程池与事件循环使用
+"""
+
+# ===== 标准库 =====
+import asyncio
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    令牌桶速率限制器（线程安全）。
+
+    用于限制每秒向外部服务（Embedding 服务商、Tavily 等）发起的请求数。
+    """
+
+    def __init__(self, rate_per_second: float, burst: int = 1):
+        """
+        Args:
+            rate_per_second: 每秒允许的请求数，<= 0 表示不限速
+            burst: 令牌桶容量，即允许的瞬时突发请求数
+        """
+        self.rate = rate_per_second
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _try_acquire(self) -> float:
+        """
+        尝试获取一个令牌。
+
+        Returns:
+            成功时返回 0，否则返回距离下一个令牌可用的等待秒数
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity,
+                self._tokens + (now - self._updated_at) * self.rate,
+            )
+            self._updated_at = now
+
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self) -> None:
+        """
+        获取一个令牌，令牌不足时阻塞等待。
+        """
+        if self.rate <= 0:
+            return
+
+        while (wait_seconds := self._try_acquire()) > 0:
+            time.sleep(wait_seconds)
+
+    async def aacquire(self) -> None:
+        """
+        获取一个令牌，令牌不足时异步等待（不阻塞事件循环）。
+        """
+        if self.rate <= 0:
+            return
+
+        while (wait_seconds := self._try_acquire()) > 0:
+            await asyncio.sleep(wait_seconds)
@@ -1,21 +1,102 @@
 import os
-from langchain_core.tools import tool
-from knowledge_db.rag.retriever import LocalRAGRetriever
+from functools import lru_cache
+from typing import List
 
+from langchain_core.tools import StructuredTool
+from knowledge_db.rag.packing import ContextPacker, build_context_packer
+from knowledge_db.rag.retriever import aget_shared_retriever, get_shared_retriever
 
-# 2. 定义 Tool
-@tool
-def search_knowledge_base(query: str) -> str:
+
+def _embedding_config() -> tuple:
+    # 从环境变量中读取 Embedding 配置（避免明文写入代码）
+    EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "")
+    EMBEDDING_MODEL_KEY = os.getenv("EMBEDDING_MODEL_KEY", "")
+    return EMBEDDING_MODEL_NAME, EMBEDDING_MODEL_KEY
+
+
+@lru_cache(maxsize=1)
+def _context_packer() -> ContextPacker | None:
+    # 首次调用时再读取环境变量（.env 在入口脚本中晚于本模块导入加载）
+    return build_context_packer()
+
+
+def _pack(results):
+    # 合并相邻 chunk、去除重叠与重复，并按 token 预算压缩为带来源引用的文本
+    packer = _context_packer()
+    return packer.pack(results) if packer else results
+
+
+def _pack_batch(queries: List[str], results):
+    packer = _context_packer()
+    if packer is None:
+        return {query: result for query, result in zip(queries, results)}
+    return packer.pack_batch(queries, results)
+
+
+def _search_knowledge_base(query: str, category: str | None = None) -> str:
     """
     当用户询问关于 DevMate 的功能、定义、技术细节或本地私有知识库中的信息时，使用此工具。
     输入应该是具体的查询问题。
+    若明确知道要查询哪一类规范，可通过 category 指定类别（知识库文档名，不含扩展名），
+    否则留空，由检索器自动判断。
     """
-    # 从环境变量中读取 Embedding 配置（避免明文写入代码）
-    EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "")
-    EMBEDDING_MODEL_KEY = os.getenv("EMBEDDING_MODEL_KEY", "")
+    # 进程内共享检索器：避免每次调用都重建 Embedding 客户端并重新加载索引，
+    # 构建端发布新索引代际后会自动热切换
+    rag_engine = get_shared_retriever(*_embedding_config())
+
+    results = rag_engine.search_knowledge_recall(query, k=5, category=category)
+
+    return _pack(results)
+
+
+async def _asearch_knowledge_base(query: str, category: str | None = None) -> str:
+    # Agent 运行在 asyncio 上：查询向量走异步 HTTP，向量检索在独立线程池中执行，
+    # 多个会话并发检索时不会阻塞事件循环
+    rag_engine = await aget_shared_retriever(*_embedding_config())
+
+    results = await rag_engine.asearch_knowledge_recall(query, k=5, category=category)
+
+    return _pack(results)
+
+
+def _search_knowledge_base_batch(
+    queries: List[str], category: str | None = None
+) -> str:
+    """
+    与 search_knowledge_base 相同，但一次查询多个问题。
+    当需要从本地知识库中查询多个方面的信息（如技术栈、项目结构、生成规范）时，
+    请将这些问题放在同一个列表中一次性调用本工具，而不是多次调用 search_knowledge_base。
+    category 同样可选，指定后所有问题都只在该类别中检索。
+    """
+    rag_engine = get_shared_retriever(*_embedding_config())
+
+    # 所有问题合并为一次 Embedding 请求与一次向量检索
+    results = rag_engine.search_knowledge_recall_batch(queries, k=5, category=category)
+
+    return _pack_batch(queries, results)
+
+
+async def _asearch_knowledge_base_batch(
+    queries: List[str], category: str | None = None
+) -> str:
+    rag_engine = await aget_shared_retriever(*_embedding_config())
+
+    results = await rag_engine.asearch_knowledge_recall_batch(
+        queries, k=5, category=category
+    )
+
+    return _pack_batch(queries, results)
 
-    rag_engine = LocalRAGRetriever(EMBEDDING_MODEL_NAME, EMBEDDING_MODEL_KEY)
 
-    results = rag_engine.search_knowledge_recall(query, k=5)
+# 2. 定义 Tool（同时提供同步与异步实现，Agent 的 astream 会调用异步实现）
+search_knowledge_base = StructuredTool.from_function(
+    func=_search_knowledge_base,
+    coroutine=_asearch_knowledge_base,
+    name="search_knowledge_base",
+)
 
-    return results
+search_knowledge_base_batch = StructuredTool.from_function(
+    func=_search_knowledge_base_batch,
+    coroutine=_asearch_knowledge_base_batch,
+    name="search_knowledge_base_batch",
+)